@@ -0,0 +1,99 @@
+"""Initial schema
+
+Matches the tables previously created by ``Base.metadata.create_all``.
+Databases created that way should be stamped at this revision
+(``alembic stamp 0001``) before upgrading; ``scripts/init_db.py`` does this
+automatically.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("phone", sa.String(), nullable=True),
+        sa.Column("website", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_name", "users", ["name"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "addresses",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("street", sa.String(), nullable=True),
+        sa.Column("suite", sa.String(), nullable=True),
+        sa.Column("city", sa.String(), nullable=True),
+        sa.Column("zipcode", sa.String(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["user_id"], ["users.id"], name="addresses_user_id_fkey"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_addresses_id", "addresses", ["id"])
+
+    op.create_table(
+        "geo",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("lat", sa.String(), nullable=True),
+        sa.Column("lng", sa.String(), nullable=True),
+        sa.Column("address_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["address_id"], ["addresses.id"], name="geo_address_id_fkey"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_geo_id", "geo", ["id"])
+
+    op.create_table(
+        "companies",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("catchPhrase", sa.String(), nullable=True),
+        sa.Column("bs", sa.String(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["user_id"], ["users.id"], name="companies_user_id_fkey"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_companies_id", "companies", ["id"])
+
+    op.create_table(
+        "auth_users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("password_hash", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_auth_users_id", "auth_users", ["id"])
+    op.create_index("ix_auth_users_email", "auth_users", ["email"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table("auth_users")
+    op.drop_table("companies")
+    op.drop_table("geo")
+    op.drop_table("addresses")
+    op.drop_table("users")
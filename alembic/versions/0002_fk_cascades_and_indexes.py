@@ -0,0 +1,50 @@
+"""Index foreign keys and cascade user deletes
+
+Adds indexes on addresses.user_id, companies.user_id and geo.address_id so
+joins are index lookups, and recreates the foreign keys with ON DELETE CASCADE
+so deleting a user is a single statement.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:01
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table)
+FOREIGN_KEYS = [
+    ("addresses", "user_id", "users"),
+    ("geo", "address_id", "addresses"),
+    ("companies", "user_id", "users"),
+]
+
+
+def upgrade() -> None:
+    for table, column, referenced in FOREIGN_KEYS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(f"{table}_{column}_fkey", type_="foreignkey")
+            batch_op.create_foreign_key(
+                f"{table}_{column}_fkey",
+                referenced,
+                [column],
+                ["id"],
+                ondelete="CASCADE",
+            )
+            batch_op.create_index(f"ix_{table}_{column}", [column])
+
+
+def downgrade() -> None:
+    for table, column, referenced in FOREIGN_KEYS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index(f"ix_{table}_{column}")
+            batch_op.drop_constraint(f"{table}_{column}_fkey", type_="foreignkey")
+            batch_op.create_foreign_key(
+                f"{table}_{column}_fkey", referenced, [column], ["id"]
+            )
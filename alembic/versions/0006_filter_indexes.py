@@ -0,0 +1,36 @@
+"""Index the user listing filters
+
+Adds indexes on users.website, addresses.city and companies.name so the
+``website``, ``city`` and ``company_name`` filters of the users listing,
+counts and bulk operations are index lookups instead of full table scans.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:05
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# (table, column)
+FILTER_COLUMNS = [
+    ("users", "website"),
+    ("addresses", "city"),
+    ("companies", "name"),
+]
+
+
+def upgrade() -> None:
+    for table, column in FILTER_COLUMNS:
+        op.create_index(f"ix_{table}_{column}", table, [column])
+
+
+def downgrade() -> None:
+    for table, column in FILTER_COLUMNS:
+        op.drop_index(f"ix_{table}_{column}", table_name=table)
@@ -0,0 +1,40 @@
+"""User directory
+
+Adds the table that allocates user ids and keeps emails and usernames unique
+when users are spread over USER_SHARD_URLS.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:06
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_directory",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_user_directory_id", "user_directory", ["id"])
+    op.create_index(
+        "ix_user_directory_username", "user_directory", ["username"], unique=True
+    )
+    op.create_index(
+        "ix_user_directory_email", "user_directory", ["email"], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_directory")
@@ -1,41 +1,96 @@
 from typing import Generator, Optional
 
 from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
+from fastapi.security import APIKeyHeader, HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
+from app import sharding
 from app.core.config import settings
+from app.core.request_context import set_user_id
+from app.core.security import API_KEY_SCHEME, decode_access_token
 from app.database import get_db
+from app.crud.api_key import authenticate_api_key
 from app.crud.user import get_auth_user_by_email
 from app.schemas.user import TokenData
+from app.sharding import ShardSessions
 
-security = HTTPBearer()
+security = HTTPBearer(auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+
+def require_writable() -> None:
+    """Reject writes when the API serves a read-only snapshot."""
+    if settings.READ_ONLY_MODE:
+        raise HTTPException(
+            status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
+            detail="API is running in read-only mode",
+        )
+
+
+def get_user_shards(
+    db: Session = Depends(get_db),
+) -> Generator[Optional[ShardSessions], None, None]:
+    """Sessions on the user shards, or None when users are not sharded."""
+    router = sharding.get_shard_router()
+    if router is None:
+        yield None
+        return
+    shards = ShardSessions(router, db)
+    try:
+        yield shards
+    finally:
+        shards.close()
 
 
 def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    api_key: Optional[str] = Depends(api_key_header),
     db: Session = Depends(get_db),
 ):
-    """Get current authenticated user from JWT token."""
+    """
+    Get current authenticated user from a JWT token or an API key.
+
+    API keys are accepted in ``X-API-Key`` or as the bearer token.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(
-            credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        email: str = payload.get("sub")
-        if email is None:
+    if api_key is None and credentials is not None:
+        if credentials.credentials.startswith(f"{API_KEY_SCHEME}_"):
+            api_key = credentials.credentials
+    if api_key is not None:
+        user = authenticate_api_key(db, api_key)
+        if user is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
+        set_user_id(user.id)
+        return user
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    email = decode_access_token(credentials.credentials)
+    if email is None:
         raise credentials_exception
+    token_data = TokenData(email=email)
     
     user = get_auth_user_by_email(db, email=token_data.email)
     if user is None:
         raise credentials_exception
-    return user 
\ No newline at end of file
+    set_user_id(user.id)
+    return user
+
+
+def require_admin(current_user=Depends(get_current_user)):
+    """Allow only auth users listed in ADMIN_EMAILS."""
+    if current_user.email not in settings.ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return current_user
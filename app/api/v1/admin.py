@@ -0,0 +1,55 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.deps import require_admin
+from app.core.memory_profile import memory_profiler
+from app.schemas.admin import MemoryProfile
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+def _require_profiler() -> None:
+    if not memory_profiler.running:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Memory profiling is not enabled",
+        )
+
+
+@router.get("/memory", response_model=MemoryProfile)
+async def get_memory_profile(
+    limit: int = Query(20, ge=1, le=200, description="Allocation sites to return"),
+    group_by: Literal["lineno", "filename", "traceback"] = Query(
+        "lineno", description="Group allocation sites by line, file or stack"
+    ),
+):
+    """
+    Per-route memory deltas and peaks, the top allocation sites and the sites
+    that grew since the last reset. Requires an admin user.
+    """
+    _require_profiler()
+    traced, peak = memory_profiler.traced_memory()
+    # Snapshots walk every traced block; keep that off the event loop
+    top_sites = await run_in_threadpool(memory_profiler.top_sites, limit, group_by)
+    growth_sites = await run_in_threadpool(
+        memory_profiler.growth_sites, limit, group_by
+    )
+    return {
+        "traced_bytes": traced,
+        "peak_bytes": peak,
+        "routes": memory_profiler.routes(),
+        "top_sites": top_sites,
+        "growth_sites": growth_sites,
+    }
+
+
+@router.post("/memory/reset", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_memory_profile():
+    """
+    Clear route statistics and take a new baseline for growth sites.
+    Requires an admin user.
+    """
+    _require_profiler()
+    await run_in_threadpool(memory_profiler.reset)
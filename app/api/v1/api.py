@@ -1,8 +1,14 @@
 from fastapi import APIRouter
 
-from app.api.v1 import auth, users
+from app.api.v1 import admin, api_keys, auth, batch, jobs, users
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
-api_router.include_router(users.router, prefix="/users", tags=["Users"]) 
\ No newline at end of file
+api_router.include_router(
+    api_keys.router, prefix="/auth/api-keys", tags=["Authentication"]
+)
+api_router.include_router(users.router, prefix="/users", tags=["Users"]) 
+api_router.include_router(batch.router, prefix="/batch", tags=["Batch"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
+api_router.include_router(admin.router, prefix="/admin", tags=["Admin"])
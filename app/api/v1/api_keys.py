@@ -0,0 +1,63 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user
+from app.crud import api_key as api_key_crud
+from app.database import get_db
+from app.models.user import AuthUser
+from app.schemas.user import ApiKey, ApiKeyCreate, ApiKeyCreated
+
+router = APIRouter()
+
+
+@router.post("/", response_model=ApiKeyCreated)
+async def create_api_key(
+    key_data: ApiKeyCreate,
+    db: Session = Depends(get_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """
+    Issue an API key for the current user. Requires authentication.
+
+    The full key is only returned in this response; store it securely.
+    """
+    api_key, key = api_key_crud.create_api_key(
+        db, auth_user_id=current_user.id, name=key_data.name
+    )
+    return {
+        "id": api_key.id,
+        "name": api_key.name,
+        "prefix": api_key.prefix,
+        "created_at": api_key.created_at,
+        "revoked_at": api_key.revoked_at,
+        "key": key,
+    }
+
+
+@router.get("/", response_model=List[ApiKey])
+async def list_api_keys(
+    db: Session = Depends(get_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """List the current user's API keys. Requires authentication."""
+    return api_key_crud.get_api_keys(db, auth_user_id=current_user.id)
+
+
+@router.delete("/{key_id}", response_model=ApiKey)
+async def revoke_api_key(
+    key_id: int,
+    db: Session = Depends(get_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """Revoke one of the current user's API keys. Requires authentication."""
+    api_key = api_key_crud.revoke_api_key(
+        db, auth_user_id=current_user.id, key_id=key_id
+    )
+    if api_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API key not found",
+        )
+    return api_key
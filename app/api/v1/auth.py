@@ -1,12 +1,19 @@
 from datetime import timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.schemas.user import AuthUserCreate, AuthUserLogin, Token
-from app.crud.user import create_auth_user, authenticate_user, get_auth_user_by_email
+from app.schemas.user import AuthUserCreate, AuthUserLogin, RefreshTokenRequest, Token
+from app.crud.user import create_auth_user, authenticate_user
+from app.crud.refresh_token import (
+    issue_refresh_token,
+    revoke_refresh_token,
+    rotate_refresh_token,
+)
+from app.core.rate_limit import login_throttle
 from app.core.security import create_access_token
+from app.core.tokens import get_token_service
 from app.core.config import settings
 
 router = APIRouter()
@@ -15,40 +22,42 @@ router = APIRouter()
 @router.post("/register", response_model=Token)
 async def register(
     user_data: AuthUserCreate,
+    request: Request,
     db: Session = Depends(get_db),
 ):
     """Register a new user."""
-    # Check if user already exists
-    existing_user = get_auth_user_by_email(db, email=user_data.email)
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered",
-        )
+    await login_throttle.check(request, user_data.email)
     
-    # Create user
+    # Create user; the unique email constraint rejects duplicates
     user = create_auth_user(
         db=db,
         name=user_data.name,
         email=user_data.email,
         password=user_data.password,
     )
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered",
+        )
     
-    # Create access token
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        subject=user.email, expires_delta=access_token_expires
-    )
-    
-    return {"access_token": access_token, "token_type": "bearer"}
+    return _token_response(user.email, issue_refresh_token(db, user.id))
 
 
 @router.post("/login", response_model=Token)
 async def login(
     user_data: AuthUserLogin,
+    request: Request,
     db: Session = Depends(get_db),
 ):
-    """Login user and return JWT token."""
+    """
+    Login user and return JWT token.
+
+    Attempts are throttled per client IP and per email before the password
+    is checked; over the limit the response is 429 with ``Retry-After``.
+    Successful attempts are not counted.
+    """
+    await login_throttle.check(request, user_data.email)
     user = authenticate_user(db, user_data.email, user_data.password)
     if not user:
         raise HTTPException(
@@ -56,10 +65,57 @@ async def login(
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    await login_throttle.succeeded(request, user_data.email)
     
+    return _token_response(user.email, issue_refresh_token(db, user.id))
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(
+    token_data: RefreshTokenRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    Exchange a refresh token for a new access token and refresh token.
+
+    Each refresh token works once. Reusing one revokes every token issued
+    from the same login.
+    """
+    rotated = rotate_refresh_token(db, token_data.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    email, refresh_token = rotated
+    return _token_response(email, refresh_token)
+
+
+@router.post("/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke(
+    token_data: RefreshTokenRequest,
+    db: Session = Depends(get_db),
+):
+    """Revoke a refresh token and every token rotated from the same login."""
+    revoke_refresh_token(db, token_data.refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/jwks")
+async def jwks():
+    """Public keys that verify access tokens signed with RS* or ES* keys."""
+    return get_token_service().jwks()
+
+
+def _token_response(email: str, refresh_token: str) -> dict:
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        subject=user.email, expires_delta=access_token_expires
+        subject=email, expires_delta=access_token_expires
     )
-    
-    return {"access_token": access_token, "token_type": "bearer"} 
\ No newline at end of file
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+    }
+ 
\ No newline at end of file
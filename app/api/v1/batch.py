@@ -0,0 +1,296 @@
+"""
+Batch endpoint running several users API calls in one HTTP request.
+
+The caller is authenticated once for the whole batch, and each sub-request
+runs the same users operations as the corresponding route, in request order
+on the request's own database session, so a read placed after a write sees
+its result and a batch holds one pooled connection like any other request.
+Running reads concurrently is deliberately out of scope: each would need its
+own session and connection, so one batch could drain the pool, and reads
+could no longer see the writes placed before them.
+Each sub-request is access-logged under the batch's request id. With
+``atomic`` set, every sub-request runs inside a single transaction that is
+rolled back if any of them fails. Otherwise a sub-request failing with an
+unexpected error gets a 500 result and the batch carries on. Batches are not
+available while users are sharded, as neither the shared transaction nor the
+request session spans the shards.
+"""
+
+import json
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy.orm import Session
+
+from app import sharding
+from app.api.deps import get_current_user, require_writable
+from app.api.v1 import user_operations as operations
+from app.core.config import settings
+from app.core.request_context import current_request
+from app.crud import user as user_crud
+from app.database import get_db
+from app.middleware.access_log import log_access
+from app.models.user import AuthUser
+from app.schemas.batch import BatchOperation, BatchRequest, BatchResponseItem
+from app.schemas.user import (
+    BulkUserDelete,
+    BulkUserUpdate,
+    User,
+    UserCreate,
+    UserFilter,
+    UserUpdate,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+READ_METHODS = {"GET"}
+
+USERS_PATH = re.compile(r"^(?:/api/v1)?/users(?:/(?P<user_id>[^/]+))?/?$")
+COLLECTION_ROUTE = "/api/v1/users/"
+ITEM_ROUTE = "/api/v1/users/{user_id}"
+
+# (status, headers, body) of one sub-response
+Result = Tuple[int, Dict[str, str], Any]
+
+
+class UserListQuery(BaseModel):
+    """Query parameters accepted by ``GET /users/`` inside a batch."""
+    skip: int = Field(0, ge=0)
+    limit: int = Field(100, ge=1, le=100)
+    name: Optional[str] = None
+    username: Optional[str] = None
+    email: Optional[str] = None
+    website: Optional[str] = None
+    city: Optional[str] = None
+    company_name: Optional[str] = None
+    exact_count: bool = False
+
+
+@router.post("", response_model=List[BatchResponseItem])
+async def run_batch(
+    batch: BatchRequest,
+    db: Session = Depends(get_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """
+    Run a batch of users API sub-requests. Requires authentication.
+
+    Returns one ``{"status", "headers", "body"}`` item per sub-request, in
+    request order. Set ``atomic`` to run them all in a single transaction.
+    """
+    if sharding.get_shard_router() is not None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Batch requests are not supported while users are sharded",
+        )
+    if len(batch.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                f"A batch may contain at most {settings.BATCH_MAX_REQUESTS} requests"
+            ),
+        )
+    if batch.atomic:
+        results = await _run_atomic(db, batch.requests)
+    else:
+        results = await _run_independent(db, batch.requests)
+    return [
+        {"status": status_code, "headers": headers, "body": body}
+        for status_code, headers, body in results
+    ]
+
+
+async def _run_independent(
+    db: Session, sub_requests: List[BatchOperation]
+) -> List[Result]:
+    """Run every sub-request in order, each committing its own writes."""
+    return [
+        await run_in_threadpool(_execute, db, operation, index)
+        for index, operation in enumerate(sub_requests)
+    ]
+
+
+async def _run_atomic(
+    db: Session, sub_requests: List[BatchOperation]
+) -> List[Result]:
+    """Run every sub-request in order within one transaction."""
+    # The CRUD layer commits after each write; a session joined to the request
+    # session's transaction in "rollback_only" mode turns those commits into
+    # no-ops, so only the final commit below makes the batch durable.
+    session = Session(bind=db.connection(), join_transaction_mode="rollback_only")
+    results: List[Result] = []
+    try:
+        for index, operation in enumerate(sub_requests):
+            result = await run_in_threadpool(_execute, session, operation, index)
+            results.append(result)
+            if result[0] >= 400:
+                break
+    finally:
+        session.close()
+
+    if len(results) == len(sub_requests) and results[-1][0] < 400:
+        db.commit()
+        return results
+
+    db.rollback()
+    user_crud.invalidate_user_counts()
+    failed = len(results) - 1
+    skipped = {"detail": f"Not applied: request {failed} in the atomic batch failed"}
+    return [
+        results[failed] if index == failed else (424, {}, skipped)
+        for index in range(len(sub_requests))
+    ]
+
+
+def _execute(db: Session, operation: BatchOperation, index: int) -> Result:
+    """Run one sub-request and write its access log record."""
+    context = current_request()
+    db_time = context.db_time if context else 0.0
+    db_queries = context.db_queries if context else 0
+    started = time.perf_counter()
+    route, result = _dispatch(db, operation)
+    if context is not None:
+        log_access(
+            context.request_id,
+            operation.method,
+            route,
+            result[0],
+            time.perf_counter() - started,
+            context.db_time - db_time,
+            context.db_queries - db_queries,
+            context.user_id,
+            batch_index=index,
+        )
+    return result
+
+
+def _dispatch(db: Session, operation: BatchOperation) -> Tuple[str, Result]:
+    """
+    Route one sub-request to its handler, returning its route template and
+    result. HTTP and validation errors become their usual responses; any
+    other error is rolled back and reported as a 500 for this item only.
+    """
+    url = urlsplit(operation.path)
+    match = USERS_PATH.match(url.path)
+    if match is None:
+        return "unmatched", (status.HTTP_404_NOT_FOUND, {}, {"detail": "Not Found"})
+
+    user_id = match.group("user_id")
+    route = ITEM_ROUTE if user_id else COLLECTION_ROUTE
+    handler = (ITEM_HANDLERS if user_id else COLLECTION_HANDLERS).get(operation.method)
+    if handler is None:
+        return route, (
+            status.HTTP_405_METHOD_NOT_ALLOWED,
+            {},
+            {"detail": "Method Not Allowed"},
+        )
+
+    try:
+        if operation.method not in READ_METHODS:
+            require_writable()
+        if user_id is not None:
+            if not user_id.isdigit():
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="User id must be an integer",
+                )
+            return route, handler(db, int(user_id), operation.body)
+        return route, handler(db, dict(parse_qsl(url.query)), operation.body)
+    except HTTPException as exc:
+        return route, (exc.status_code, exc.headers or {}, {"detail": exc.detail})
+    except ValidationError as exc:
+        return route, (
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            {},
+            {"detail": jsonable_encoder(exc.errors())},
+        )
+    except Exception:
+        logger.exception("Batch sub-request %s %s failed", operation.method, route)
+        db.rollback()
+        user_crud.invalidate_user_counts()
+        return route, (
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            {},
+            {"detail": "Internal Server Error"},
+        )
+
+
+def _serialize(user) -> Any:
+    """Render a user like the ``User`` response model does."""
+    if isinstance(user, bytes):
+        # Read-only mode: pre-rendered by the snapshot
+        return json.loads(user)
+    return jsonable_encoder(User.model_validate(user, from_attributes=True))
+
+
+def _list_users(db: Session, params: Dict[str, str], body: Any) -> Result:
+    query = UserListQuery(**params)
+    user_filter = UserFilter(**query.dict(exclude={"skip", "limit", "exact_count"}))
+    users, headers = operations.get_users(
+        db, None, query.skip, query.limit, user_filter, query.exact_count
+    )
+    if isinstance(users, bytes):
+        return status.HTTP_200_OK, headers, json.loads(users)
+    return status.HTTP_200_OK, headers, [_serialize(user) for user in users]
+
+
+def _get_user(db: Session, user_id: int, body: Any) -> Result:
+    return status.HTTP_200_OK, {}, _serialize(operations.get_user(db, None, user_id))
+
+
+def _create_user(db: Session, params: Dict[str, str], body: Any) -> Result:
+    user = operations.create_user(db, None, UserCreate.parse_obj(body))
+    return status.HTTP_200_OK, {}, _serialize(user)
+
+
+def _bulk_update_users(db: Session, params: Dict[str, str], body: Any) -> Result:
+    bulk_update = BulkUserUpdate.parse_obj(body)
+    return status.HTTP_200_OK, {}, operations.bulk_update_users(db, None, bulk_update)
+
+
+def _bulk_delete_users(db: Session, params: Dict[str, str], body: Any) -> Result:
+    bulk_delete = BulkUserDelete.parse_obj(body)
+    return status.HTTP_200_OK, {}, operations.bulk_delete_users(db, None, bulk_delete)
+
+
+def _replace_user(db: Session, user_id: int, body: Any) -> Result:
+    user, created = operations.update_user(
+        db, None, user_id, UserCreate.parse_obj(body)
+    )
+    status_code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    return status_code, {}, _serialize(user)
+
+
+def _patch_user(db: Session, user_id: int, body: Any) -> Result:
+    user_update = UserUpdate.parse_obj(body)
+    return status.HTTP_200_OK, {}, _serialize(
+        operations.patch_user(db, None, user_id, user_update)
+    )
+
+
+def _delete_user(db: Session, user_id: int, body: Any) -> Result:
+    return status.HTTP_200_OK, {}, _serialize(operations.delete_user(db, None, user_id))
+
+
+COLLECTION_HANDLERS: Dict[str, Callable[[Session, Dict[str, str], Any], Result]] = {
+    "GET": _list_users,
+    "POST": _create_user,
+    "PATCH": _bulk_update_users,
+    "DELETE": _bulk_delete_users,
+}
+
+ITEM_HANDLERS: Dict[str, Callable[[Session, int, Any], Result]] = {
+    "GET": _get_user,
+    "PUT": _replace_user,
+    "PATCH": _patch_user,
+    "DELETE": _delete_user,
+}
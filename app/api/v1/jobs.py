@@ -0,0 +1,210 @@
+"""
+Background jobs for moving users in and out in bulk.
+
+``POST /jobs`` only queues the job and returns 202; runner threads do the
+work in chunks, so a large import or export never holds a request worker or
+a request's database session. Poll ``GET /jobs/{id}`` for progress. Import
+files are uploaded with ``PUT /jobs/files/{name}``, which streams the body to
+disk instead of reading it into memory.
+"""
+
+import os
+import tempfile
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from app import sharding
+from app.api.deps import get_current_user, require_writable
+from app.core.jobs import wake_job_runner
+from app.crud import job as job_crud
+from app.crud.user_transfer import job_file
+from app.database import get_db
+from app.models.user import AuthUser
+from app.models.user import Job as JobModel
+from app.schemas.job import Job, JobCreate, JobFile
+
+router = APIRouter()
+
+
+@router.post(
+    "/",
+    response_model=Job,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_writable)],
+)
+async def create_job(
+    job_data: JobCreate,
+    db: Session = Depends(get_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """
+    Queue a user import or export. Requires authentication.
+
+    Imports read a JSON Lines file of users uploaded to your job files
+    directory; exports write a new JSON Lines file there.
+    """
+    _refuse_when_sharded()
+    params = job_data.dict(exclude_none=True, exclude={"type"})
+    path = job_file(job_data.file, current_user.id) if job_data.file else None
+    if job_data.type == "import_users" and not os.path.isfile(path):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Import file not found",
+        )
+    if job_data.type == "export_users" and path and os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Export file already exists",
+        )
+    job = job_crud.create_job(
+        db, job_type=job_data.type, params=params, auth_user_id=current_user.id
+    )
+    wake_job_runner()
+    return _render_job(job)
+
+
+@router.put(
+    "/files/{name}",
+    response_model=JobFile,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_writable)],
+)
+async def upload_job_file(
+    name: str,
+    request: Request,
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """
+    Upload a JSON Lines file of users to import. Requires authentication.
+
+    The request body is the file itself. It is written to disk chunk by
+    chunk under a temporary name and only appears under ``name`` once
+    complete, so an import never reads half a file. Existing files are
+    never replaced.
+    """
+    _refuse_when_sharded()
+    try:
+        path = job_file(name, current_user.id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="File name must be a plain file name",
+        )
+    if os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="File already exists",
+        )
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # The temporary file lives next to the target so the final link stays on
+    # one filesystem
+    target = tempfile.NamedTemporaryFile(dir=directory, prefix=".upload-", delete=False)
+    size = 0
+    try:
+        with target:
+            async for chunk in request.stream():
+                await run_in_threadpool(target.write, chunk)
+                size += len(chunk)
+        try:
+            # Unlike a rename, a link refuses to replace a file created meanwhile
+            os.link(target.name, path)
+        except FileExistsError:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="File already exists",
+            )
+    finally:
+        os.unlink(target.name)
+    return {"file": name, "size": size}
+
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """Get the status and progress of one of your jobs. Requires authentication."""
+    return _render_job(_get_job_or_404(db, job_id, current_user))
+
+
+@router.post("/{job_id}/cancel", response_model=Job)
+async def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """
+    Cancel one of your jobs. Requires authentication.
+
+    A running job stops after its current chunk; the chunks it already
+    committed are kept.
+    """
+    job = _get_job_or_404(db, job_id, current_user)
+    if job.status in job_crud.FINISHED_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job already {job.status}",
+        )
+    return _render_job(
+        job_crud.cancel_job(db, job_id=job_id, auth_user_id=current_user.id)
+    )
+
+
+@router.get("/{job_id}/file")
+async def download_job_file(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """Download the file written by a finished export. Requires authentication."""
+    job = _get_job_or_404(db, job_id, current_user)
+    if job.type != "export_users" or job.status != "succeeded":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Job has no file to download",
+        )
+    name = job.result["file"]
+    return FileResponse(
+        job_file(name, current_user.id),
+        media_type="application/x-ndjson",
+        filename=name,
+    )
+
+
+def _refuse_when_sharded() -> None:
+    if sharding.get_shard_router() is not None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Jobs are not supported while users are sharded",
+        )
+
+
+def _get_job_or_404(db: Session, job_id: int, current_user: AuthUser) -> JobModel:
+    job = job_crud.get_job(db, job_id=job_id, auth_user_id=current_user.id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return job
+
+
+def _render_job(job: JobModel) -> dict:
+    """Job response with progress and throughput derived from its counters."""
+    rendered = {
+        column.name: getattr(job, column.name) for column in JobModel.__table__.c
+    }
+    if job.rows_total:
+        rendered["progress"] = min(1.0, job.rows_done / job.rows_total)
+    if job.started_at is not None:
+        ended = job.finished_at or datetime.utcnow()
+        seconds = (ended - job.started_at).total_seconds()
+        if seconds > 0:
+            rendered["rows_per_second"] = round(job.rows_done / seconds, 1)
+    return rendered
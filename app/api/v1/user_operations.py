@@ -0,0 +1,236 @@
+"""
+Users API operations shared by the users router and the batch endpoint.
+
+Each function takes the request's database session (and the shard sessions
+when users are sharded), does what the route of the same name does and
+raises ``HTTPException`` for client errors, so a route and a batch
+sub-request always behave alike. In read-only mode reads return the
+snapshot's pre-rendered JSON bytes instead of ORM users.
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import sharded_user as sharded_user_crud
+from app.crud import user as user_crud
+from app.crud.snapshot import user_snapshot
+from app.models.user import User
+from app.schemas.user import (
+    BulkUserDelete,
+    BulkUserUpdate,
+    UserCreate,
+    UserFilter,
+    UserUpdate,
+)
+from app.sharding import ShardSessions
+
+CONFLICT_DETAILS = {
+    "email": "Email already registered",
+    "username": "Username already taken",
+}
+
+
+def get_users(
+    db: Session,
+    shards: Optional[ShardSessions],
+    skip: int,
+    limit: int,
+    user_filter: UserFilter,
+    exact_count: bool = False,
+) -> Tuple[Union[bytes, List[User]], Dict[str, str]]:
+    """A page of users and its ``X-Total-Count`` headers."""
+    if settings.READ_ONLY_MODE:
+        body, total = user_snapshot.get_page(skip, limit, user_filter)
+        return body, {"X-Total-Count": str(total)}
+
+    if shards is not None:
+        users = sharded_user_crud.get_users(
+            shards, skip=skip, limit=limit, user_filter=user_filter
+        )
+    else:
+        users = user_crud.get_users(
+            db, skip=skip, limit=limit, user_filter=user_filter
+        )
+    headers = _total_count_headers(
+        db, users, skip, limit, user_filter, exact_count, shards=shards
+    )
+    return users, headers
+
+
+def get_user(
+    db: Session, shards: Optional[ShardSessions], user_id: int
+) -> Union[bytes, User]:
+    """One user, or 404."""
+    if settings.READ_ONLY_MODE:
+        return _found(user_snapshot.get(user_id))
+    if shards is not None:
+        return _found(sharded_user_crud.get_user(shards, user_id=user_id))
+    return _found(user_crud.get_user(db, user_id=user_id))
+
+
+def create_user(
+    db: Session, shards: Optional[ShardSessions], user: UserCreate
+) -> User:
+    """Create a user; 400 if the email or username is taken."""
+    try:
+        if shards is not None:
+            return sharded_user_crud.create_user(shards, user=user)
+        return user_crud.create_user(db=db, user=user)
+    except user_crud.UserConflict as conflict:
+        raise _conflict_error(conflict)
+
+
+def bulk_update_users(
+    db: Session, shards: Optional[ShardSessions], bulk_update: BulkUserUpdate
+) -> Dict[str, object]:
+    """Update all users matching a filter; the bulk operation result."""
+    _check_bulk_filter(bulk_update.filter)
+    _check_bulk_changes(bulk_update.changes)
+    try:
+        if shards is not None:
+            matched, affected = sharded_user_crud.bulk_update_users(
+                shards,
+                user_filter=bulk_update.filter,
+                user_update=bulk_update.changes,
+                dry_run=bulk_update.dry_run,
+            )
+        else:
+            matched, affected = user_crud.bulk_update_users(
+                db,
+                user_filter=bulk_update.filter,
+                user_update=bulk_update.changes,
+                dry_run=bulk_update.dry_run,
+            )
+    except user_crud.BulkFilterConflict as conflict:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                "Bulk changes may alter filtered columns of one table only, not "
+                f"{' and '.join(conflict.tables)}"
+            ),
+        )
+    return {"matched": matched, "affected": affected, "dry_run": bulk_update.dry_run}
+
+
+def bulk_delete_users(
+    db: Session, shards: Optional[ShardSessions], bulk_delete: BulkUserDelete
+) -> Dict[str, object]:
+    """Delete all users matching a filter; the bulk operation result."""
+    _check_bulk_filter(bulk_delete.filter)
+    if shards is not None:
+        matched, affected = sharded_user_crud.bulk_delete_users(
+            shards, user_filter=bulk_delete.filter, dry_run=bulk_delete.dry_run
+        )
+    else:
+        matched, affected = user_crud.bulk_delete_users(
+            db, user_filter=bulk_delete.filter, dry_run=bulk_delete.dry_run
+        )
+    return {"matched": matched, "affected": affected, "dry_run": bulk_delete.dry_run}
+
+
+def update_user(
+    db: Session, shards: Optional[ShardSessions], user_id: int, user: UserCreate
+) -> Tuple[User, bool]:
+    """Replace or create the user with this id, returning ``(user, created)``."""
+    try:
+        if shards is not None:
+            user, created = sharded_user_crud.upsert_user(
+                shards, user_id=user_id, user=user
+            )
+        else:
+            user, created = user_crud.upsert_user(db, user_id=user_id, user=user)
+    except user_crud.UserConflict as conflict:
+        raise _conflict_error(conflict)
+    return _found(user), created
+
+
+def patch_user(
+    db: Session,
+    shards: Optional[ShardSessions],
+    user_id: int,
+    user_update: UserUpdate,
+) -> User:
+    """Apply a partial update to one user, or 404."""
+    try:
+        if shards is not None:
+            user = sharded_user_crud.update_user(
+                shards, user_id=user_id, user_update=user_update
+            )
+        else:
+            user = user_crud.update_user(db, user_id=user_id, user_update=user_update)
+    except user_crud.UserConflict as conflict:
+        raise _conflict_error(conflict)
+    return _found(user)
+
+
+def delete_user(db: Session, shards: Optional[ShardSessions], user_id: int) -> User:
+    """Delete one user, returning it, or 404."""
+    if shards is not None:
+        return _found(sharded_user_crud.delete_user(shards, user_id=user_id))
+    return _found(user_crud.delete_user(db, user_id=user_id))
+
+
+def _found(user):
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+    return user
+
+
+def _total_count_headers(
+    db: Session,
+    users: list,
+    skip: int,
+    limit: int,
+    user_filter: UserFilter,
+    exact_count: bool,
+    shards: Optional[ShardSessions] = None,
+) -> Dict[str, str]:
+    """X-Total-Count (and X-Total-Count-Estimated) headers for a listing page."""
+    # A short last page already tells us the total without counting
+    if 0 < len(users) < limit or (skip == 0 and not users):
+        total, estimated = skip + len(users), False
+    elif shards is not None:
+        total, estimated = sharded_user_crud.count_users(
+            shards, user_filter=user_filter, exact=exact_count
+        )
+    else:
+        total, estimated = user_crud.count_users(
+            db, user_filter=user_filter, exact=exact_count
+        )
+    headers = {"X-Total-Count": str(total)}
+    if estimated:
+        headers["X-Total-Count-Estimated"] = "true"
+    return headers
+
+
+def _conflict_error(conflict: user_crud.UserConflict) -> HTTPException:
+    """400 response for a write that collided with another user's unique column."""
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=CONFLICT_DETAILS.get(conflict.field, "User already exists"),
+    )
+
+
+def _check_bulk_changes(changes: UserUpdate) -> None:
+    """Unique columns cannot be set to the same value on many users."""
+    fields = changes.dict(exclude_unset=True)
+    if "email" in fields or "username" in fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email and username are unique and cannot be bulk updated",
+        )
+
+
+def _check_bulk_filter(user_filter: UserFilter) -> None:
+    """Refuse bulk operations without criteria, which would hit every user."""
+    if not user_filter.dict(exclude_none=True):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bulk operations require at least one filter criterion",
+        )
@@ -1,25 +1,63 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Response, status, Query
 from sqlalchemy.orm import Session
 
+from app.api.v1 import user_operations as operations
 from app.database import get_db
-from app.schemas.user import User, UserCreate, UserUpdate
-from app.crud import user as user_crud
-from app.api.deps import get_current_user
+from app.schemas.user import (
+    BulkOperationResult,
+    BulkUserDelete,
+    BulkUserUpdate,
+    User,
+    UserCreate,
+    UserFilter,
+    UserUpdate,
+)
+from app.api.deps import get_current_user, get_user_shards, require_writable
 from app.models.user import AuthUser
+from app.sharding import ShardSessions
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[User])
 async def get_users(
+    response: Response,
     skip: int = Query(0, ge=0, description="Number of users to skip"),
     limit: int = Query(100, ge=1, le=100, description="Number of users to return"),
+    name: Optional[str] = Query(None, description="Filter by exact name"),
+    username: Optional[str] = Query(None, description="Filter by username"),
+    email: Optional[str] = Query(None, description="Filter by email"),
+    website: Optional[str] = Query(None, description="Filter by website"),
+    city: Optional[str] = Query(None, description="Filter by address city"),
+    company_name: Optional[str] = Query(None, description="Filter by company name"),
+    exact_count: bool = Query(False, description="Never estimate X-Total-Count"),
     db: Session = Depends(get_db),
+    shards: Optional[ShardSessions] = Depends(get_user_shards),
 ):
-    """Get all users with pagination."""
-    users = user_crud.get_users(db, skip=skip, limit=limit)
+    """
+    Get all users with pagination and optional filters.
+
+    The total number of matching users is returned in the ``X-Total-Count``
+    header. For very large unfiltered tables it may be a planner estimate, in
+    which case ``X-Total-Count-Estimated: true`` is also set.
+    """
+    user_filter = UserFilter(
+        name=name,
+        username=username,
+        email=email,
+        website=website,
+        city=city,
+        company_name=company_name,
+    )
+    users, headers = operations.get_users(
+        db, shards, skip, limit, user_filter, exact_count
+    )
+    if isinstance(users, bytes):
+        # Read-only mode: the snapshot's pre-rendered page
+        return Response(content=users, media_type="application/json", headers=headers)
+    response.headers.update(headers)
     return users
 
 
@@ -27,88 +65,106 @@ async def get_users(
 async def get_user(
     user_id: int,
     db: Session = Depends(get_db),
+    shards: Optional[ShardSessions] = Depends(get_user_shards),
 ):
     """Get user by ID."""
-    user = user_crud.get_user(db, user_id=user_id)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
+    user = operations.get_user(db, shards, user_id)
+    if isinstance(user, bytes):
+        return Response(content=user, media_type="application/json")
     return user
 
 
-@router.post("/", response_model=User)
+@router.post("/", response_model=User, dependencies=[Depends(require_writable)])
 async def create_user(
     user: UserCreate,
     db: Session = Depends(get_db),
+    shards: Optional[ShardSessions] = Depends(get_user_shards),
     current_user: AuthUser = Depends(get_current_user),
 ):
     """Create a new user. Requires authentication."""
-    # Check if user with email already exists
-    existing_user = user_crud.get_user_by_email(db, email=user.email)
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered",
-        )
-    
-    # Check if username already exists
-    existing_username = user_crud.get_user_by_username(db, username=user.username)
-    if existing_username:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken",
-        )
-    
-    return user_crud.create_user(db=db, user=user)
-
-
-@router.put("/{user_id}", response_model=User)
+    return operations.create_user(db, shards, user)
+
+
+@router.patch(
+    "/", response_model=BulkOperationResult, dependencies=[Depends(require_writable)]
+)
+async def bulk_update_users(
+    bulk_update: BulkUserUpdate,
+    db: Session = Depends(get_db),
+    shards: Optional[ShardSessions] = Depends(get_user_shards),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """
+    Update all users matching a filter. Requires authentication.
+
+    Changes are applied with one set-based statement per affected table.
+    Set ``dry_run`` to get the counts without writing anything.
+    """
+    return operations.bulk_update_users(db, shards, bulk_update)
+
+
+@router.delete(
+    "/", response_model=BulkOperationResult, dependencies=[Depends(require_writable)]
+)
+async def bulk_delete_users(
+    bulk_delete: BulkUserDelete,
+    db: Session = Depends(get_db),
+    shards: Optional[ShardSessions] = Depends(get_user_shards),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """
+    Delete all users matching a filter, with their address, geo and company.
+    Requires authentication. Set ``dry_run`` to only count matching users.
+    """
+    return operations.bulk_delete_users(db, shards, bulk_delete)
+
+
+@router.put("/{user_id}", response_model=User, dependencies=[Depends(require_writable)])
 async def update_user(
     user_id: int,
-    user_update: UserUpdate,
+    user: UserCreate,
+    response: Response,
     db: Session = Depends(get_db),
+    shards: Optional[ShardSessions] = Depends(get_user_shards),
     current_user: AuthUser = Depends(get_current_user),
 ):
-    """Update user by ID. Requires authentication."""
-    user = user_crud.update_user(db, user_id=user_id, user_update=user_update)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
+    """
+    Replace user by ID with a full representation, creating the user with
+    this ID (201) if it does not exist. Requires authentication.
+    """
+    user, created = operations.update_user(db, shards, user_id, user)
+    if created:
+        response.status_code = status.HTTP_201_CREATED
     return user
 
 
-@router.patch("/{user_id}", response_model=User)
+@router.patch(
+    "/{user_id}", response_model=User, dependencies=[Depends(require_writable)]
+)
 async def patch_user(
     user_id: int,
     user_update: UserUpdate,
     db: Session = Depends(get_db),
+    shards: Optional[ShardSessions] = Depends(get_user_shards),
     current_user: AuthUser = Depends(get_current_user),
 ):
-    """Partially update user by ID. Requires authentication."""
-    user = user_crud.update_user(db, user_id=user_id, user_update=user_update)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
-    return user
+    """
+    Partially update user by ID. Requires authentication.
+
+    Only the fields present in the body are changed, including nested
+    address, geo and company fields.
+    """
+    return operations.patch_user(db, shards, user_id, user_update)
 
 
-@router.delete("/{user_id}", response_model=User)
+@router.delete(
+    "/{user_id}", response_model=User, dependencies=[Depends(require_writable)]
+)
 async def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
+    shards: Optional[ShardSessions] = Depends(get_user_shards),
     current_user: AuthUser = Depends(get_current_user),
 ):
     """Delete user by ID. Requires authentication."""
-    user = user_crud.delete_user(db, user_id=user_id)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
-    return user 
\ No newline at end of file
+    return operations.delete_user(db, shards, user_id)
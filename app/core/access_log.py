@@ -0,0 +1,112 @@
+"""
+Non-blocking structured access log.
+
+Request threads only put the log record on a bounded queue (dropping it and
+counting the drop if the queue is full); a background writer thread turns
+records into JSON lines and writes them in batches with one flush each. A
+slow log sink therefore never adds latency to requests.
+"""
+
+import json
+import logging
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+from typing import IO, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+dropped_records = registry.counter(
+    "access_log_dropped_total", "Access log records dropped because the queue was full"
+)
+
+logger = logging.getLogger("app.access")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+_STOP = object()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that never blocks and leaves formatting to the writer."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc()
+
+
+class AccessLogWriter(threading.Thread):
+    """Background thread writing queued records as JSON lines."""
+
+    def __init__(self, records: queue.Queue, stream: IO[str], batch_size: int):
+        super().__init__(name="access-log-writer", daemon=True)
+        self.records = records
+        self.stream = stream
+        self.batch_size = batch_size
+
+    def run(self) -> None:
+        while True:
+            batch = [self.records.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(record is _STOP for record in batch)
+            lines = [format_record(r) for r in batch if r is not _STOP]
+            if lines:
+                self.stream.write("\n".join(lines) + "\n")
+                self.stream.flush()
+            if stop:
+                return
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write what is queued and stop."""
+        self.records.put(_STOP)
+        self.join(timeout)
+
+
+def format_record(record: logging.LogRecord) -> str:
+    entry = {
+        "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+        "level": record.levelname.lower(),
+    }
+    entry.update(getattr(record, "access", {}))
+    return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+_writer: Optional[AccessLogWriter] = None
+_handlers: List[logging.Handler] = []
+
+
+def start_access_log(stream: Optional[IO[str]] = None) -> None:
+    """Attach the queue handler and start the writer thread for this process."""
+    global _writer
+    if _writer is not None:
+        return
+    records: queue.Queue = queue.Queue(maxsize=settings.ACCESS_LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(records)
+    logger.addHandler(handler)
+    _handlers.append(handler)
+    _writer = AccessLogWriter(
+        records, stream or sys.stdout, batch_size=settings.ACCESS_LOG_BATCH_SIZE
+    )
+    _writer.start()
+
+
+def stop_access_log() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _writer
+    while _handlers:
+        logger.removeHandler(_handlers.pop())
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
@@ -0,0 +1,214 @@
+"""
+In-process background job runner.
+
+Jobs are rows in the ``jobs`` table, so they survive restarts and any worker
+process can run them. Runner threads claim the oldest queued job with a
+conditional UPDATE, then call the handler for its type. Handlers work in
+chunks and call ``JobContext.save`` after each one: the chunk's writes, the
+progress counters and the resume checkpoint are committed together, so a job
+whose runner dies is picked up again (once its heartbeat is stale) exactly
+where its last chunk ended. Saving is also where cancellation and shutdown
+are noticed.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.crud import job as job_crud
+from app.models.user import Job
+
+logger = logging.getLogger(__name__)
+
+finished_jobs = registry.counter(
+    "jobs_finished_total",
+    "Background jobs finished, by type and final status",
+    labelnames=("type", "status"),
+)
+
+
+class JobCancelled(Exception):
+    """Cancellation was requested; committed chunks are kept."""
+
+
+class JobLost(Exception):
+    """Another runner claimed the job after this one's heartbeat went stale."""
+
+
+class JobInterrupted(Exception):
+    """The runner is shutting down; the job goes back to the queue."""
+
+
+class JobContext:
+    """What a handler knows about its job, and how it reports progress."""
+
+    def __init__(self, job: Job, stopping: threading.Event):
+        self.job_id = job.id
+        self.type = job.type
+        self.auth_user_id = job.auth_user_id
+        self.params: Dict[str, Any] = job.params or {}
+        self.checkpoint: Dict[str, Any] = job.checkpoint or {}
+        self.attempt = job.attempts
+        self.rows_done = job.rows_done or 0
+        self.rows_total = job.rows_total
+        self._stopping = stopping
+
+    def save(
+        self,
+        db: Session,
+        rows_done: int,
+        checkpoint: Dict[str, Any],
+        rows_total: Optional[int] = None,
+    ) -> None:
+        """
+        Commit the current chunk together with the progress and checkpoint.
+
+        Raises JobCancelled, JobInterrupted or JobLost (the chunk is rolled
+        back only in the last case) when the handler should stop.
+        """
+        cancel_requested = job_crud.save_progress(
+            db, self.job_id, self.attempt, rows_done, checkpoint, rows_total
+        )
+        if cancel_requested is None:
+            db.rollback()
+            raise JobLost(self.job_id)
+        db.commit()
+        self.rows_done = rows_done
+        self.checkpoint = checkpoint
+        if rows_total is not None:
+            self.rows_total = rows_total
+        if cancel_requested:
+            raise JobCancelled(self.job_id)
+        if self._stopping.is_set():
+            raise JobInterrupted(self.job_id)
+
+
+# handler(db, context) -> result stored on the job
+JobHandler = Callable[[Session, JobContext], Optional[Dict[str, Any]]]
+
+
+class JobRunner:
+    """Pool of threads running queued jobs one at a time each."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        handlers: Dict[str, JobHandler],
+        workers: int = 1,
+        poll_seconds: float = 5.0,
+        stale_seconds: float = 120.0,
+    ):
+        self.session_factory = session_factory
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.stale_after = timedelta(seconds=stale_seconds)
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"job-runner-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def wake(self) -> None:
+        """Look for work now instead of at the next poll."""
+        self._wake.set()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop after the current chunks; running jobs are requeued."""
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                ran = self.run_next()
+            except Exception:
+                logger.exception("Job runner failed to run a job")
+                ran = False
+            if not ran:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def run_next(self) -> bool:
+        """Claim and run one job; returns False if there was nothing to run."""
+        db = self.session_factory()
+        try:
+            job = job_crud.claim_job(db, self.stale_after)
+            if job is None:
+                return False
+            self._run(db, job)
+            return True
+        finally:
+            db.close()
+
+    def _run(self, db: Session, job: Job) -> None:
+        context = JobContext(job, self._stopping)
+        result, error = None, None
+        try:
+            handler = self.handlers.get(job.type)
+            if handler is None:
+                raise ValueError(f"Unknown job type {job.type!r}")
+            result = handler(db, context)
+            status = "succeeded"
+        except JobCancelled:
+            status = "cancelled"
+        except JobInterrupted:
+            job_crud.finish_job(db, job.id, context.attempt, "queued")
+            return
+        except JobLost:
+            logger.warning("Job %d was taken over by another runner", job.id)
+            return
+        except Exception as exc:
+            logger.exception("Job %d failed", job.id)
+            db.rollback()
+            status, error = "failed", str(exc) or type(exc).__name__
+        job_crud.finish_job(db, job.id, context.attempt, status, result, error)
+        finished_jobs.inc(type=job.type, status=status)
+
+
+_runner: Optional[JobRunner] = None
+
+
+def start_job_runner(
+    session_factory: Callable[[], Session], handlers: Dict[str, JobHandler]
+) -> None:
+    """Start this process's runner threads."""
+    global _runner
+    if _runner is not None:
+        return
+    _runner = JobRunner(
+        session_factory,
+        handlers,
+        workers=settings.JOB_WORKERS,
+        poll_seconds=settings.JOB_POLL_SECONDS,
+        stale_seconds=settings.JOB_STALE_SECONDS,
+    )
+    _runner.start()
+
+
+def stop_job_runner() -> None:
+    """Stop the runner threads, requeueing the jobs they were running."""
+    global _runner
+    if _runner is not None:
+        _runner.stop()
+        _runner = None
+
+
+def wake_job_runner() -> None:
+    """Tell this process's runner a job was queued."""
+    if _runner is not None:
+        _runner.wake()
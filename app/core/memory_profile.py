@@ -0,0 +1,179 @@
+"""
+Opt-in per-route memory profiling with tracemalloc.
+
+For every request the profiler records how much traced memory the request
+left behind (its allocation delta) and, when it ran alone, the peak above
+its starting point, grouped by route template. Top allocation sites, and
+the sites that grew since the last reset, come from tracemalloc snapshots.
+
+Traced memory is process-wide: a request's delta includes whatever requests
+running at the same time allocated, which is why peaks are only kept for
+requests that did not overlap another one. Drive one route at a time (as
+``scripts.soak_memory`` does) for exact numbers. Tracing slows allocations
+down considerably, so keep it off outside investigations.
+"""
+
+import gc
+import threading
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Frames of the profiler itself and of the import machinery are noise
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+# (sequence number, ran alone so far, traced bytes at start)
+RequestToken = Tuple[int, bool, int]
+
+
+@dataclass
+class RouteMemory:
+    """Memory recorded for one route template."""
+    requests: int = 0
+    delta_bytes: int = 0
+    max_delta_bytes: int = 0
+    peak_samples: int = 0
+    peak_bytes: int = 0
+    max_peak_bytes: int = 0
+
+    def as_dict(self, route: str) -> Dict[str, Any]:
+        return {
+            "route": route,
+            "requests": self.requests,
+            "delta_bytes": self.delta_bytes,
+            "mean_delta_bytes": self.delta_bytes / self.requests,
+            "max_delta_bytes": self.max_delta_bytes,
+            "mean_peak_bytes": (
+                self.peak_bytes / self.peak_samples if self.peak_samples else None
+            ),
+            "max_peak_bytes": self.max_peak_bytes if self.peak_samples else None,
+        }
+
+
+class MemoryProfiler:
+    """Per-route allocation deltas and peaks, plus tracemalloc snapshots."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, RouteMemory] = {}
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._running = False
+        self._started_tracing = False
+        self._in_flight = 0
+        self._sequence = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running and tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10) -> None:
+        """Start tracing (unless something else already is) and reset."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._started_tracing = True
+        self._running = True
+        self.reset()
+
+    def stop(self) -> None:
+        self._running = False
+        self._baseline = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset(self) -> None:
+        """Forget route statistics and take a new baseline for growth sites."""
+        with self._lock:
+            self._routes.clear()
+        gc.collect()
+        self._baseline = self._snapshot()
+
+    def begin(self) -> RequestToken:
+        """Mark the start of a request."""
+        with self._lock:
+            alone = self._in_flight == 0
+            self._in_flight += 1
+            self._sequence += 1
+            if alone:
+                tracemalloc.reset_peak()
+            return self._sequence, alone, tracemalloc.get_traced_memory()[0]
+
+    def end(self, route: str, token: RequestToken) -> None:
+        """Record a finished request against its route template."""
+        current, peak = tracemalloc.get_traced_memory()
+        sequence, alone, started = token
+        with self._lock:
+            self._in_flight -= 1
+            stats = self._routes.setdefault(route, RouteMemory())
+            delta = current - started
+            stats.requests += 1
+            stats.delta_bytes += delta
+            stats.max_delta_bytes = max(stats.max_delta_bytes, delta)
+            # Nobody else started since, so the peak belongs to this request
+            if alone and sequence == self._sequence:
+                stats.peak_samples += 1
+                stats.peak_bytes += peak - started
+                stats.max_peak_bytes = max(stats.max_peak_bytes, peak - started)
+
+    def routes(self) -> List[Dict[str, Any]]:
+        """Per-route statistics, the routes retaining the most memory first."""
+        with self._lock:
+            rows = [stats.as_dict(route) for route, stats in self._routes.items()]
+        return sorted(rows, key=lambda row: row["delta_bytes"], reverse=True)
+
+    def top_sites(
+        self, limit: int = 20, group_by: str = "lineno"
+    ) -> List[Dict[str, Any]]:
+        """Sites holding the most traced memory now."""
+        return [
+            {
+                **_site(stat.traceback, group_by),
+                "size_bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in self._snapshot().statistics(group_by)[:limit]
+        ]
+
+    def growth_sites(
+        self, limit: int = 20, group_by: str = "lineno"
+    ) -> List[Dict[str, Any]]:
+        """Sites whose traced memory grew the most since the last reset."""
+        if self._baseline is None:
+            return []
+        gc.collect()
+        diffs = self._snapshot().compare_to(self._baseline, group_by)
+        grown = [diff for diff in diffs if diff.size_diff > 0][:limit]
+        return [
+            {
+                **_site(diff.traceback, group_by),
+                "size_diff_bytes": diff.size_diff,
+                "count_diff": diff.count_diff,
+            }
+            for diff in grown
+        ]
+
+    def traced_memory(self) -> Tuple[int, int]:
+        """Traced bytes now, and the peak since the last request ran alone."""
+        return tracemalloc.get_traced_memory()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+
+def _site(traceback: tracemalloc.Traceback, group_by: str) -> Dict[str, Any]:
+    """The allocating line (or file), and with ``traceback`` the whole stack."""
+    frame = traceback[-1]
+    if group_by == "filename":
+        return {"site": frame.filename}
+    site: Dict[str, Any] = {"site": f"{frame.filename}:{frame.lineno}"}
+    if group_by == "traceback":
+        site["traceback"] = [f"{f.filename}:{f.lineno}" for f in traceback]
+    return site
+
+
+memory_profiler = MemoryProfiler()
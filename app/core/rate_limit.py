@@ -0,0 +1,162 @@
+"""
+Login throttling.
+
+Token buckets keyed by client IP and by email cap how many login attempts
+reach the bcrypt verify. They are checked before any database or hashing
+work, so a flood of attempts costs a dictionary lookup each instead of a
+worker's CPU. Successful logins get their tokens back, so only failures
+count towards the limits.
+"""
+
+import ipaddress
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+throttled_logins = registry.counter(
+    "login_attempts_throttled_total",
+    "Login attempts rejected by the rate limiter",
+    labelnames=("key",),
+)
+
+
+class RateLimitStore(ABC):
+    """
+    Interface for rate limit stores.
+
+    ``hit`` takes one token from the bucket for ``key`` and returns 0 if the
+    attempt is allowed, otherwise the seconds until a token is available. A
+    shared backend (e.g. Redis running the same arithmetic in a Lua script)
+    can implement it to enforce limits across worker processes.
+    """
+
+    @abstractmethod
+    async def hit(self, key: str, capacity: int, window_seconds: float) -> float:
+        ...
+
+    @abstractmethod
+    async def refund(self, key: str, capacity: int) -> None:
+        """Give back the token taken by an attempt that turned out legitimate."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Per-process token buckets, dropping the least recently used keys."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> (tokens, last refill time)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def hit(self, key: str, capacity: int, window_seconds: float) -> float:
+        now = time.monotonic()
+        refill_rate = capacity / window_seconds
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / refill_rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def refund(self, key: str, capacity: int) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            tokens, updated_at = bucket
+            self._buckets[key] = (min(capacity, tokens + 1), updated_at)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class LoginThrottle:
+    """Limit login attempts per client IP and per email address."""
+
+    def __init__(self, store: Optional[RateLimitStore] = None):
+        self.store = store or InMemoryRateLimitStore(
+            max_keys=settings.LOGIN_RATE_LIMIT_MAX_KEYS
+        )
+
+    async def check(self, request: Request, email: str) -> None:
+        """Raise 429 with ``Retry-After`` if the IP or email is over its limit."""
+        window = settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS
+        for kind, key, capacity in _buckets(request, email):
+            wait = await self.store.hit(key, capacity, window)
+            if wait > 0:
+                throttled_logins.inc(key=kind)
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many login attempts, try again later",
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+
+    async def succeeded(self, request: Request, email: str) -> None:
+        """Return the tokens ``check`` took for a login that succeeded."""
+        for _, key, capacity in _buckets(request, email):
+            await self.store.refund(key, capacity)
+
+
+def _buckets(request: Request, email: str) -> List[Tuple[str, str, int]]:
+    """(kind, store key, capacity) of each enabled limit for a login attempt."""
+    limits = [
+        ("ip", client_ip(request), settings.LOGIN_RATE_LIMIT_PER_IP),
+        ("email", email.strip().lower(), settings.LOGIN_RATE_LIMIT_PER_EMAIL),
+    ]
+    return [
+        (kind, f"login:{kind}:{value}", capacity)
+        for kind, value, capacity in limits
+        if capacity > 0
+    ]
+
+
+def client_ip(request: Request) -> str:
+    """
+    Address of the client, seen through trusted reverse proxies.
+
+    ``X-Forwarded-For`` is only believed when the peer is in TRUSTED_PROXIES,
+    and then read from the right, skipping further trusted proxies, since
+    anything left of the last untrusted hop may be forged by the client.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(peer):
+        return peer
+    forwarded = ",".join(request.headers.getlist("x-forwarded-for"))
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    networks = _parse_networks(tuple(settings.TRUSTED_PROXIES))
+    return any(address in network for network in networks)
+
+
+@lru_cache(maxsize=8)
+def _parse_networks(proxies: Tuple[str, ...]) -> List:
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in proxies]
+
+
+login_throttle = LoginThrottle()
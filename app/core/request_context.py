@@ -0,0 +1,52 @@
+"""
+Per-request context shared by middleware, dependencies and database hooks.
+
+The context object is mutable and stored in a ContextVar, so code running
+in the threadpool on behalf of a request (which gets a copy of the context)
+still updates the same object.
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class RequestContext:
+    """What is known about the request currently being served."""
+    request_id: str
+    user_id: Optional[int] = None
+    db_time: float = 0.0
+    db_queries: int = 0
+
+
+_current: ContextVar[Optional[RequestContext]] = ContextVar(
+    "request_context", default=None
+)
+
+
+def current_request() -> Optional[RequestContext]:
+    """Context of the request being served, if any."""
+    return _current.get()
+
+
+def start_request(request_id: str) -> RequestContext:
+    """Begin a new request context in the current task."""
+    context = RequestContext(request_id=request_id)
+    _current.set(context)
+    return context
+
+
+def set_user_id(user_id: Optional[int]) -> None:
+    """Record the authenticated user on the current request."""
+    context = _current.get()
+    if context is not None:
+        context.user_id = user_id
+
+
+def record_db_time(seconds: float) -> None:
+    """Add one query's duration to the current request."""
+    context = _current.get()
+    if context is not None:
+        context.db_time += seconds
+        context.db_queries += 1
@@ -1,12 +1,40 @@
+import hashlib
+import hmac
+import secrets
 from datetime import datetime, timedelta
-from typing import Any, Union
-
-from jose import jwt
-from passlib.context import CryptContext
+from typing import TYPE_CHECKING, Any, Optional, Tuple, Union
 
 from app.core.config import settings
+from app.core.tokens import get_token_service
+
+# python-jose (with its cryptography backend, see app.core.tokens) and
+# passlib are imported on first use rather than with the app, which keeps
+# worker startup fast
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+
+def build_pwd_context(rounds: int) -> "CryptContext":
+    """Password hashing context using bcrypt with the given cost factor."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Built by get_pwd_context on first use
+pwd_context: Optional["CryptContext"] = None
+
+
+def get_pwd_context() -> "CryptContext":
+    """Password hashing context for the configured bcrypt cost."""
+    global pwd_context
+    if pwd_context is None:
+        pwd_context = build_pwd_context(settings.get_bcrypt_rounds())
+    return pwd_context
+
+
+# API keys look like "jpk_<prefix>_<secret>"
+API_KEY_SCHEME = "jpk"
 
 
 def create_access_token(
@@ -19,16 +47,66 @@ def create_access_token(
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    return get_token_service().encode({"exp": expire, "sub": str(subject)})
+
+
+def decode_access_token(token: str) -> Optional[str]:
+    """Subject of a valid, unexpired access token, or None."""
+    payload = get_token_service().decode(token)
+    if payload is None:
+        return None
+    return payload.get("sub")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and return ``(valid, new_hash)``.
+
+    ``new_hash`` is set when the stored hash was made with other parameters
+    (e.g. a different bcrypt cost) and should be replaced.
+    """
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Generate password hash."""
-    return pwd_context.hash(password) 
\ No newline at end of file
+    return get_pwd_context().hash(password)
+
+
+def generate_refresh_token() -> str:
+    """Generate an opaque refresh token with 256 bits of randomness."""
+    return secrets.token_urlsafe(32)
+
+
+def generate_api_key() -> Tuple[str, str]:
+    """Generate an API key, returning ``(prefix, key)``."""
+    prefix = secrets.token_hex(6)
+    return prefix, f"{API_KEY_SCHEME}_{prefix}_{secrets.token_urlsafe(32)}"
+
+
+def api_key_prefix(key: str) -> Optional[str]:
+    """Prefix of a well-formed API key, or None."""
+    scheme, _, rest = key.partition("_")
+    prefix, _, secret = rest.partition("_")
+    if scheme != API_KEY_SCHEME or not prefix or not secret:
+        return None
+    return prefix
+
+
+def hash_token(token: str) -> str:
+    """
+    Keyed SHA-256 digest of a random token, used for storage and lookup.
+
+    Unlike passwords, tokens are long and random, so a fast keyed hash is
+    enough; the key keeps a leaked table from being checked offline.
+    """
+    return hmac.new(
+        settings.SECRET_KEY.encode(), token.encode(), hashlib.sha256
+    ).hexdigest()
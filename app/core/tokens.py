@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+HMAC_ALGORITHMS = ("HS256", "HS384", "HS512")
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+
+
+@dataclass
+class TokenKey:
+    """Prepared jose keys for one ``kid``; ``signer`` is None for public keys."""
+    kid: Optional[str]
+    algorithm: str
+    signer: Optional[Any]
+    verifier: Any
+
+
+class TokenService:
+    """
+    Sign and verify access tokens with keys prepared once.
+
+    Each entry of ``keys`` is a dict with ``kid``, ``alg`` and either ``key``
+    (an HMAC secret or a PEM key) or ``key_file`` (a path to a PEM key).
+    HMAC and private keys sign and verify; public keys only verify, e.g.
+    in another service that checks this API's tokens. Tokens carry the signing key's
+    ``kid`` in their header and are verified with that key alone; tokens
+    without a ``kid`` (issued before rotation was set up) are tried against
+    every key with the token's algorithm.
+    """
+
+    def __init__(self, keys: List[Dict[str, Any]], signing_kid: str = ""):
+        from jose import jwk
+        from jose.exceptions import JOSEError
+
+        if not keys:
+            raise ValueError("TokenService needs at least one key")
+        self.keys: Dict[Optional[str], TokenKey] = {}
+        for entry in keys:
+            kid = entry.get("kid")
+            algorithm = entry.get("alg", "")
+            if kid in self.keys:
+                raise ValueError(f"Duplicate JWT key id {kid!r}")
+            if algorithm not in HMAC_ALGORITHMS + ASYMMETRIC_ALGORITHMS:
+                raise ValueError(
+                    f"JWT key {kid!r} has unsupported alg {algorithm!r}"
+                )
+            material = entry.get("key")
+            if material is None and entry.get("key_file"):
+                with open(entry["key_file"]) as key_file:
+                    material = key_file.read()
+            if not material:
+                raise ValueError(f"JWT key {kid!r} needs a key or key_file")
+            try:
+                key = jwk.construct(material, algorithm)
+            except JOSEError as exc:
+                raise ValueError(f"JWT key {kid!r} is invalid: {exc}") from exc
+            if algorithm in HMAC_ALGORITHMS:
+                self.keys[kid] = TokenKey(kid, algorithm, key, key)
+            elif key.is_public():
+                self.keys[kid] = TokenKey(kid, algorithm, None, key)
+            else:
+                # jose's EC keys verify only through their public half
+                self.keys[kid] = TokenKey(kid, algorithm, key, key.public_key())
+
+        if signing_kid:
+            signing_key = self.keys.get(signing_kid)
+            if signing_key is None or signing_key.signer is None:
+                raise ValueError(
+                    f"No private or HMAC JWT key with kid {signing_kid!r}"
+                )
+        else:
+            # None when every key is public: the service only verifies
+            signing_key = next(
+                (key for key in self.keys.values() if key.signer is not None), None
+            )
+        self.signing_key = signing_key
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        """Signed JWT for ``claims``, with the signing key's ``kid``."""
+        from jose import jwt
+
+        signing_key = self.signing_key
+        if signing_key is None:
+            raise ValueError("No JWT key can sign tokens")
+        headers = {"kid": signing_key.kid} if signing_key.kid is not None else None
+        return jwt.encode(
+            claims,
+            signing_key.signer,
+            algorithm=signing_key.algorithm,
+            headers=headers,
+        )
+
+    def decode(self, token: str) -> Optional[Dict[str, Any]]:
+        """Claims of a validly signed, unexpired token, or None."""
+        from jose import JWTError, jwt
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError:
+            return None
+        # The header is not verified yet: anything but a string kid is invalid
+        if not isinstance(header, dict):
+            return None
+        if "kid" in header:
+            if not isinstance(header["kid"], str):
+                return None
+            candidate = self.keys.get(header["kid"])
+            candidates = [candidate] if candidate is not None else []
+        else:
+            candidates = [
+                key for key in self.keys.values() if key.algorithm == header.get("alg")
+            ]
+        for candidate in candidates:
+            try:
+                return jwt.decode(
+                    token, candidate.verifier, algorithms=[candidate.algorithm]
+                )
+            except JWTError:
+                continue
+        return None
+
+    def jwks(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Public asymmetric keys as a JSON Web Key Set, for other services."""
+        public_keys = []
+        for key in self.keys.values():
+            if key.algorithm in HMAC_ALGORITHMS:
+                continue
+            public_keys.append(
+                {**key.verifier.to_dict(), "kid": key.kid, "use": "sig"}
+            )
+        return {"keys": public_keys}
+
+
+def build_token_service() -> TokenService:
+    """Token service for JWT_KEYS, or for SECRET_KEY and ALGORITHM without them."""
+    if settings.JWT_KEYS:
+        return TokenService(settings.JWT_KEYS, settings.JWT_SIGNING_KID)
+    # No kid header, so tokens look exactly as before rotation was configured
+    return TokenService(
+        [{"kid": None, "alg": settings.ALGORITHM, "key": settings.SECRET_KEY}]
+    )
+
+
+# Built by get_token_service on first use
+token_service: Optional[TokenService] = None
+
+
+def get_token_service() -> TokenService:
+    """Token service for the configured keys."""
+    global token_service
+    if token_service is None:
+        token_service = build_token_service()
+    return token_service
@@ -0,0 +1,128 @@
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import api_key_prefix, generate_api_key, hash_token
+from app.models.user import ApiKey, AuthUser
+
+
+class CachedApiKey(NamedTuple):
+    """What verifying a key needs, kept per worker to skip the database."""
+    expires_at: float
+    key_hash: Optional[str]  # None caches "no such key"
+    auth_user_id: int
+    name: str
+    email: str
+
+
+# Verified keys by prefix, least recently used first
+_key_cache: "OrderedDict[str, CachedApiKey]" = OrderedDict()
+_key_cache_lock = threading.Lock()
+
+
+def create_api_key(db: Session, auth_user_id: int, name: str) -> Tuple[ApiKey, str]:
+    """Issue an API key, returning the row and the full key (shown only once)."""
+    prefix, key = generate_api_key()
+    api_key = ApiKey(
+        name=name,
+        prefix=prefix,
+        key_hash=hash_token(key),
+        auth_user_id=auth_user_id,
+    )
+    db.add(api_key)
+    db.commit()
+    db.refresh(api_key)
+    _evict(prefix)
+    return api_key, key
+
+
+def get_api_keys(db: Session, auth_user_id: int) -> List[ApiKey]:
+    """List an auth user's API keys."""
+    return (
+        db.query(ApiKey)
+        .filter(ApiKey.auth_user_id == auth_user_id)
+        .order_by(ApiKey.id)
+        .all()
+    )
+
+
+def revoke_api_key(db: Session, auth_user_id: int, key_id: int) -> Optional[ApiKey]:
+    """
+    Revoke one of an auth user's API keys.
+
+    The key stops working at once in this worker; other workers drop it from
+    their cache within API_KEY_CACHE_TTL_SECONDS.
+    """
+    api_key = (
+        db.query(ApiKey)
+        .filter(ApiKey.id == key_id, ApiKey.auth_user_id == auth_user_id)
+        .first()
+    )
+    if api_key is None:
+        return None
+    if api_key.revoked_at is None:
+        api_key.revoked_at = datetime.utcnow()
+        db.commit()
+        db.refresh(api_key)
+    _evict(api_key.prefix)
+    return api_key
+
+
+def authenticate_api_key(db: Session, key: str) -> Optional[AuthUser]:
+    """
+    Resolve an API key to its (detached) auth user.
+
+    The prefix locates the key and its HMAC digest is compared in constant
+    time. Lookups, including misses, are cached for API_KEY_CACHE_TTL_SECONDS,
+    so a busy service client costs one hash and no queries per request.
+    """
+    prefix = api_key_prefix(key)
+    if prefix is None:
+        return None
+
+    with _key_cache_lock:
+        cached = _key_cache.get(prefix)
+        if cached is not None:
+            _key_cache.move_to_end(prefix)
+    if cached is None or cached.expires_at <= time.monotonic():
+        cached = _load_api_key(db, prefix)
+        with _key_cache_lock:
+            _key_cache[prefix] = cached
+            if len(_key_cache) > settings.API_KEY_CACHE_MAX_ENTRIES:
+                _key_cache.popitem(last=False)
+
+    if cached.key_hash is None or not hmac.compare_digest(
+        cached.key_hash, hash_token(key)
+    ):
+        return None
+    return AuthUser(id=cached.auth_user_id, name=cached.name, email=cached.email)
+
+
+def clear_api_key_cache() -> None:
+    """Forget all cached API key lookups."""
+    with _key_cache_lock:
+        _key_cache.clear()
+
+
+def _evict(prefix: str) -> None:
+    with _key_cache_lock:
+        _key_cache.pop(prefix, None)
+
+
+def _load_api_key(db: Session, prefix: str) -> CachedApiKey:
+    expires_at = time.monotonic() + settings.API_KEY_CACHE_TTL_SECONDS
+    row = db.execute(
+        select(ApiKey.key_hash, AuthUser.id, AuthUser.name, AuthUser.email)
+        .join(AuthUser, AuthUser.id == ApiKey.auth_user_id)
+        .where(ApiKey.prefix == prefix, ApiKey.revoked_at.is_(None))
+    ).first()
+    if row is None:
+        return CachedApiKey(expires_at, None, 0, "", "")
+    return CachedApiKey(expires_at, row.key_hash, row.id, row.name, row.email)
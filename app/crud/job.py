@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.user import Job
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+def create_job(
+    db: Session, job_type: str, params: Dict[str, Any], auth_user_id: int
+) -> Job:
+    """Queue a job for the runners."""
+    job = Job(
+        type=job_type,
+        status="queued",
+        params=params,
+        auth_user_id=auth_user_id,
+        rows_done=0,
+        cancel_requested=False,
+        attempts=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: int, auth_user_id: int) -> Optional[Job]:
+    """Get one of an auth user's jobs."""
+    return db.scalar(
+        select(Job).where(Job.id == job_id, Job.auth_user_id == auth_user_id)
+    )
+
+
+def cancel_job(db: Session, job_id: int, auth_user_id: int) -> Optional[Job]:
+    """
+    Cancel one of an auth user's jobs.
+
+    A queued job is cancelled at once; a running one stops at its next
+    checkpoint, keeping the chunks it already committed.
+    """
+    owned = and_(Job.id == job_id, Job.auth_user_id == auth_user_id)
+    db.execute(
+        update(Job.__table__)
+        .where(owned, Job.status == "queued")
+        .values(
+            status="cancelled", cancel_requested=True, finished_at=datetime.utcnow()
+        )
+    )
+    db.execute(
+        update(Job.__table__)
+        .where(owned, Job.status == "running")
+        .values(cancel_requested=True)
+    )
+    db.commit()
+    return get_job(db, job_id, auth_user_id)
+
+
+def claim_job(db: Session, stale_after: timedelta) -> Optional[Job]:
+    """
+    Take the oldest queued job, or a running one whose runner stopped sending
+    heartbeats, and mark it running for the caller.
+
+    The claim is a conditional UPDATE, so when several runners race for the
+    same job only one gets it; the others get None and simply try again.
+    """
+    now = datetime.utcnow()
+    claimable = or_(
+        Job.status == "queued",
+        and_(Job.status == "running", Job.heartbeat_at < now - stale_after),
+    )
+    job_id = db.scalar(select(Job.id).where(claimable).order_by(Job.id).limit(1))
+    if job_id is None:
+        db.rollback()
+        return None
+    row = db.execute(
+        update(Job.__table__)
+        .where(Job.id == job_id, claimable)
+        .values(
+            status="running",
+            started_at=func.coalesce(Job.started_at, now),
+            heartbeat_at=now,
+            attempts=Job.attempts + 1,
+        )
+        .returning(*Job.__table__.c)
+    ).mappings().first()
+    db.commit()
+    return Job(**row) if row is not None else None
+
+
+def save_progress(
+    db: Session,
+    job_id: int,
+    attempt: int,
+    rows_done: int,
+    checkpoint: Dict[str, Any],
+    rows_total: Optional[int] = None,
+) -> Optional[bool]:
+    """
+    Record progress in the caller's transaction, to be committed with the
+    chunk it describes.
+
+    Returns whether cancellation was requested, or None if another runner
+    has claimed the job since (``attempt`` is no longer the latest).
+    """
+    values = {
+        "rows_done": rows_done,
+        "checkpoint": checkpoint,
+        "heartbeat_at": datetime.utcnow(),
+    }
+    if rows_total is not None:
+        values["rows_total"] = rows_total
+    return db.scalar(
+        update(Job.__table__)
+        .where(Job.id == job_id, Job.attempts == attempt, Job.status == "running")
+        .values(**values)
+        .returning(Job.cancel_requested)
+    )
+
+
+def finish_job(
+    db: Session,
+    job_id: int,
+    attempt: int,
+    status: str,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> None:
+    """Record the outcome of a run, unless another runner took the job over."""
+    values: Dict[str, Any] = {"status": status, "result": result, "error": error}
+    if status in FINISHED_STATUSES:
+        values["finished_at"] = datetime.utcnow()
+    db.execute(
+        update(Job.__table__)
+        .where(Job.id == job_id, Job.attempts == attempt, Job.status == "running")
+        .values(**values)
+    )
+    db.commit()
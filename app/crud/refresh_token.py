@@ -0,0 +1,102 @@
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import generate_refresh_token, hash_token
+from app.models.user import AuthUser, RefreshToken
+
+
+def issue_refresh_token(db: Session, auth_user_id: int) -> str:
+    """Start a new token family for a login and return its first token."""
+    now = datetime.utcnow()
+    # Expired tokens are only kept around until the user's next login
+    db.execute(
+        delete(RefreshToken).where(
+            RefreshToken.auth_user_id == auth_user_id,
+            RefreshToken.expires_at <= now,
+        )
+    )
+    token = _add_refresh_token(db, auth_user_id, secrets.token_hex(16), now)
+    db.commit()
+    return token
+
+
+def rotate_refresh_token(db: Session, token: str) -> Optional[Tuple[str, str]]:
+    """
+    Exchange a refresh token for a new one in the same family.
+
+    Returns ``(email, new_token)``, or None if the token is unknown, expired
+    or revoked. Presenting a token that was already rotated means it leaked,
+    so the whole family is revoked.
+    """
+    now = datetime.utcnow()
+    token_hash = hash_token(token)
+    # Marking the token used and reading its owner is one statement, so two
+    # concurrent refreshes with the same token cannot both succeed.
+    used = db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(revoked_at=now)
+        .returning(RefreshToken.auth_user_id, RefreshToken.family_id)
+    ).first()
+    if used is None:
+        reused_family = db.scalar(
+            select(RefreshToken.family_id).where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.revoked_at.is_not(None),
+            )
+        )
+        if reused_family is not None:
+            _revoke_family(db, reused_family, now)
+        db.commit()
+        return None
+
+    email = db.scalar(select(AuthUser.email).where(AuthUser.id == used.auth_user_id))
+    new_token = _add_refresh_token(db, used.auth_user_id, used.family_id, now)
+    db.commit()
+    return email, new_token
+
+
+def revoke_refresh_token(db: Session, token: str) -> bool:
+    """Revoke the family of a refresh token, ending that login session."""
+    family_id = db.scalar(
+        select(RefreshToken.family_id).where(
+            RefreshToken.token_hash == hash_token(token)
+        )
+    )
+    if family_id is None:
+        return False
+    _revoke_family(db, family_id, datetime.utcnow())
+    db.commit()
+    return True
+
+
+def _add_refresh_token(
+    db: Session, auth_user_id: int, family_id: str, now: datetime
+) -> str:
+    token = generate_refresh_token()
+    db.add(
+        RefreshToken(
+            token_hash=hash_token(token),
+            family_id=family_id,
+            auth_user_id=auth_user_id,
+            expires_at=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        )
+    )
+    return token
+
+
+def _revoke_family(db: Session, family_id: str, now: datetime) -> None:
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
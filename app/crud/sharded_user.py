@@ -0,0 +1,255 @@
+"""
+User CRUD across the shards in USER_SHARD_URLS.
+
+Single-user operations run the functions in ``app.crud.user`` on the one
+shard the user's id hashes to. The user directory in the main database
+allocates ids and keeps emails and usernames unique across shards; its
+changes are committed only after the shard write succeeded, so a failed
+write leaves the directory as it was. Listings, counts and bulk operations
+query every shard concurrently and merge the results.
+"""
+
+import heapq
+from operator import attrgetter
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.crud import user as user_crud
+from app.crud.user import UserConflict
+from app.models.user import User, UserDirectory
+from app.schemas.user import UserCreate, UserFilter, UserUpdate
+from app.sharding import ShardSessions
+
+T = TypeVar("T")
+
+UNIQUE_FIELDS = {"email", "username"}
+
+
+def get_user(shards: ShardSessions, user_id: int) -> Optional[User]:
+    """Get user by ID from its shard."""
+    return user_crud.get_user(shards.for_user(user_id), user_id)
+
+
+def get_users(
+    shards: ShardSessions,
+    skip: int = 0,
+    limit: int = 100,
+    user_filter: Optional[UserFilter] = None,
+) -> List[User]:
+    """
+    Get a page of users ordered by id from all shards.
+
+    Each shard returns the ids of its first ``skip + limit`` matches, read
+    from the primary key index; merging those sorted lists yields the ids on
+    the page, and only those users are loaded, from the shards holding them.
+    """
+    conditions = user_crud.user_filter_conditions(user_filter) if user_filter else []
+    query = select(User.id).where(*conditions).order_by(User.id).limit(skip + limit)
+    id_lists = shards.scatter(lambda shard, db: list(db.scalars(query)))
+    page_ids = islice(heapq.merge(*id_lists), skip, skip + limit)
+
+    ids_by_shard: Dict[int, List[int]] = {}
+    for user_id in page_ids:
+        ids_by_shard.setdefault(shards.router.shard_for(user_id), []).append(user_id)
+
+    def load(shard: int, db: Session) -> List[User]:
+        ids = ids_by_shard[shard]
+        return user_crud.get_users(db, limit=len(ids), user_filter=UserFilter(ids=ids))
+
+    pages = shards.scatter(load, shards=sorted(ids_by_shard))
+    return list(heapq.merge(*pages, key=attrgetter("id")))
+
+
+def count_users(
+    shards: ShardSessions,
+    user_filter: Optional[UserFilter] = None,
+    exact: bool = False,
+) -> Tuple[int, bool]:
+    """
+    Count users on all shards, returning ``(count, estimated)``.
+
+    Cached like ``app.crud.user.count_users``; the total is estimated if any
+    shard's count was.
+    """
+    def count(conditions: list) -> Tuple[int, bool]:
+        counts = shards.scatter(
+            lambda shard, db: user_crud.count_rows(db, conditions, exact)
+        )
+        return sum(total for total, _ in counts), any(flag for _, flag in counts)
+
+    return user_crud.cached_count(user_filter, exact, count)
+
+
+def create_user(shards: ShardSessions, user: UserCreate) -> User:
+    """
+    Create a user on the shard its new id hashes to.
+
+    The id comes from inserting the user's email and username into the
+    directory, whose unique constraints decide conflicts across all shards.
+    """
+    directory = shards.directory
+    values = {"email": user.email, "username": user.username}
+    row = user_crud.insert_returning(
+        directory, UserDirectory, values, on_conflict_do_nothing=True
+    )
+    if row is None:
+        raise UserConflict(
+            user_crud.conflicting_field(directory, values, model=UserDirectory)
+        )
+    shard = shards.for_user(row["id"])
+    return _commit_after(
+        directory, lambda: user_crud.create_user(shard, user, user_id=row["id"])
+    )
+
+
+def upsert_user(
+    shards: ShardSessions, user_id: int, user: UserCreate
+) -> Tuple[Optional[User], bool]:
+    """
+    Replace the user on its shard, creating it with this id if it does not
+    exist. Returns the user and whether it was created.
+    """
+    directory = shards.directory
+    keys = {"email": user.email, "username": user.username}
+    if not _update_directory(directory, user_id, keys):
+        values = {"id": user_id, **keys}
+        row = user_crud.insert_returning(
+            directory, UserDirectory, values, on_conflict_do_nothing=True
+        )
+        if row is None:
+            field = user_crud.conflicting_field(
+                directory, values, model=UserDirectory
+            )
+            # The id was taken since our UPDATE: replace the new user instead
+            if field != "id" or not _update_directory(directory, user_id, keys):
+                raise UserConflict(field)
+        else:
+            user_crud.advance_id_sequence(directory, UserDirectory, user_id)
+    shard = shards.for_user(user_id)
+    return _commit_after(
+        directory, lambda: user_crud.upsert_user(shard, user_id=user_id, user=user)
+    )
+
+
+def update_user(
+    shards: ShardSessions, user_id: int, user_update: UserUpdate
+) -> Optional[User]:
+    """Partially update the user on its shard."""
+    directory = shards.directory
+    keys = user_update.dict(include=UNIQUE_FIELDS, exclude_unset=True)
+    if keys and not _update_directory(directory, user_id, keys):
+        return None
+    shard = shards.for_user(user_id)
+    return _commit_after(
+        directory,
+        lambda: user_crud.update_user(shard, user_id=user_id, user_update=user_update),
+    )
+
+
+def delete_user(shards: ShardSessions, user_id: int) -> Optional[User]:
+    """Delete the user from its shard and the directory."""
+    directory = shards.directory
+    directory.execute(
+        delete(UserDirectory.__table__).where(UserDirectory.id == user_id)
+    )
+    shard = shards.for_user(user_id)
+    return _commit_after(
+        directory, lambda: user_crud.delete_user(shard, user_id=user_id)
+    )
+
+
+def bulk_update_users(
+    shards: ShardSessions,
+    user_filter: UserFilter,
+    user_update: UserUpdate,
+    dry_run: bool = False,
+) -> Tuple[int, Dict[str, int]]:
+    """
+    Update every matching user, one transaction per shard.
+
+    Email and username cannot be bulk updated, so the directory is untouched.
+    """
+    results = shards.scatter(
+        lambda shard, db: user_crud.bulk_update_users(
+            db, user_filter=user_filter, user_update=user_update, dry_run=dry_run
+        )
+    )
+    return _merge_bulk_results(results)
+
+
+def bulk_delete_users(
+    shards: ShardSessions, user_filter: UserFilter, dry_run: bool = False
+) -> Tuple[int, Dict[str, int]]:
+    """Delete every matching user from the shards, then from the directory."""
+    if dry_run:
+        results = shards.scatter(
+            lambda shard, db: user_crud.bulk_delete_users(db, user_filter, dry_run=True)
+        )
+        return _merge_bulk_results(results)
+
+    def delete_matching(shard: int, db: Session) -> List[int]:
+        conditions = user_crud.user_filter_conditions(user_filter)
+        # The deleted ids are needed to drop the users from the directory
+        statement = delete(User.__table__).where(*conditions).returning(User.id)
+        user_ids = list(db.scalars(statement))
+        db.commit()
+        user_crud.invalidate_user_counts()
+        return user_ids
+
+    results = shards.scatter(delete_matching)
+    user_ids = [user_id for ids in results for user_id in ids]
+    directory = shards.directory
+    for chunk in user_crud.chunked(user_ids):
+        directory.execute(
+            delete(UserDirectory.__table__).where(UserDirectory.id.in_(chunk))
+        )
+    directory.commit()
+    return len(user_ids), {"users": len(user_ids)}
+
+
+def _update_directory(directory: Session, user_id: int, keys: Dict[str, Any]) -> bool:
+    """
+    Set the user's email and/or username in the directory; False if the user
+    has no entry. Taking another user's value raises UserConflict.
+    """
+    try:
+        result = directory.execute(
+            update(UserDirectory.__table__)
+            .where(UserDirectory.id == user_id)
+            .values(**keys)
+        )
+    except IntegrityError:
+        directory.rollback()
+        raise UserConflict(
+            user_crud.conflicting_field(
+                directory, keys, user_id=user_id, model=UserDirectory
+            )
+        )
+    return result.rowcount > 0
+
+
+def _commit_after(directory: Session, write: Callable[[], T]) -> T:
+    """Run the shard write, then commit the directory changes made for it."""
+    try:
+        result = write()
+    except Exception:
+        directory.rollback()
+        raise
+    directory.commit()
+    return result
+
+
+def _merge_bulk_results(
+    results: List[Tuple[int, Dict[str, int]]]
+) -> Tuple[int, Dict[str, int]]:
+    matched = 0
+    affected: Dict[str, int] = {}
+    for shard_matched, shard_affected in results:
+        matched += shard_matched
+        for table, count in shard_affected.items():
+            affected[table] = affected.get(table, 0) + count
+    return matched, affected
@@ -0,0 +1,367 @@
+"""
+Read-only in-memory snapshot of users for serving without the database.
+
+Data is kept column-wise: ids in ``array('q')`` and string fields in lists of
+interned strings, so repeated values (cities, company names, ...) are stored
+once. Each user's response body is pre-rendered to JSON bytes, so serving a
+page is a lookup plus a byte join. Filterable columns are indexed by value,
+so a filtered listing reads only the matching users.
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import threading
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.user import Address, Company, Geo, User
+from app.schemas.user import UserFilter
+
+logger = logging.getLogger(__name__)
+
+# Re-read a little before the watermark to catch transactions that stamped
+# updated_at before the previous refresh but committed after it.
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+STRING_COLUMNS = (
+    "name",
+    "username",
+    "email",
+    "phone",
+    "website",
+    "street",
+    "suite",
+    "city",
+    "zipcode",
+    "lat",
+    "lng",
+    "company_name",
+    "catchPhrase",
+    "bs",
+)
+ID_COLUMNS = ("id", "address_id", "geo_id", "company_id")
+
+# UserFilter field -> snapshot column
+FILTER_COLUMNS = {
+    "name": "name",
+    "username": "username",
+    "email": "email",
+    "website": "website",
+    "city": "city",
+    "company_name": "company_name",
+}
+
+
+def snapshot_query(since: Optional[datetime] = None):
+    """Joined query returning one flat row per user."""
+    query = (
+        select(
+            User.id,
+            User.name,
+            User.username,
+            User.email,
+            User.phone,
+            User.website,
+            User.updated_at,
+            Address.id.label("address_id"),
+            Address.street,
+            Address.suite,
+            Address.city,
+            Address.zipcode,
+            Geo.id.label("geo_id"),
+            Geo.lat,
+            Geo.lng,
+            Company.id.label("company_id"),
+            Company.name.label("company_name"),
+            Company.catchPhrase,
+            Company.bs,
+        )
+        .select_from(User)
+        .outerjoin(Address, Address.user_id == User.id)
+        .outerjoin(Geo, Geo.address_id == Address.id)
+        .outerjoin(Company, Company.user_id == User.id)
+    )
+    if since is None:
+        # Loading in id order keeps inserts into the sorted id list cheap
+        return query.order_by(User.id)
+    # Changed users come straight off the updated_at index, without a sort
+    return query.where(User.updated_at >= since).order_by(User.updated_at)
+
+
+class UserSnapshot:
+    """Compact columnar copy of all users, kept fresh by incremental refreshes."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.loaded = False
+
+    def _reset(self) -> None:
+        self._ids: Dict[str, array] = {column: array("q") for column in ID_COLUMNS}
+        self._strings: Dict[str, List[Optional[str]]] = {
+            column: [] for column in STRING_COLUMNS
+        }
+        self._json: List[bytes] = []
+        # Filter column -> value -> id of the one user with it, or sorted ids
+        self._index: Dict[str, Dict[str, Union[int, array]]] = {
+            column: {} for column in FILTER_COLUMNS.values()
+        }
+        self._rows: Dict[int, int] = {}
+        self._order = array("q")
+        self._free_rows: List[int] = []
+        self.watermark: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def load(self, db: Session) -> None:
+        """Rebuild the snapshot from scratch."""
+        rows = db.execute(snapshot_query().execution_options(yield_per=10000))
+        with self._lock:
+            self._reset()
+            self._apply(rows.mappings())
+            self.loaded = True
+        logger.info("Loaded %d users into the in-memory snapshot", len(self))
+
+    def clear(self) -> None:
+        """Drop all rows; the snapshot counts as not loaded until the next load."""
+        with self._lock:
+            self._reset()
+            self.loaded = False
+
+    def refresh(self, db: Session) -> Tuple[int, int]:
+        """
+        Apply changes since the last load or refresh.
+
+        Users written since the watermark are re-read and upserted. Deletions
+        are detected by comparing row counts, and only then is the id list
+        read to find the removed users. Returns ``(upserted, removed)``.
+        """
+        if not self.loaded:
+            self.load(db)
+            return len(self), 0
+
+        since = self.watermark - WATERMARK_OVERLAP if self.watermark else None
+        changed = db.execute(snapshot_query(since=since)).mappings().all()
+        with self._lock:
+            upserted = self._apply(changed)
+        removed = 0
+        if db.scalar(select(func.count(User.id))) != len(self):
+            live_ids = set(db.scalars(select(User.id)))
+            with self._lock:
+                for user_id in [i for i in self._rows if i not in live_ids]:
+                    self._remove(user_id)
+                    removed += 1
+        return upserted, removed
+
+    def get(self, user_id: int) -> Optional[bytes]:
+        """Pre-rendered JSON for one user."""
+        with self._lock:
+            row = self._rows.get(user_id)
+            return self._json[row] if row is not None else None
+
+    def get_page(
+        self, skip: int = 0, limit: int = 100, user_filter: Optional[UserFilter] = None
+    ) -> Tuple[bytes, int]:
+        """JSON array for a page of users ordered by id, and the total match count."""
+        with self._lock:
+            matches = self._matching_ids(user_filter)
+            if matches is None:
+                matches = self._order
+            page = [self._rows[i] for i in matches[skip:skip + limit]]
+            body = b"[" + b",".join(self._json[row] for row in page) + b"]"
+            return body, len(matches)
+
+    def _matching_ids(
+        self, user_filter: Optional[UserFilter]
+    ) -> Optional[Sequence[int]]:
+        """
+        Sorted ids of the users matching the filter, or None without criteria.
+
+        Starts from the fewest candidates any one criterion allows (read from
+        the index) and checks the other criteria on those users only.
+        """
+        criteria = user_filter.dict(exclude_none=True) if user_filter else {}
+        if not criteria:
+            return None
+        wanted_ids = None
+        candidates = []
+        if "ids" in criteria:
+            wanted_ids = set(criteria.pop("ids"))
+            candidates.append(sorted(i for i in wanted_ids if i in self._rows))
+        for field, value in criteria.items():
+            ids = self._index[FILTER_COLUMNS[field]].get(value, ())
+            candidates.append([ids] if isinstance(ids, int) else ids)
+        smallest = min(candidates, key=len)
+        if len(candidates) == 1:
+            return smallest
+        checks = [
+            (self._strings[FILTER_COLUMNS[field]], value)
+            for field, value in criteria.items()
+        ]
+        return [
+            user_id
+            for user_id in smallest
+            if (wanted_ids is None or user_id in wanted_ids)
+            and all(column[self._rows[user_id]] == value for column, value in checks)
+        ]
+
+    def _apply(self, rows: Iterable) -> int:
+        count = 0
+        for values in rows:
+            self._upsert(values)
+            updated_at = values["updated_at"]
+            if updated_at is not None and (
+                self.watermark is None or updated_at > self.watermark
+            ):
+                self.watermark = updated_at
+            count += 1
+        return count
+
+    def _upsert(self, values) -> None:
+        user_id = values["id"]
+        row = self._rows.get(user_id)
+        if row is None:
+            row = self._free_rows.pop() if self._free_rows else len(self._json)
+            if row == len(self._json):
+                for column in ID_COLUMNS:
+                    self._ids[column].append(-1)
+                for column in STRING_COLUMNS:
+                    self._strings[column].append(None)
+                self._json.append(b"")
+            self._rows[user_id] = row
+            insort(self._order, user_id)
+
+        for column in ID_COLUMNS:
+            value = values[column]
+            self._ids[column][row] = -1 if value is None else value
+        for column in STRING_COLUMNS:
+            value = values[column]
+            if value is not None:
+                value = sys.intern(value)
+            if column in self._index:
+                self._unindex(column, self._strings[column][row], user_id)
+                self._add_to_index(column, value, user_id)
+            self._strings[column][row] = value
+        self._json[row] = self._render(row)
+
+    def _remove(self, user_id: int) -> None:
+        row = self._rows.pop(user_id)
+        del self._order[bisect_left(self._order, user_id)]
+        for column in ID_COLUMNS:
+            self._ids[column][row] = -1
+        for column in STRING_COLUMNS:
+            if column in self._index:
+                self._unindex(column, self._strings[column][row], user_id)
+            self._strings[column][row] = None
+        self._json[row] = b""
+        self._free_rows.append(row)
+
+    def _add_to_index(self, column: str, value: Optional[str], user_id: int) -> None:
+        if value is None:
+            return
+        index = self._index[column]
+        ids = index.get(value)
+        if ids is None:
+            # Most values (emails, usernames) belong to one user: no array
+            index[value] = user_id
+        elif isinstance(ids, int):
+            index[value] = array("q", sorted((ids, user_id)))
+        else:
+            insort(ids, user_id)
+
+    def _unindex(self, column: str, value: Optional[str], user_id: int) -> None:
+        if value is None:
+            return
+        index = self._index[column]
+        ids = index.get(value)
+        if isinstance(ids, int):
+            if ids == user_id:
+                del index[value]
+        elif ids is not None:
+            position = bisect_left(ids, user_id)
+            if position < len(ids) and ids[position] == user_id:
+                del ids[position]
+                if len(ids) == 1:
+                    index[value] = ids[0]
+
+    def _render(self, row: int) -> bytes:
+        """Render a user exactly like the ``User`` response schema."""
+        strings, ids = self._strings, self._ids
+        user = {
+            "name": strings["name"][row],
+            "username": strings["username"][row],
+            "email": strings["email"][row],
+            "phone": strings["phone"][row],
+            "website": strings["website"][row],
+            "id": ids["id"][row],
+            "address": None,
+            "company": None,
+        }
+        if ids["address_id"][row] != -1:
+            user["address"] = {
+                "street": strings["street"][row],
+                "suite": strings["suite"][row],
+                "city": strings["city"][row],
+                "zipcode": strings["zipcode"][row],
+                "id": ids["address_id"][row],
+                "geo": None,
+            }
+            if ids["geo_id"][row] != -1:
+                user["address"]["geo"] = {
+                    "lat": strings["lat"][row],
+                    "lng": strings["lng"][row],
+                    "id": ids["geo_id"][row],
+                }
+        if ids["company_id"][row] != -1:
+            user["company"] = {
+                "name": strings["company_name"][row],
+                "catchPhrase": strings["catchPhrase"][row],
+                "bs": strings["bs"][row],
+                "id": ids["company_id"][row],
+            }
+        return json.dumps(user, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+user_snapshot = UserSnapshot()
+
+
+async def keep_snapshot_fresh(
+    snapshot: UserSnapshot, session_factory: Callable[[], Session], interval: float
+) -> None:
+    """Refresh the snapshot from the database every ``interval`` seconds."""
+    loop = asyncio.get_running_loop()
+
+    def refresh() -> Tuple[int, int]:
+        db = session_factory()
+        try:
+            return snapshot.refresh(db)
+        finally:
+            db.close()
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            upserted, removed = await loop.run_in_executor(None, refresh)
+            if upserted or removed:
+                logger.info(
+                    "Snapshot refresh: %d upserted, %d removed", upserted, removed
+                )
+        except Exception:
+            logger.exception("Snapshot refresh failed")
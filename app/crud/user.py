@@ -1,9 +1,42 @@
-from typing import Optional, List
+import time
+from typing import Any, Callable, Dict, Optional, List, Tuple
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.user import User, Address, Geo, Company, AuthUser
-from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+from app.schemas.user import UserCreate, UserFilter, UserUpdate
+from app.core.security import get_password_hash, verify_and_update_password
+
+# Upper bound on ids bound into a single bulk statement
+BULK_CHUNK_SIZE = 10000
+
+# Cached user counts: filter key -> (expires_at, count, estimated)
+_count_cache: Dict[str, Tuple[float, int, bool]] = {}
+COUNT_CACHE_MAX_ENTRIES = 1024
+
+
+class BulkFilterConflict(Exception):
+    """A bulk update would change filtered columns of more than one table."""
+
+    def __init__(self, tables: List[str]):
+        super().__init__(f"changes to filtered columns of {', '.join(tables)}")
+        self.tables = tables
+
+
+class UserConflict(Exception):
+    """
+    A write collided with another user's unique column.
+
+    ``field`` is ``"email"``, ``"username"`` or ``"id"``, or None when the
+    conflicting row was gone by the time we looked for it.
+    """
+
+    def __init__(self, field: Optional[str]):
+        super().__init__(f"{field or 'user'} already exists")
+        self.field = field
 
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
@@ -21,76 +54,438 @@ def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-    """Get list of users with pagination."""
-    return db.query(User).offset(skip).limit(limit).all()
+def get_users(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    user_filter: Optional[UserFilter] = None,
+) -> List[User]:
+    """Get list of users with pagination, optionally filtered."""
+    query = db.query(User)
+    if user_filter is not None:
+        query = query.filter(*user_filter_conditions(user_filter))
+    return query.order_by(User.id).offset(skip).limit(limit).all()
+
 
+def count_users(
+    db: Session, user_filter: Optional[UserFilter] = None, exact: bool = False
+) -> Tuple[int, bool]:
+    """
+    Count users matching the filter, returning ``(count, estimated)``.
 
-def create_user(db: Session, user: UserCreate) -> User:
-    """Create new user with address and company."""
-    # Create user
-    db_user = User(
-        name=user.name,
-        username=user.username,
-        email=user.email,
-        phone=user.phone,
-        website=user.website,
+    Counts are cached until the next write (or USER_COUNT_CACHE_TTL_SECONDS,
+    for writes made by other workers). Filtered counts are always exact. An
+    unfiltered count on PostgreSQL uses the planner's row estimate once the
+    table exceeds USER_COUNT_ESTIMATE_THRESHOLD rows, unless ``exact`` is set.
+    """
+    return cached_count(
+        user_filter, exact, lambda conditions: count_rows(db, conditions, exact)
     )
-    db.add(db_user)
-    db.flush()  # Get the user ID
-    
-    # Create address
-    db_address = Address(
-        street=user.address.street,
-        suite=user.address.suite,
-        city=user.address.city,
-        zipcode=user.address.zipcode,
-        user_id=db_user.id,
+
+
+def cached_count(
+    user_filter: Optional[UserFilter],
+    exact: bool,
+    count: Callable[[list], Tuple[int, bool]],
+) -> Tuple[int, bool]:
+    """Serve a count from the cache, or get it from ``count(conditions)``."""
+    conditions = user_filter_conditions(user_filter) if user_filter else []
+    key = user_filter.json(exclude_none=True) if conditions else ""
+    cached = _count_cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        if not (exact and cached[2]):
+            return cached[1], cached[2]
+
+    count_value, estimated = count(conditions)
+    if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+        _count_cache.clear()
+    expires_at = time.monotonic() + settings.USER_COUNT_CACHE_TTL_SECONDS
+    _count_cache[key] = (expires_at, count_value, estimated)
+    return count_value, estimated
+
+
+def count_rows(db: Session, conditions: list, exact: bool) -> Tuple[int, bool]:
+    """Count users matching the conditions, estimating when allowed."""
+    if not conditions and not exact and db.get_bind().dialect.name == "postgresql":
+        estimate = db.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass")
+        )
+        if estimate is not None and estimate >= settings.USER_COUNT_ESTIMATE_THRESHOLD:
+            return int(estimate), True
+    return db.scalar(select(func.count(User.id)).where(*conditions)), False
+
+
+def invalidate_user_counts() -> None:
+    """Drop cached user counts after a write."""
+    _count_cache.clear()
+
+
+def create_user(
+    db: Session, user: UserCreate, user_id: Optional[int] = None
+) -> User:
+    """
+    Create a user with address, geo and company using one INSERT per table.
+
+    The user row is inserted with ON CONFLICT DO NOTHING, so the unique
+    email and username constraints (and the primary key, for an explicit
+    ``user_id``) decide conflicts atomically instead of SELECTs beforehand;
+    a conflict raises UserConflict. Rows come back through RETURNING and the
+    returned user is not attached to the session.
+    """
+    values = user.dict(exclude={"address", "company"})
+    if user_id is not None:
+        values["id"] = user_id
+    user_row = insert_returning(db, User, values, on_conflict_do_nothing=True)
+    if user_row is None:
+        # DO NOTHING leaves the transaction usable and nothing to roll back
+        raise UserConflict(conflicting_field(db, values))
+
+    address = user.address.dict()
+    geo = address.pop("geo")
+    rows = {User: user_row}
+    rows[Address] = insert_returning(
+        db, Address, {**address, "user_id": user_row["id"]}
     )
-    db.add(db_address)
-    db.flush()  # Get the address ID
-    
-    # Create geo
-    db_geo = Geo(
-        lat=user.address.geo.lat,
-        lng=user.address.geo.lng,
-        address_id=db_address.id,
+    rows[Geo] = insert_returning(
+        db, Geo, {**geo, "address_id": rows[Address]["id"]}
     )
-    db.add(db_geo)
-    
-    # Create company
-    db_company = Company(
-        name=user.company.name,
-        catchPhrase=user.company.catchPhrase,
-        bs=user.company.bs,
-        user_id=db_user.id,
+    rows[Company] = insert_returning(
+        db, Company, {**user.company.dict(), "user_id": user_row["id"]}
     )
-    db.add(db_company)
-    
+    if user_id is not None:
+        advance_id_sequence(db, User, user_id)
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    invalidate_user_counts()
+    return _build_user(rows)
+
+
+def upsert_user(
+    db: Session, user_id: int, user: UserCreate
+) -> Tuple[Optional[User], bool]:
+    """
+    Replace the user, creating it with this id if it does not exist.
+
+    Returns the user and whether it was created. If another request creates
+    the same id between our UPDATE and INSERT, the primary key conflict
+    sends us back to updating it.
+    """
+    replaced = replace_user(db, user_id=user_id, user=user)
+    if replaced is not None:
+        return replaced, False
+    try:
+        return create_user(db, user, user_id=user_id), True
+    except UserConflict as conflict:
+        if conflict.field != "id":
+            raise
+    return replace_user(db, user_id=user_id, user=user), False
+
+
+def dialect_insert(db: Session, table):
+    """INSERT construct with ON CONFLICT support for the session's database."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def insert_returning(
+    db: Session,
+    model: type,
+    values: Dict[str, Any],
+    on_conflict_do_nothing: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """Insert one row and return it, or None if it hit a unique constraint."""
+    table = model.__table__
+    statement = dialect_insert(db, table).values(**values)
+    if on_conflict_do_nothing:
+        statement = statement.on_conflict_do_nothing()
+    return db.execute(statement.returning(*table.c)).mappings().first()
+
+
+def advance_id_sequence(db: Session, model: type, row_id: int) -> None:
+    """
+    Keep PostgreSQL's id sequence ahead of an explicitly chosen id.
+
+    The sequence is only read (``pg_sequence_last_value`` is NULL until its
+    first use), so ids below it do not consume a value.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(
+        text(
+            "SELECT setval(seq, :id) FROM (SELECT CAST("
+            "pg_get_serial_sequence(:table, 'id') AS regclass) AS seq) AS serial "
+            "WHERE :id > COALESCE(pg_sequence_last_value(seq), 0)"
+        ),
+        {"table": model.__tablename__, "id": row_id},
+    )
+
+
+def conflicting_field(
+    db: Session,
+    values: Dict[str, Any],
+    user_id: Optional[int] = None,
+    model: type = User,
+) -> Optional[str]:
+    """First unique column in ``values`` already used by another user."""
+    for field in ("email", "username", "id"):
+        if field not in values:
+            continue
+        query = select(model.id).where(getattr(model, field) == values[field])
+        if user_id is not None:
+            query = query.where(model.id != user_id)
+        if db.scalar(query) is not None:
+            return field
+    return None
 
 
 def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
-    """Update user."""
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user:
-        update_data = user_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_user, field, value)
-        db.commit()
-        db.refresh(db_user)
-    return db_user
+    """Partially update user, merging nested address, geo and company fields."""
+    return _write_user_changes(db, user_id, user_update.dict(exclude_unset=True))
+
+
+def replace_user(db: Session, user_id: int, user: UserCreate) -> Optional[User]:
+    """Replace all user fields, including nested address, geo and company."""
+    return _write_user_changes(db, user_id, user.dict())
+
+
+def _write_user_changes(
+    db: Session, user_id: int, changes: Dict[str, Any]
+) -> Optional[User]:
+    """
+    Apply changes with one UPDATE ... RETURNING per touched table.
+
+    All statements run in a single transaction. Tables that were not touched
+    are read with one joined SELECT, so a full replacement needs no reads at
+    all. The returned user is built from the returned rows and is not attached
+    to the session, so serializing it never triggers lazy loads. Taking
+    another user's email or username raises UserConflict.
+    """
+    address_changes = changes.pop("address", None) or {}
+    geo_changes = address_changes.pop("geo", None) or {}
+    company_changes = changes.pop("company", None) or {}
+    if changes or address_changes or geo_changes or company_changes:
+        changes["updated_at"] = func.now()
+    address_ids = select(Address.id).where(Address.user_id == user_id)
+
+    statements = {
+        User: (changes, User.id == user_id),
+        Address: (address_changes, Address.user_id == user_id),
+        Geo: (geo_changes, Geo.address_id.in_(address_ids.scalar_subquery())),
+        Company: (company_changes, Company.user_id == user_id),
+    }
+    rows: Dict[type, Optional[Dict[str, Any]]] = {}
+    try:
+        for model, (values, condition) in statements.items():
+            if values:
+                table = model.__table__
+                result = db.execute(
+                    update(table).where(condition).values(**values).returning(*table.c)
+                )
+                rows[model] = result.mappings().first()
+    except IntegrityError:
+        # The new email or username belongs to another user
+        db.rollback()
+        raise UserConflict(conflicting_field(db, changes, user_id=user_id))
+
+    missing = [model for model in statements if model not in rows]
+    if missing:
+        rows.update(_select_user_rows(db, user_id, missing))
+
+    if rows.get(User) is None:
+        # No row matched, so nothing was written; leave the transaction to
+        # the caller (an upsert continues with the INSERT in it)
+        return None
+    db.commit()
+    invalidate_user_counts()
+    return _build_user(rows)
+
+
+def _select_user_rows(
+    db: Session, user_id: int, models: List[type]
+) -> Dict[type, Optional[Dict[str, Any]]]:
+    """Read the given user tables in one joined query."""
+    columns = [
+        column.label(f"{model.__tablename__}_{column.key}")
+        for model in models
+        for column in model.__table__.c
+    ]
+    query = (
+        select(*columns)
+        .select_from(User)
+        .outerjoin(Address, Address.user_id == User.id)
+        .outerjoin(Geo, Geo.address_id == Address.id)
+        .outerjoin(Company, Company.user_id == User.id)
+        .where(User.id == user_id)
+    )
+    row = db.execute(query).mappings().first()
+    rows = {}
+    for model in models:
+        prefix = f"{model.__tablename__}_"
+        rows[model] = None
+        if row is not None and row[prefix + "id"] is not None:
+            rows[model] = {
+                column.key: row[prefix + column.key] for column in model.__table__.c
+            }
+    return rows
+
+
+def _build_user(rows: Dict[type, Optional[Dict[str, Any]]]) -> User:
+    """Assemble a detached user object graph from plain table rows."""
+    user = User(**rows[User])
+    if rows.get(Address) is not None:
+        user.address = Address(**rows[Address])
+        if rows.get(Geo) is not None:
+            user.address.geo = Geo(**rows[Geo])
+    if rows.get(Company) is not None:
+        user.company = Company(**rows[Company])
+    return user
 
 
 def delete_user(db: Session, user_id: int) -> Optional[User]:
-    """Delete user."""
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user:
-        db.delete(db_user)
+    """
+    Delete user with a single DELETE statement.
+
+    Address, geo and company rows are removed by ON DELETE CASCADE; the user
+    is read once beforehand so the deleted representation can be returned.
+    """
+    rows = _select_user_rows(db, user_id, [User, Address, Geo, Company])
+    if rows[User] is None:
+        return None
+    db.execute(delete(User.__table__).where(User.id == user_id))
+    db.commit()
+    invalidate_user_counts()
+    return _build_user(rows)
+
+
+def bulk_update_users(
+    db: Session, user_filter: UserFilter, user_update: UserUpdate, dry_run: bool = False
+) -> Tuple[int, Dict[str, int]]:
+    """
+    Update every user matching the filter with one UPDATE per touched table.
+
+    Each statement selects its rows with the filter as a subquery. A table
+    whose filtered column is being changed is updated last, so the earlier
+    statements still see the old values; changing filtered columns of more
+    than one table raises BulkFilterConflict.
+
+    Returns the number of matched users and the affected row count per table.
+    With ``dry_run`` nothing is written and the counts are what would change.
+    """
+    conditions = user_filter_conditions(user_filter)
+    matching = select(User.id).where(*conditions)
+    changes = user_update.dict(exclude_unset=True)
+    address_changes = changes.pop("address", None) or {}
+    geo_changes = address_changes.pop("geo", None) or {}
+    company_changes = changes.pop("company", None) or {}
+    # Any change bumps updated_at (read by snapshot refreshes), but users only
+    # count as affected when their own columns change
+    report_users = bool(changes)
+    if changes or address_changes or geo_changes or company_changes:
+        changes["updated_at"] = func.now()
+
+    updates = [
+        (model, values)
+        for model, values in (
+            (User, changes),
+            (Address, address_changes),
+            (Geo, geo_changes),
+            (Company, company_changes),
+        )
+        if values
+    ]
+    filtered = _filtered_columns(user_filter)
+    moving = [
+        model for model, values in updates if filtered.get(model, set()) & set(values)
+    ]
+    if len(moving) > 1:
+        raise BulkFilterConflict([model.__tablename__ for model in moving])
+    updates.sort(key=lambda update_: update_[0] in moving)
+
+    matched = db.scalar(select(func.count()).select_from(User).where(*conditions))
+    affected = {}
+    for model, values in updates:
+        table = model.__table__
+        condition = _owned_by(model, matching)
+        reported = model is not User or report_users
+        if dry_run:
+            if reported:
+                statement = select(func.count()).select_from(table).where(condition)
+                affected[table.name] = db.scalar(statement)
+        else:
+            statement = update(table).where(condition).values(**values)
+            rowcount = db.execute(statement).rowcount
+            if reported:
+                affected[table.name] = rowcount
+    if not dry_run:
         db.commit()
-    return db_user
+        invalidate_user_counts()
+    return matched, affected
+
+
+def bulk_delete_users(
+    db: Session, user_filter: UserFilter, dry_run: bool = False
+) -> Tuple[int, Dict[str, int]]:
+    """
+    Delete every user matching the filter with one DELETE statement; related
+    rows go by ON DELETE CASCADE.
+    """
+    conditions = user_filter_conditions(user_filter)
+    if dry_run:
+        matched = db.scalar(select(func.count()).select_from(User).where(*conditions))
+        return matched, {"users": matched}
+
+    deleted = db.execute(delete(User.__table__).where(*conditions)).rowcount
+    db.commit()
+    invalidate_user_counts()
+    return deleted, {"users": deleted}
+
+
+def user_filter_conditions(user_filter: UserFilter) -> list:
+    """Build WHERE conditions on User for the given filter."""
+    criteria = user_filter.dict(exclude_none=True)
+    conditions = []
+    if "ids" in criteria:
+        conditions.append(User.id.in_(criteria["ids"]))
+    for field in ("name", "username", "email", "website"):
+        if field in criteria:
+            conditions.append(getattr(User, field) == criteria[field])
+    if "city" in criteria:
+        cities = select(Address.user_id).where(Address.city == criteria["city"])
+        conditions.append(User.id.in_(cities))
+    if "company_name" in criteria:
+        company_name = criteria["company_name"]
+        companies = select(Company.user_id).where(Company.name == company_name)
+        conditions.append(User.id.in_(companies))
+    return conditions
+
+
+def _filtered_columns(user_filter: UserFilter) -> Dict[type, set]:
+    """Columns per model that the filter's conditions read."""
+    criteria = user_filter.dict(exclude_none=True)
+    return {
+        User: {"name", "username", "email", "website"} & set(criteria),
+        Address: {"city"} & set(criteria),
+        Company: {"name"} if "company_name" in criteria else set(),
+    }
+
+
+def _owned_by(model: type, user_ids):
+    """
+    Condition selecting the rows of ``model`` that belong to the given users
+    (a list of ids or a subquery selecting them).
+    """
+    if model is User:
+        return User.id.in_(user_ids)
+    if model is Geo:
+        address_ids = select(Address.id).where(Address.user_id.in_(user_ids))
+        return Geo.address_id.in_(address_ids)
+    return model.user_id.in_(user_ids)
+
+
+def chunked(user_ids: List[int]):
+    """Slices of at most BULK_CHUNK_SIZE ids, to keep IN lists bounded."""
+    for start in range(0, len(user_ids), BULK_CHUNK_SIZE):
+        yield user_ids[start:start + BULK_CHUNK_SIZE]
 
 
 # Auth user CRUD operations
@@ -99,14 +494,24 @@ def get_auth_user_by_email(db: Session, email: str) -> Optional[AuthUser]:
     return db.query(AuthUser).filter(AuthUser.email == email).first()
 
 
-def create_auth_user(db: Session, name: str, email: str, password: str) -> AuthUser:
-    """Create auth user with hashed password."""
+def create_auth_user(
+    db: Session, name: str, email: str, password: str
+) -> Optional[AuthUser]:
+    """
+    Create auth user with hashed password, or return None if the email is
+    already registered. The unique constraint decides, in one statement.
+    """
     hashed_password = get_password_hash(password)
-    db_user = AuthUser(name=name, email=email, password_hash=hashed_password)
-    db.add(db_user)
+    row = insert_returning(
+        db,
+        AuthUser,
+        {"name": name, "email": email, "password_hash": hashed_password},
+        on_conflict_do_nothing=True,
+    )
+    if row is None:
+        return None
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    return AuthUser(**row)
 
 
 def authenticate_user(db: Session, email: str, password: str) -> Optional[AuthUser]:
@@ -114,6 +519,11 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[AuthUs
     user = get_auth_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    valid, new_hash = verify_and_update_password(password, user.password_hash)
+    if not valid:
         return None
+    if new_hash is not None:
+        # Stored with an outdated cost factor; upgrade while we have the password
+        user.password_hash = new_hash
+        db.commit()
     return user 
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""
+User import and export, run as background jobs.
+
+Files live in a directory per auth user under JOB_FILES_DIR and are named
+by the caller, never given as a path; exports never overwrite a file. Both
+directions stream JSON Lines in chunks of JOB_CHUNK_SIZE users and commit a
+checkpoint (file offset included) with every chunk, so a resumed job
+neither repeats nor skips users and never re-reads what it has done.
+"""
+
+import json
+import os
+from typing import IO, Any, Dict, Iterator, List
+
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.jobs import JobContext
+from app.crud import user as user_crud
+from app.crud.snapshot import snapshot_query
+from app.models.user import User
+from app.schemas.user import UserCreate
+
+
+def job_file(name: str, auth_user_id: int) -> str:
+    """Path of one auth user's job file; ``name`` must be a plain file name."""
+    if not name or os.path.basename(name) != name or name in (".", ".."):
+        raise ValueError(f"Invalid job file name {name!r}")
+    return os.path.join(settings.JOB_FILES_DIR, str(auth_user_id), name)
+
+
+def import_users(db: Session, context: JobContext) -> Dict[str, Any]:
+    """
+    Create the users in a JSON Lines file.
+
+    Users keep their ``id`` when it is given. Users whose id, email or
+    username is taken are skipped, and lines that are not valid users are
+    counted as invalid; neither stops the import. The file is read a chunk
+    at a time, and a resumed import seeks to the checkpointed offset.
+    """
+    path = job_file(context.params["file"], context.auth_user_id)
+    counts = {"created": 0, "skipped": 0, "invalid": 0}
+    counts.update(
+        {key: value for key, value in context.checkpoint.items() if key in counts}
+    )
+    done = context.checkpoint.get("items", 0)
+    total = context.rows_total
+    with open(path, "rb") as source:
+        if total is None:
+            total = sum(1 for line in source if line.strip())
+        source.seek(context.checkpoint.get("offset", 0))
+        while True:
+            chunk = _read_lines(source, settings.JOB_CHUNK_SIZE)
+            if not chunk:
+                return counts
+            # create_user commits each user; joining the job session's
+            # transaction in "rollback_only" mode commits the chunk with the save
+            writer = Session(
+                bind=db.connection(), join_transaction_mode="rollback_only"
+            )
+            try:
+                for line in chunk:
+                    counts[_import_item(writer, line)] += 1
+            finally:
+                writer.close()
+            done += len(chunk)
+            checkpoint = {"items": done, "offset": source.tell(), **counts}
+            context.save(db, done, checkpoint, rows_total=total)
+
+
+def _read_lines(source: IO[bytes], size: int) -> List[bytes]:
+    """Up to ``size`` non-blank lines from the current position."""
+    lines = []
+    while len(lines) < size:
+        line = source.readline()
+        if not line:
+            break
+        if line.strip():
+            lines.append(line)
+    return lines
+
+
+def _import_item(db: Session, line: bytes) -> str:
+    """Create the user on one line; returns the counter it belongs to."""
+    try:
+        item = json.loads(line)
+        user = UserCreate.parse_obj(item)
+    except (ValueError, ValidationError):
+        return "invalid"
+    user_id = item.get("id")
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        user_id = None
+    try:
+        user_crud.create_user(db, user, user_id=user_id)
+    except user_crud.UserConflict:
+        return "skipped"
+    return "created"
+
+
+def export_users(db: Session, context: JobContext) -> Dict[str, Any]:
+    """
+    Write every user as JSON Lines, in id order and in the API's user shape.
+
+    The file must not exist yet: it is created exclusively and claimed by
+    an empty checkpoint straight away. Each chunk is synced to disk before
+    its checkpoint (last id and file offset) is committed; a resumed export
+    truncates what was written after the last checkpoint and carries on
+    from there.
+    """
+    name = context.params.get("file") or f"users-{context.job_id}.jsonl"
+    path = job_file(name, context.auth_user_id)
+    last_id = context.checkpoint.get("last_id", 0)
+    offset = context.checkpoint.get("offset")
+    done = context.rows_done
+    if offset is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Raises FileExistsError rather than replacing someone's file
+        with open(path, "xb"):
+            pass
+        offset = 0
+        context.save(db, done, {"last_id": last_id, "offset": offset})
+    total = done + db.scalar(
+        select(func.count()).select_from(User).where(User.id > last_id)
+    )
+    with open(path, "r+b") as out:
+        out.seek(offset)
+        out.truncate()
+        for rows in _user_chunks(db, last_id, settings.JOB_CHUNK_SIZE):
+            out.write(
+                b"".join(
+                    json.dumps(
+                        _user_document(row), ensure_ascii=False, separators=(",", ":")
+                    ).encode()
+                    + b"\n"
+                    for row in rows
+                )
+            )
+            out.flush()
+            os.fsync(out.fileno())
+            done += len(rows)
+            checkpoint = {"last_id": rows[-1]["id"], "offset": out.tell()}
+            context.save(db, done, checkpoint, rows_total=max(total, done))
+    return {"file": name, "users": done}
+
+
+def _user_chunks(db: Session, last_id: int, size: int) -> Iterator[list]:
+    """Flat user rows in id order, a chunk at a time by keyset paging."""
+    while True:
+        rows = db.execute(
+            snapshot_query().where(User.id > last_id).limit(size)
+        ).mappings().all()
+        if not rows:
+            return
+        last_id = rows[-1]["id"]
+        yield rows
+
+
+def _user_document(row) -> Dict[str, Any]:
+    """A flat ``snapshot_query`` row in the ``User`` response shape."""
+    user = {
+        "name": row["name"],
+        "username": row["username"],
+        "email": row["email"],
+        "phone": row["phone"],
+        "website": row["website"],
+        "id": row["id"],
+        "address": None,
+        "company": None,
+    }
+    if row["address_id"] is not None:
+        user["address"] = {
+            "street": row["street"],
+            "suite": row["suite"],
+            "city": row["city"],
+            "zipcode": row["zipcode"],
+            "id": row["address_id"],
+            "geo": None,
+        }
+        if row["geo_id"] is not None:
+            user["address"]["geo"] = {
+                "lat": row["lat"],
+                "lng": row["lng"],
+                "id": row["geo_id"],
+            }
+    if row["company_id"] is not None:
+        user["company"] = {
+            "name": row["company_name"],
+            "catchPhrase": row["catchPhrase"],
+            "bs": row["bs"],
+            "id": row["company_id"],
+        }
+    return user
+
+
+JOB_TYPES = {"import_users": import_users, "export_users": export_users}
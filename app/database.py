@@ -1,19 +1,102 @@
-from sqlalchemy import create_engine
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.core.request_context import record_db_time
+from app.sqlite import create_sqlite_engine, is_file_database
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """
+    The database engine, created on first use.
+
+    Creating it loads the database driver, which is left out of importing the
+    app; the lifespan creates it in each worker, after gunicorn forks. Each
+    worker gets its share of the connection budget; WEB_CONCURRENCY is
+    resolved by the launcher before fork. SQLite files get the embedded mode
+    of app.sqlite.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if is_file_database(settings.DATABASE_URL):
+                    _engine = create_sqlite_engine(settings.DATABASE_URL)
+                elif settings.DATABASE_URL.startswith("sqlite"):
+                    _engine = create_engine(settings.DATABASE_URL)
+                else:
+                    _engine = create_engine(
+                        settings.DATABASE_URL,
+                        **settings.get_db_pool_options(settings.WEB_CONCURRENCY or 1),
+                    )
+    return _engine
+
+
+def __getattr__(name: str):
+    # ``from app.database import engine`` keeps working, lazily
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class LazySessionmaker(sessionmaker):
+    """Session factory that binds to the engine when the first session is made."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None and "bind" not in local_kw:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
 
-# Create database engine
-engine = create_engine(settings.DATABASE_URL)
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = LazySessionmaker(autocommit=False, autoflush=False)
 
 # Create base class for models
 Base = declarative_base()
 
 
+@event.listens_for(Engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """SQLite only enforces foreign keys (and ON DELETE CASCADE) when asked to."""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def record_query_time(conn, cursor, statement, parameters, context, executemany):
+    """Attribute query time to the request being served (access log db_ms)."""
+    record_db_time(time.perf_counter() - conn.info["query_started_at"].pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def discard_query_timer(exception_context):
+    """A failed statement never reaches after_cursor_execute: drop its timer."""
+    conn = exception_context.connection
+    if conn is None or exception_context.statement is None:
+        # Failed before any statement ran (e.g. while connecting): no timer
+        return
+    started = conn.info.get("query_started_at")
+    if started:
+        started.pop()
+
+
 def get_db():
     """Dependency to get database session."""
     db = SessionLocal()
@@ -1,8 +1,65 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.access_log import start_access_log, stop_access_log
 from app.core.config import settings
+from app.core.jobs import start_job_runner, stop_job_runner
+from app.core.memory_profile import memory_profiler
+from app.core.tokens import get_token_service
+from app.core.metrics import registry
 from app.api.v1.api import api_router
+from app.crud.snapshot import keep_snapshot_fresh, user_snapshot
+from app.crud.user_transfer import JOB_TYPES
+from app.database import SessionLocal, get_engine
+from app.sharding import get_shard_router
+from app.middleware.access_log import AccessLogMiddleware
+from app.middleware.idempotency import IdempotencyMiddleware
+from app.middleware.load_shedding import LoadSheddingMiddleware
+from app.middleware.memory_profile import MemoryProfileMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start the access log writer, the job runner and (when enabled) memory
+    profiling, and in read-only mode load the snapshot and keep it fresh
+    while serving.
+    """
+    if settings.MEMORY_PROFILING_ENABLED:
+        memory_profiler.start(settings.MEMORY_PROFILING_FRAMES)
+    # Load the database drivers (shards included) and token keys now rather
+    # than on the first request, so a bad JWT key stops startup
+    get_engine()
+    get_shard_router()
+    get_token_service()
+    if settings.ACCESS_LOG_ENABLED:
+        start_access_log()
+    if settings.JOB_RUNNER_ENABLED and not settings.READ_ONLY_MODE:
+        start_job_runner(SessionLocal, JOB_TYPES)
+    refresher = None
+    if settings.READ_ONLY_MODE:
+        db = SessionLocal()
+        try:
+            await run_in_threadpool(user_snapshot.load, db)
+        finally:
+            db.close()
+        refresher = asyncio.create_task(
+            keep_snapshot_fresh(
+                user_snapshot, SessionLocal, settings.SNAPSHOT_REFRESH_SECONDS
+            )
+        )
+    yield
+    if refresher is not None:
+        refresher.cancel()
+    await run_in_threadpool(stop_job_runner)
+    stop_access_log()
+    memory_profiler.stop()
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -10,8 +67,21 @@ app = FastAPI(
     version=settings.VERSION,
     description=settings.DESCRIPTION,
     openapi_url="/api/v1/openapi.json",
+    lifespan=lifespan,
 )
 
+# Per-route memory deltas; innermost, so only the request's own work counts
+app.add_middleware(MemoryProfileMiddleware)
+
+# Replay responses for retried writes carrying an Idempotency-Key
+app.add_middleware(IdempotencyMiddleware)
+
+# Shed excess load with 503 before it exhausts the database pool
+app.add_middleware(LoadSheddingMiddleware)
+
+# Structured access log; outside the limiter so shed requests are logged too
+app.add_middleware(AccessLogMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -19,6 +89,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Total-Count-Estimated"],
 )
 
 # Include API router
@@ -39,4 +110,12 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Process metrics in the Prometheus text format."""
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4"
+    )
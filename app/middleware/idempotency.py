@@ -0,0 +1,270 @@
+import asyncio
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.security import API_KEY_SCHEME, decode_access_token
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAY_HEADER = (b"idempotent-replayed", b"true")
+
+
+@dataclass
+class StoredResponse:
+    """First response recorded for an idempotency key."""
+    fingerprint: str
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    expires_at: float = 0.0
+
+
+class IdempotencyKeyInProgress(Exception):
+    """Raised when a concurrent request holds the key for too long."""
+
+
+class IdempotencyStore(ABC):
+    """
+    Interface for idempotency stores.
+
+    ``acquire`` either returns a stored response to replay or reserves the key
+    for the caller, who must then call ``save`` (optional) and ``release``.
+    A shared backend (e.g. Redis with SET NX + TTL) can implement the same
+    methods to make keys work across worker processes.
+    """
+
+    @abstractmethod
+    async def acquire(self, key: str, timeout: float) -> Optional[StoredResponse]:
+        ...
+
+    @abstractmethod
+    def save(self, key: str, response: StoredResponse) -> None:
+        ...
+
+    @abstractmethod
+    def release(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """Per-process store with TTL expiry and in-flight request locking."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._responses: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Event] = {}
+
+    async def acquire(self, key: str, timeout: float) -> Optional[StoredResponse]:
+        deadline = time.monotonic() + timeout
+        while True:
+            stored = self._responses.get(key)
+            if stored is not None:
+                if stored.expires_at > time.monotonic():
+                    return stored
+                del self._responses[key]
+
+            event = self._in_flight.get(key)
+            if event is None:
+                self._in_flight[key] = asyncio.Event()
+                return None
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise IdempotencyKeyInProgress(key)
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                raise IdempotencyKeyInProgress(key)
+
+    def save(self, key: str, response: StoredResponse) -> None:
+        response.expires_at = time.monotonic() + self.ttl_seconds
+        self._responses[key] = response
+        self._responses.move_to_end(key)
+        while len(self._responses) > self.max_entries:
+            self._responses.popitem(last=False)
+
+    def release(self, key: str) -> None:
+        event = self._in_flight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def clear(self) -> None:
+        self._responses.clear()
+        for event in self._in_flight.values():
+            event.set()
+        self._in_flight.clear()
+
+
+idempotency_store = InMemoryIdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    max_entries=settings.IDEMPOTENCY_MAX_KEYS,
+)
+
+
+class IdempotencyMiddleware:
+    """
+    Replay the first response for requests carrying an ``Idempotency-Key``.
+
+    Keys are scoped to the caller's identity (the access token's subject, so a
+    retry with a refreshed token still replays, or the API key), and the
+    request method, path and body are fingerprinted so a key cannot be reused
+    for a different request. Server errors (5xx) are not stored, so those
+    requests may be retried with the same key.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: Optional[IdempotencyStore] = None,
+        path_prefixes: Sequence[str] = (
+            "/api/v1/users",
+            "/api/v1/batch",
+            "/api/v1/jobs",
+        ),
+        methods: Sequence[str] = ("POST", "PUT", "PATCH", "DELETE"),
+        lock_timeout: Optional[float] = None,
+    ):
+        self.app = app
+        self.store = store or idempotency_store
+        self.path_prefixes = tuple(path_prefixes)
+        self.methods = set(methods)
+        self.lock_timeout = (
+            lock_timeout
+            if lock_timeout is not None
+            else settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS
+        )
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in self.methods
+            or not scope["path"].startswith(self.path_prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        principal = _principal(headers)
+        key = f"{principal}:{idempotency_key.decode('latin-1')}"
+        request_line = [scope["method"].encode(), scope["path"].encode()]
+        fingerprint = hashlib.sha256(
+            b"\n".join(request_line + [scope["query_string"], body])
+        ).hexdigest()
+
+        try:
+            stored = await self.store.acquire(key, self.lock_timeout)
+        except IdempotencyKeyInProgress:
+            await _send_error(
+                send, 409, "A request with this Idempotency-Key is still in progress"
+            )
+            return
+
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                await _send_error(
+                    send, 422, "Idempotency-Key was already used for another request"
+                )
+                return
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": stored.status_code,
+                    "headers": stored.headers + [REPLAY_HEADER],
+                }
+            )
+            await send({"type": "http.response.body", "body": stored.body})
+            return
+
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def replay_receive():
+            nonlocal body
+            if body is None:
+                return await receive()
+            message = {"type": "http.request", "body": body, "more_body": False}
+            body = None
+            return message
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+                if not message.get("more_body", False) and response["status"] < 500:
+                    self.store.save(
+                        key,
+                        StoredResponse(
+                            fingerprint=fingerprint,
+                            status_code=response["status"],
+                            headers=response["headers"],
+                            body=b"".join(response["body"]),
+                        ),
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        finally:
+            self.store.release(key)
+
+
+def _principal(headers: Dict[bytes, bytes]) -> str:
+    """
+    Who is making the request, for scoping idempotency keys.
+
+    A valid access token stands for its subject. API keys stand for
+    themselves (hashed): their prefix alone is not secret, and the middleware
+    runs before the key is checked. Anything else, including expired or
+    invalid tokens, is scoped to the raw credentials as sent.
+    """
+    api_key = headers.get(b"x-api-key", b"")
+    scheme, _, token = headers.get(b"authorization", b"").partition(b" ")
+    if not api_key and scheme.lower() == b"bearer":
+        if token.startswith(f"{API_KEY_SCHEME}_".encode()):
+            api_key = token
+        else:
+            subject = decode_access_token(token.decode("latin-1"))
+            if subject is not None:
+                return f"sub:{subject}"
+    if api_key:
+        return f"key:{hashlib.sha256(api_key).hexdigest()}"
+    credentials = headers.get(b"authorization", b"")
+    return f"raw:{hashlib.sha256(credentials).hexdigest()}"
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _send_error(send, status_code: int, detail: str) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    body = json.dumps({"detail": detail}).encode()
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,256 @@
+"""
+Adaptive concurrency limiting and load shedding.
+
+Each worker process admits at most ``limit`` requests at a time. The limit
+adapts AIMD-style: while the limit is fully used and requests complete at
+their group's usual latency it grows by about one per round of requests.
+It shrinks by CONCURRENCY_LIMIT_BACKOFF (at most once per request latency)
+when a group's recent latency exceeds CONCURRENCY_LATENCY_TOLERANCE times
+its long-run average, or when requests fail with a 5xx.
+
+Requests over the limit wait briefly in a queue served by priority (reads,
+then writes, then batches, then auth) and are shed with 503 + ``Retry-After``
+when the queue is full or the wait times out. When the database slows down, excess
+load is therefore rejected early instead of piling up until the connection
+pool times out.
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+shed_requests = registry.counter(
+    "requests_shed_total",
+    "Requests rejected with 503 by the concurrency limiter",
+    labelnames=("group",),
+)
+concurrency_limit = registry.gauge(
+    "concurrency_limit", "Current adaptive concurrency limit of this worker"
+)
+
+# Never limited: load balancers must see an overloaded worker as alive
+UNLIMITED_PATHS = {"/", "/health", "/metrics"}
+
+
+@dataclass(frozen=True)
+class RouteGroup:
+    """Requests sharing latency statistics and an admission priority."""
+    name: str
+    priority: int  # lower is admitted first
+    max_share: float  # fraction of the limit this group may occupy
+
+
+READ = RouteGroup("read", priority=0, max_share=1.0)
+WRITE = RouteGroup("write", priority=1, max_share=1.0)
+# A batch runs up to BATCH_MAX_REQUESTS operations: its latency is not a
+# write's, and long batches must not hold the whole limit
+BATCH = RouteGroup("batch", priority=2, max_share=0.5)
+# bcrypt makes auth requests expensive; they must not crowd out reads
+AUTH = RouteGroup("auth", priority=3, max_share=0.5)
+GROUPS = (READ, WRITE, BATCH, AUTH)
+
+
+def route_group(method: str, path: str) -> Optional[RouteGroup]:
+    """Group for a request, or None if it bypasses the limiter."""
+    if path in UNLIMITED_PATHS:
+        return None
+    if path.startswith("/api/v1/auth"):
+        return AUTH
+    if path.startswith("/api/v1/batch"):
+        return BATCH
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return READ
+    return WRITE
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit with a priority queue of waiting requests."""
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        max_queue: int,
+        latency_tolerance: float,
+        backoff: float,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.group_in_flight: Dict[str, int] = {group.name: 0 for group in GROUPS}
+        # group -> (recent, usual) exponential moving averages of latency
+        self.latency: Dict[str, Tuple[float, float]] = {}
+        self._waiters: Dict[int, Deque[Tuple[RouteGroup, asyncio.Future]]] = {
+            group.priority: deque() for group in GROUPS
+        }
+        self._last_decrease = 0.0
+        concurrency_limit.set(self.limit)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    async def acquire(self, group: RouteGroup, timeout: float) -> bool:
+        """Wait up to ``timeout`` for a slot; False means the request is shed."""
+        if self._can_admit(group) and not self._waiting_ahead(group):
+            self._admit(group)
+            return True
+        if self.queued >= self.max_queue or timeout <= 0:
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (group, future)
+        self._waiters[group.priority].append(entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            if future.done():
+                # Admitted just as the wait timed out
+                return True
+            self._waiters[group.priority].remove(entry)
+            future.cancel()
+            return False
+        except BaseException:
+            # The client went away while queued; give back a slot handed to it
+            if future.done():
+                self._free(group)
+            else:
+                self._waiters[group.priority].remove(entry)
+                future.cancel()
+            raise
+
+    def release(self, group: RouteGroup, latency: float, failed: bool) -> None:
+        """Free a slot and adapt the limit from the request's outcome."""
+        saturated = self.in_flight >= int(self.limit)
+        recent, usual = self._observe(group, latency)
+
+        now = time.monotonic()
+        if failed or recent > usual * self.latency_tolerance:
+            # Back off at most once per request latency, not per slow request
+            if now - self._last_decrease >= latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        concurrency_limit.set(round(self.limit, 2))
+        self._free(group)
+
+    def _observe(self, group: RouteGroup, latency: float) -> Tuple[float, float]:
+        """Update and return (recent, usual) moving averages of group latency."""
+        recent, usual = self.latency.get(group.name, (latency, latency))
+        recent += (latency - recent) * 0.1
+        usual += (latency - usual) * 0.01
+        self.latency[group.name] = (recent, usual)
+        return recent, usual
+
+    def _free(self, group: RouteGroup) -> None:
+        self.in_flight -= 1
+        self.group_in_flight[group.name] -= 1
+        self._wake()
+
+    def _can_admit(self, group: RouteGroup) -> bool:
+        limit = int(self.limit)
+        group_limit = max(1, int(limit * group.max_share))
+        return (
+            self.in_flight < limit
+            and self.group_in_flight[group.name] < group_limit
+        )
+
+    def _waiting_ahead(self, group: RouteGroup) -> bool:
+        return any(
+            waiters
+            for priority, waiters in self._waiters.items()
+            if priority <= group.priority
+        )
+
+    def _admit(self, group: RouteGroup) -> None:
+        self.in_flight += 1
+        self.group_in_flight[group.name] += 1
+
+    def _wake(self) -> None:
+        for priority in sorted(self._waiters):
+            waiters = self._waiters[priority]
+            while waiters and self.in_flight < int(self.limit):
+                group, future = waiters[0]
+                if future.done():
+                    waiters.popleft()
+                    continue
+                if not self._can_admit(group):
+                    break
+                waiters.popleft()
+                self._admit(group)
+                future.set_result(True)
+
+
+class LoadSheddingMiddleware:
+    """Admit requests through an adaptive concurrency limiter."""
+
+    def __init__(self, app, limiter: Optional[AdaptiveConcurrencyLimiter] = None):
+        self.app = app
+        self.limiter = limiter or AdaptiveConcurrencyLimiter(
+            initial_limit=settings.CONCURRENCY_LIMIT_INITIAL,
+            min_limit=settings.CONCURRENCY_LIMIT_MIN,
+            max_limit=settings.CONCURRENCY_LIMIT_MAX,
+            max_queue=settings.CONCURRENCY_QUEUE_SIZE,
+            latency_tolerance=settings.CONCURRENCY_LATENCY_TOLERANCE,
+            backoff=settings.CONCURRENCY_LIMIT_BACKOFF,
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.LOAD_SHEDDING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        group = route_group(scope["method"], scope["path"])
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        timeout = settings.CONCURRENCY_QUEUE_TIMEOUT_SECONDS
+        if not await self.limiter.acquire(group, timeout):
+            shed_requests.inc(group=group.name)
+            await _send_overloaded(send, retry_after=math.ceil(max(timeout, 1)))
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def record_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, record_send)
+        finally:
+            self.limiter.release(
+                group, time.perf_counter() - started, failed=status >= 500
+            )
+
+
+async def _send_overloaded(send, retry_after: int) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        }
+    )
+    body = json.dumps({"detail": "Server is overloaded, retry later"}).encode()
+    await send({"type": "http.response.body", "body": body})
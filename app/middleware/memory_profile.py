@@ -0,0 +1,25 @@
+from app.core.memory_profile import memory_profiler
+from app.middleware.access_log import route_template
+
+
+class MemoryProfileMiddleware:
+    """
+    Record each request's memory delta and peak against its route template.
+
+    Does nothing unless the memory profiler is running
+    (MEMORY_PROFILING_ENABLED).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not memory_profiler.running:
+            await self.app(scope, receive, send)
+            return
+
+        token = memory_profiler.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            memory_profiler.end(route_template(scope), token)
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import (
+    JSON, Boolean, Column, DateTime, Integer, String, ForeignKey, func
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -14,11 +16,25 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     email = Column(String, unique=True, index=True)
     phone = Column(String)
-    website = Column(String)
-
-    # Relationships
-    address = relationship("Address", back_populates="user", uselist=False)
-    company = relationship("Company", back_populates="user", uselist=False)
+    website = Column(String, index=True)
+    # Bumped by every write to the user or its nested rows (incremental sync)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
+
+    # Relationships (child rows are removed by ON DELETE CASCADE in the database)
+    address = relationship(
+        "Address",
+        back_populates="user",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    company = relationship(
+        "Company",
+        back_populates="user",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
 
 
 class Address(Base):
@@ -28,13 +44,19 @@ class Address(Base):
     id = Column(Integer, primary_key=True, index=True)
     street = Column(String)
     suite = Column(String)
-    city = Column(String)
+    city = Column(String, index=True)
     zipcode = Column(String)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
 
     # Relationships
     user = relationship("User", back_populates="address")
-    geo = relationship("Geo", back_populates="address", uselist=False)
+    geo = relationship(
+        "Geo",
+        back_populates="address",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
 
 
 class Geo(Base):
@@ -44,7 +66,9 @@ class Geo(Base):
     id = Column(Integer, primary_key=True, index=True)
     lat = Column(String)
     lng = Column(String)
-    address_id = Column(Integer, ForeignKey("addresses.id"))
+    address_id = Column(
+        Integer, ForeignKey("addresses.id", ondelete="CASCADE"), index=True
+    )
 
     # Relationships
     address = relationship("Address", back_populates="geo")
@@ -55,15 +79,30 @@ class Company(Base):
     __tablename__ = "companies"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String)
+    name = Column(String, index=True)
     catchPhrase = Column(String)
     bs = Column(String)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
 
     # Relationships
     user = relationship("User", back_populates="company")
 
 
+class UserDirectory(Base):
+    """
+    Id, email and username of every user when users are sharded.
+
+    Kept in the main database: inserting a row allocates the id that decides
+    the user's shard, and its unique columns keep emails and usernames unique
+    across all shards.
+    """
+    __tablename__ = "user_directory"
+
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, unique=True, index=True)
+    email = Column(String, unique=True, index=True)
+
+
 class AuthUser(Base):
     """Authentication user model for login."""
     __tablename__ = "auth_users"
@@ -71,4 +110,72 @@ class AuthUser(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     email = Column(String, unique=True, index=True)
-    password_hash = Column(String) 
\ No newline at end of file
+    password_hash = Column(String)
+
+
+class RefreshToken(Base):
+    """Rotating refresh token, stored only as a keyed hash."""
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    # Every rotation of one login shares a family, revoked as a whole on reuse
+    family_id = Column(String(32), index=True, nullable=False)
+    auth_user_id = Column(
+        Integer,
+        ForeignKey("auth_users.id", ondelete="CASCADE"),
+        index=True,
+        nullable=False,
+    )
+    created_at = Column(DateTime, default=func.now())
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime)
+
+
+class ApiKey(Base):
+    """API key for service clients, stored only as a keyed hash."""
+    __tablename__ = "api_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)
+    # Public part of the key, used to find the row before comparing digests
+    prefix = Column(String(16), unique=True, index=True, nullable=False)
+    key_hash = Column(String(64), nullable=False)
+    auth_user_id = Column(
+        Integer,
+        ForeignKey("auth_users.id", ondelete="CASCADE"),
+        index=True,
+        nullable=False,
+    )
+    created_at = Column(DateTime, default=func.now())
+    revoked_at = Column(DateTime)
+
+
+class Job(Base):
+    """Background import or export, with its progress and resume checkpoint."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String(32), nullable=False)
+    # queued -> running -> succeeded | failed | cancelled
+    status = Column(String(16), index=True, nullable=False)
+    params = Column(JSON, nullable=False)
+    auth_user_id = Column(
+        Integer,
+        ForeignKey("auth_users.id", ondelete="CASCADE"),
+        index=True,
+        nullable=False,
+    )
+    rows_total = Column(Integer)
+    rows_done = Column(Integer, nullable=False, default=0)
+    # Where a resumed run continues; committed with each chunk's writes
+    checkpoint = Column(JSON)
+    result = Column(JSON)
+    error = Column(String)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    # Incremented on every claim; a runner only writes while it holds the latest
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -0,0 +1,33 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class RouteMemory(BaseModel):
+    """Schema for the memory recorded for one route template."""
+    route: str
+    requests: int
+    delta_bytes: int
+    mean_delta_bytes: float
+    max_delta_bytes: int
+    # Only requests that did not overlap another one have a peak
+    mean_peak_bytes: Optional[float] = None
+    max_peak_bytes: Optional[int] = None
+
+
+class AllocationSite(BaseModel):
+    """Schema for memory held, or grown, at one allocation site."""
+    site: str
+    traceback: Optional[List[str]] = None
+    size_bytes: Optional[int] = None
+    count: Optional[int] = None
+    size_diff_bytes: Optional[int] = None
+    count_diff: Optional[int] = None
+
+
+class MemoryProfile(BaseModel):
+    """Schema for the memory profiler's report."""
+    traced_bytes: int
+    peak_bytes: int
+    routes: List[RouteMemory]
+    top_sites: List[AllocationSite]
+    growth_sites: List[AllocationSite]
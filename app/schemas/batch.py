@@ -0,0 +1,26 @@
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, validator
+
+
+class BatchOperation(BaseModel):
+    """A single sub-request against the users API."""
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"]
+    path: str
+    body: Optional[Any] = None
+
+    @validator("method", pre=True)
+    def normalize_method(cls, v: Any) -> Any:
+        return v.upper() if isinstance(v, str) else v
+
+
+class BatchRequest(BaseModel):
+    """Schema for a batch of sub-requests."""
+    requests: List[BatchOperation]
+    atomic: bool = False
+
+
+class BatchResponseItem(BaseModel):
+    """Schema for the response to one sub-request."""
+    status: int
+    headers: Dict[str, str] = {}
+    body: Any = None
@@ -0,0 +1,52 @@
+import os
+from datetime import datetime
+from typing import Any, Dict, Literal, Optional
+from pydantic import BaseModel, validator
+
+
+class JobCreate(BaseModel):
+    """Schema for queueing a background job."""
+    type: Literal["import_users", "export_users"]
+    # Plain file name in the caller's JOB_FILES_DIR/<auth user id>/ directory;
+    # required for imports, and must not exist yet for exports
+    file: Optional[str] = None
+
+    @validator("file")
+    def plain_file_name(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None and (os.path.basename(v) != v or v in ("", ".", "..")):
+            raise ValueError("file must be a plain file name")
+        return v
+
+    @validator("file", always=True)
+    def file_required_for_imports(
+        cls, v: Optional[str], values: Dict[str, Any]
+    ) -> Optional[str]:
+        if v is None and values.get("type") == "import_users":
+            raise ValueError("file is required for imports")
+        return v
+
+
+class JobFile(BaseModel):
+    """Schema for an uploaded job file."""
+    file: str
+    # Bytes written
+    size: int
+
+
+class Job(BaseModel):
+    """Schema for a background job's status and progress."""
+    id: int
+    type: str
+    status: str
+    params: Dict[str, Any]
+    rows_total: Optional[int] = None
+    rows_done: int
+    # rows_done / rows_total, once the total is known
+    progress: Optional[float] = None
+    rows_per_second: Optional[float] = None
+    cancel_requested: bool
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -1,5 +1,16 @@
-from typing import Optional
-from pydantic import BaseModel, EmailStr
+from datetime import datetime
+from typing import Dict, List, Optional
+from pydantic import BaseModel, EmailStr, validator
+
+
+class PartialUpdate(BaseModel):
+    """Base for partial updates: fields may be left out, but not set to null."""
+
+    @validator("*")
+    def not_null(cls, v):
+        if v is None:
+            raise ValueError("may be omitted but not null")
+        return v
 
 
 class GeoBase(BaseModel):
@@ -13,6 +24,12 @@ class GeoCreate(GeoBase):
     pass
 
 
+class GeoUpdate(PartialUpdate):
+    """Schema for partially updating geographic coordinates."""
+    lat: Optional[str] = None
+    lng: Optional[str] = None
+
+
 class Geo(GeoBase):
     """Schema for geographic coordinates response."""
     id: int
@@ -34,6 +51,15 @@ class AddressCreate(AddressBase):
     geo: GeoCreate
 
 
+class AddressUpdate(PartialUpdate):
+    """Schema for partially updating address."""
+    street: Optional[str] = None
+    suite: Optional[str] = None
+    city: Optional[str] = None
+    zipcode: Optional[str] = None
+    geo: Optional[GeoUpdate] = None
+
+
 class Address(AddressBase):
     """Schema for address response."""
     id: int
@@ -55,6 +81,13 @@ class CompanyCreate(CompanyBase):
     pass
 
 
+class CompanyUpdate(PartialUpdate):
+    """Schema for partially updating company."""
+    name: Optional[str] = None
+    catchPhrase: Optional[str] = None
+    bs: Optional[str] = None
+
+
 class Company(CompanyBase):
     """Schema for company response."""
     id: int
@@ -78,13 +111,15 @@ class UserCreate(UserBase):
     company: CompanyCreate
 
 
-class UserUpdate(BaseModel):
-    """Schema for updating user."""
+class UserUpdate(PartialUpdate):
+    """Schema for partially updating user, including nested objects."""
     name: Optional[str] = None
     username: Optional[str] = None
     email: Optional[EmailStr] = None
     phone: Optional[str] = None
     website: Optional[str] = None
+    address: Optional[AddressUpdate] = None
+    company: Optional[CompanyUpdate] = None
 
 
 class User(UserBase):
@@ -97,6 +132,37 @@ class User(UserBase):
         orm_mode = True
 
 
+class UserFilter(BaseModel):
+    """Criteria selecting users for bulk operations (combined with AND)."""
+    ids: Optional[List[int]] = None
+    name: Optional[str] = None
+    username: Optional[str] = None
+    email: Optional[str] = None
+    website: Optional[str] = None
+    city: Optional[str] = None
+    company_name: Optional[str] = None
+
+
+class BulkUserUpdate(BaseModel):
+    """Schema for updating all users matching a filter."""
+    filter: UserFilter
+    changes: UserUpdate
+    dry_run: bool = False
+
+
+class BulkUserDelete(BaseModel):
+    """Schema for deleting all users matching a filter."""
+    filter: UserFilter
+    dry_run: bool = False
+
+
+class BulkOperationResult(BaseModel):
+    """Schema for bulk operation response."""
+    matched: int
+    affected: Dict[str, int]
+    dry_run: bool
+
+
 class AuthUserCreate(BaseModel):
     """Schema for creating auth user."""
     name: str
@@ -114,6 +180,34 @@ class Token(BaseModel):
     """Schema for JWT token response."""
     access_token: str
     token_type: str
+    refresh_token: str
+
+
+class RefreshTokenRequest(BaseModel):
+    """Schema for exchanging or revoking a refresh token."""
+    refresh_token: str
+
+
+class ApiKeyCreate(BaseModel):
+    """Schema for issuing an API key."""
+    name: str
+
+
+class ApiKey(BaseModel):
+    """Schema for API key response (the secret is never returned again)."""
+    id: int
+    name: str
+    prefix: str
+    created_at: Optional[datetime] = None
+    revoked_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+
+class ApiKeyCreated(ApiKey):
+    """Schema for a newly issued API key, including the full key."""
+    key: str
 
 
 class TokenData(BaseModel):
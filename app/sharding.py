@@ -0,0 +1,148 @@
+"""
+Placement of users on the databases listed in USER_SHARD_URLS.
+
+A user and its address, geo and company rows live on the shard chosen by a
+jump consistent hash of the user id. Growing the list from N to N + 1 shards
+only moves the users whose hash now picks the new shard (about 1 / (N + 1)
+of them), which ``python -m scripts.reshard`` copies over. Everything else
+(auth users, tokens, API keys and the user directory) stays in DATABASE_URL.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.sqlite import create_sqlite_engine, is_file_database
+
+T = TypeVar("T")
+
+_MASK_64 = 0xFFFFFFFFFFFFFFFF
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Bucket in ``range(buckets)`` for ``key`` (Lamping & Veach jump hash)."""
+    key &= _MASK_64
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & _MASK_64
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def create_shard_engine(url: str) -> Engine:
+    """Engine for one shard; its sessions may be used from the scatter threads."""
+    if is_file_database(url):
+        return create_sqlite_engine(url)
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False})
+    return create_engine(
+        url, **settings.get_db_pool_options(settings.WEB_CONCURRENCY or 1, url)
+    )
+
+
+class ShardRouter:
+    """Engines for the user shards and which shard each user lives on."""
+
+    def __init__(self, urls: List[str]):
+        if not urls:
+            raise ValueError("ShardRouter needs at least one database URL")
+        self.urls = list(urls)
+        self.engines = [create_shard_engine(url) for url in self.urls]
+        self.sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            for engine in self.engines
+        ]
+        self.executor = ThreadPoolExecutor(
+            max_workers=len(self.urls), thread_name_prefix="shard"
+        )
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def shard_for(self, user_id: int) -> int:
+        """Index of the shard holding ``user_id``."""
+        return jump_hash(user_id, len(self.urls))
+
+    def dispose(self) -> None:
+        self.executor.shutdown(wait=True)
+        for engine in self.engines:
+            engine.dispose()
+
+
+class ShardSessions:
+    """
+    Sessions on the user shards for one request, opened when first needed.
+
+    ``directory`` is the request's session on the main database, which holds
+    the user directory.
+    """
+
+    def __init__(self, router: ShardRouter, directory: Session):
+        self.router = router
+        self.directory = directory
+        self._sessions: Dict[int, Session] = {}
+
+    def session(self, shard: int) -> Session:
+        if shard not in self._sessions:
+            self._sessions[shard] = self.router.sessionmakers[shard]()
+        return self._sessions[shard]
+
+    def for_user(self, user_id: int) -> Session:
+        """Session on the shard holding ``user_id``."""
+        return self.session(self.router.shard_for(user_id))
+
+    def scatter(
+        self,
+        call: Callable[[int, Session], T],
+        shards: Optional[Iterable[int]] = None,
+    ) -> List[T]:
+        """
+        Run ``call(shard, session)`` on every shard (or the given ones) at once.
+
+        Results come back in shard order; the first failure is re-raised.
+        Each call runs in a copy of the request context, so its query time
+        is still attributed to the request.
+        """
+        targets = [
+            (shard, self.session(shard))
+            for shard in (range(len(self.router)) if shards is None else shards)
+        ]
+        if len(targets) == 1:
+            return [call(*targets[0])]
+        futures = [
+            self.router.executor.submit(copy_context().run, call, shard, session)
+            for shard, session in targets
+        ]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+
+
+shard_router: Optional[ShardRouter] = None
+_shard_router_lock = threading.Lock()
+
+
+def get_shard_router() -> Optional[ShardRouter]:
+    """
+    The router over USER_SHARD_URLS, created on first use, or None when
+    users are not sharded.
+
+    Like ``get_engine``, creating it is left out of importing the app so
+    that each worker builds its engines and threads after gunicorn forks.
+    """
+    global shard_router
+    if shard_router is None and settings.USER_SHARD_URLS:
+        with _shard_router_lock:
+            if shard_router is None:
+                shard_router = ShardRouter(settings.USER_SHARD_URLS)
+    return shard_router
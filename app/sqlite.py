@@ -0,0 +1,155 @@
+"""
+Embedded SQLite mode for edge and single-node deployments.
+
+``create_sqlite_engine`` sets up a file database for a multi-threaded
+worker: WAL journaling (readers no longer block the writer), memory-mapped
+reads, a larger page cache on every connection and connections that may move
+between threads (FastAPI runs sync dependencies in its thread pool).
+
+SQLite allows one writer at a time. When several threads write at once the
+losers spin in SQLite's busy handler and, past the busy timeout, fail with
+"database is locked". Instead every connection of the engine takes a
+process-wide write queue before its first write statement and releases it
+after COMMIT or ROLLBACK, so writers wait their turn in the queue and
+SQLite's lock is only contended across processes.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+# Statements that make sqlite3 open a write transaction, or change the schema
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER")
+
+write_queue_wait = registry.counter(
+    "sqlite_write_queue_wait_seconds_total",
+    "Time connections waited for the SQLite write queue",
+)
+
+
+class WriteQueue:
+    """One writing connection at a time, within this process."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        started = time.perf_counter()
+        if not self._lock.acquire(timeout=self.timeout):
+            # What SQLite itself raises when its busy timeout runs out
+            raise sqlite3.OperationalError("database is locked (write queue timeout)")
+        write_queue_wait.inc(time.perf_counter() - started)
+
+    def release(self) -> None:
+        self._lock.release()
+
+
+class QueuedCursor(sqlite3.Cursor):
+    """Cursor that enters its connection's write queue before writing."""
+
+    def execute(self, sql, parameters=()):
+        self.connection.before_statement(sql)
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.after_statement()
+
+    def executemany(self, sql, seq_of_parameters):
+        self.connection.before_statement(sql)
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.after_statement()
+
+
+class QueuedConnection(sqlite3.Connection):
+    """sqlite3 connection holding the write queue while it has writes pending."""
+
+    write_queue: Optional[WriteQueue] = None
+    holds_write_queue = False
+
+    def cursor(self, factory=QueuedCursor):
+        return super().cursor(factory)
+
+    def before_statement(self, sql: str) -> None:
+        if (
+            self.write_queue is not None
+            and not self.holds_write_queue
+            and sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+        ):
+            self.write_queue.acquire()
+            self.holds_write_queue = True
+
+    def after_statement(self) -> None:
+        # Statements outside a transaction (autocommit, failed BEGIN) end here
+        if self.holds_write_queue and not self.in_transaction:
+            self._release_write_queue()
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self._release_write_queue()
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._release_write_queue()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._release_write_queue()
+
+    def _release_write_queue(self) -> None:
+        if self.holds_write_queue:
+            self.holds_write_queue = False
+            self.write_queue.release()
+
+
+def is_file_database(url: str) -> bool:
+    """Whether ``url`` names an SQLite database file (not ``:memory:``)."""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def create_sqlite_engine(url: str, **engine_options) -> Engine:
+    """Engine for an SQLite database file, tuned from the SQLITE_* settings."""
+    write_queue = WriteQueue(settings.SQLITE_BUSY_TIMEOUT_SECONDS)
+    engine = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_SECONDS,
+            "factory": QueuedConnection,
+        },
+        **engine_options,
+    )
+
+    @event.listens_for(engine, "connect")
+    def configure_connection(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE_MB * 2**20}")
+        # Negative sizes are in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size={-settings.SQLITE_CACHE_SIZE_MB * 1024}")
+        cursor.close()
+        if settings.SQLITE_WRITE_QUEUE_ENABLED:
+            dbapi_connection.write_queue = write_queue
+
+    return engine
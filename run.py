@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 """
 Simple script to run the FastAPI application locally.
+
+For production use the pre-forked launcher instead:
+    gunicorn -c gunicorn_conf.py app.main:app
 """
 
 import uvicorn
+from app.core.config import settings
 from app.main import app
 
 if __name__ == "__main__":
@@ -12,5 +16,6 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=True,
-        log_level="info"
+        log_level="info",
+        access_log=not settings.ACCESS_LOG_ENABLED,
     ) 
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Benchmark the per-request overhead of the access log.
+
+Drives a minimal ASGI app directly (no HTTP) with and without
+AccessLogMiddleware, writing to /dev/null, and compares the queued writer
+with synchronous logging on the request path. ``--sink-delay-ms`` makes
+every write block for that long, like a full pipe or a slow disk.
+
+Usage:
+    python -m scripts.bench_access_log --requests 50000
+    python -m scripts.bench_access_log --requests 2000 --sink-delay-ms 1
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from app.core import access_log
+from app.core.config import settings
+from app.middleware.access_log import AccessLogMiddleware
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def drive(app, requests: int) -> float:
+    """Seconds per request for ``requests`` sequential GETs."""
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/v1/users/1",
+        "headers": [],
+        "query_string": b"",
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+class SlowStream:
+    """File wrapper whose writes block for ``delay`` seconds."""
+
+    def __init__(self, stream, delay: float):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return access_log.format_record(record)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    devnull = open(os.devnull, "w")
+    if args.sink_delay_ms:
+        devnull = SlowStream(devnull, args.sink_delay_ms / 1000)
+
+    results = {}
+    results["no access log"] = asyncio.run(drive(endpoint, args.requests))
+
+    middleware = AccessLogMiddleware(endpoint)
+    access_log.start_access_log(devnull)
+    for rate in (1.0, 0.1):
+        settings.ACCESS_LOG_SAMPLE_RATE = rate
+        label = f"queued, sample rate {rate:g}"
+        results[label] = asyncio.run(drive(middleware, args.requests))
+    access_log.stop_access_log()
+    dropped = access_log.dropped_records.value()
+
+    settings.ACCESS_LOG_SAMPLE_RATE = 1.0
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(JsonFormatter())
+    access_log.logger.addHandler(handler)
+    results["synchronous handler"] = asyncio.run(drive(middleware, args.requests))
+    access_log.logger.removeHandler(handler)
+
+    baseline = results["no access log"]
+    print(f"requests: {args.requests}, queued records dropped: {dropped:g}")
+    for label, seconds in results.items():
+        overhead = (seconds - baseline) * 1e6
+        print(f"{label:28s} {seconds * 1e6:7.2f} us/request  (+{overhead:.2f} us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark database snapshots against replaying users through the CRUD layer.
+
+Seeds a temporary SQLite file with synthetic users, dumps it with
+``scripts.db_snapshot`` and restores the snapshot into a fresh database,
+reporting time, throughput and file size. For comparison, a sample of the
+same users is created one by one with ``create_user`` (what seeding from
+JSON does) and the rate is extrapolated to the full count.
+
+Usage:
+    python -m scripts.bench_db_snapshot --users 1000000
+    python -m scripts.bench_db_snapshot --database-url postgresql://... \\
+        --users 100000  # restore target; must be empty
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.crud import user as user_crud
+from app.models.user import Address, Company, Geo, User
+from app.schemas.user import UserCreate
+from app.sharding import create_shard_engine
+from scripts import db_snapshot
+from scripts.bench_snapshot import seed
+from scripts.init_db import run_migrations
+
+
+def replay_rate(engine, sample: int, offset: int) -> float:
+    """Users per second created one at a time with create_user."""
+    with Session(engine) as session:
+        documents = []
+        for user, address, geo, company in session.execute(
+            select(User, Address, Geo, Company)
+            .join(Address, Address.user_id == User.id)
+            .join(Geo, Geo.address_id == Address.id)
+            .join(Company, Company.user_id == User.id)
+            .order_by(User.id)
+            .limit(sample)
+        ):
+            documents.append(
+                UserCreate(
+                    name=user.name,
+                    username=f"replay{user.username}",
+                    email=f"replay{user.email}",
+                    phone=user.phone,
+                    website=user.website,
+                    address={
+                        "street": address.street,
+                        "suite": address.suite,
+                        "city": address.city,
+                        "zipcode": address.zipcode,
+                        "geo": {"lat": geo.lat, "lng": geo.lng},
+                    },
+                    company={
+                        "name": company.name,
+                        "catchPhrase": company.catchPhrase,
+                        "bs": company.bs,
+                    },
+                )
+            )
+        started = time.perf_counter()
+        for index, document in enumerate(documents):
+            user_crud.create_user(session, document, user_id=offset + index)
+        session.flush()
+        elapsed = time.perf_counter() - started
+        # Leave the source database as it was seeded
+        session.rollback()
+    return len(documents) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--level", type=int, default=6, help="gzip level")
+    parser.add_argument(
+        "--replay-sample", type=int, default=2000, help="users to create_user"
+    )
+    parser.add_argument(
+        "--database-url", help="restore target (default: a temporary SQLite file)"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = create_shard_engine(f"sqlite:///{directory}/source.db")
+        run_migrations(source)
+        started = time.perf_counter()
+        with Session(source) as session:
+            seed(session, args.users)
+        print(f"seeded {args.users} users in {time.perf_counter() - started:.1f} s")
+
+        rate = replay_rate(source, args.replay_sample, offset=args.users + 1)
+        path = os.path.join(directory, "users.snap")
+        dumped = db_snapshot.dump(source, path, level=args.level)
+        source.dispose()
+
+        target = create_shard_engine(
+            args.database_url or f"sqlite:///{directory}/target.db"
+        )
+        run_migrations(target)
+        restored = db_snapshot.restore(target, path)
+        target.dispose()
+
+    rows = sum(dumped.rows.values())
+    print(f"rows:                {rows} in {len(dumped.rows)} tables")
+    print(f"snapshot size:       {dumped.bytes / 2**20:.1f} MiB "
+          f"({dumped.bytes / max(args.users, 1):.1f} bytes/user)")
+    print(f"dump:                {dumped.seconds:.1f} s "
+          f"({rows / dumped.seconds:.0f} rows/s)")
+    print(f"restore:             {restored.seconds:.1f} s "
+          f"({rows / restored.seconds:.0f} rows/s)")
+    print(f"create_user replay:  {rate:.0f} users/s, "
+          f"~{args.users / rate:.0f} s for {args.users} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark the in-memory user snapshot.
+
+Seeds an in-memory SQLite database with synthetic users, loads them into a
+UserSnapshot and reports load time, memory per user and lookup latency.
+
+Usage:
+    python -m scripts.bench_snapshot --users 100000
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.pool import StaticPool
+
+from app.crud.snapshot import UserSnapshot
+from app.models.user import Address, Base, Company, Geo, User
+from app.schemas.user import UserFilter
+
+CITIES = ["Gwenborough", "Wisokyburgh", "McKenziehaven", "South Elvis", "Roscoeview"]
+COMPANIES = ["Romaguera-Crona", "Deckow-Crist", "Keebler LLC", "Robel-Corkery"]
+
+
+def seed(session: Session, count: int, batch_size: int = 50000) -> None:
+    """Insert ``count`` synthetic users with address, geo and company."""
+    rng = random.Random(42)
+    users, addresses, geos, companies = [], [], [], []
+    for i in range(1, count + 1):
+        users.append(
+            {
+                "id": i,
+                "name": f"User {i}",
+                "username": f"user{i}",
+                "email": f"user{i}@example.com",
+                "phone": f"1-770-736-{i % 10000:04d}",
+                "website": f"user{i}.example.org",
+            }
+        )
+        addresses.append(
+            {
+                "id": i,
+                "street": f"{i} Kulas Light",
+                "suite": f"Apt. {i % 1000}",
+                "city": rng.choice(CITIES),
+                "zipcode": f"{i % 100000:05d}",
+                "user_id": i,
+            }
+        )
+        geos.append(
+            {
+                "id": i,
+                "lat": f"{rng.uniform(-90, 90):.4f}",
+                "lng": f"{rng.uniform(-180, 180):.4f}",
+                "address_id": i,
+            }
+        )
+        companies.append(
+            {
+                "id": i,
+                "name": rng.choice(COMPANIES),
+                "catchPhrase": "Multi-layered client-server neural-net",
+                "bs": "harness real-time e-markets",
+                "user_id": i,
+            }
+        )
+        if len(users) == batch_size or i == count:
+            for model, rows in [
+                (User, users),
+                (Address, addresses),
+                (Geo, geos),
+                (Company, companies),
+            ]:
+                session.execute(insert(model), rows)
+                rows.clear()
+    session.commit()
+
+
+def measure_memory(build):
+    """Return (result, bytes allocated by ``build`` and still held)."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument(
+        "--orm-sample",
+        type=int,
+        default=10000,
+        help="users loaded as ORM objects for comparison",
+    )
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, args.users)
+
+    with Session(engine) as session:
+        snapshot = UserSnapshot()
+        started = time.perf_counter()
+        snapshot.load(session)
+        load_seconds = time.perf_counter() - started
+
+    with Session(engine) as session:
+        snapshot = UserSnapshot()
+        _, snapshot_bytes = measure_memory(lambda: snapshot.load(session))
+
+    with Session(engine) as session:
+        query = (
+            session.query(User)
+            .options(
+                selectinload(User.address).selectinload(Address.geo),
+                selectinload(User.company),
+            )
+            .limit(args.orm_sample)
+        )
+        orm_users, orm_bytes = measure_memory(query.all)
+        del orm_users
+
+    rng = random.Random(7)
+    lookups = [rng.randint(1, args.users) for _ in range(10000)]
+    started = time.perf_counter()
+    for user_id in lookups:
+        snapshot.get(user_id)
+    get_us = (time.perf_counter() - started) / len(lookups) * 1e6
+
+    started = time.perf_counter()
+    for skip in range(0, 100 * 100, 100):
+        snapshot.get_page(skip=skip, limit=100)
+    page_us = (time.perf_counter() - started) / 100 * 1e6
+
+    started = time.perf_counter()
+    snapshot.get_page(user_filter=UserFilter(city=CITIES[0]))
+    filter_ms = (time.perf_counter() - started) * 1e3
+
+    print(f"users:                 {args.users}")
+    print(f"snapshot load:         {load_seconds:.2f} s")
+    print(
+        f"snapshot memory:       {snapshot_bytes / args.users:.0f} bytes/user "
+        f"({snapshot_bytes / 2**20:.1f} MiB total)"
+    )
+    print(f"ORM objects (sample):  {orm_bytes / args.orm_sample:.0f} bytes/user")
+    print(f"get by id:             {get_us:.2f} us")
+    print(f"page of 100:           {page_us:.1f} us")
+    print(f"filter by city:        {filter_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Benchmark the embedded SQLite mode against a plain SQLite engine.
+
+Seeds an SQLite file with synthetic users and copies it once per
+configuration: the driver defaults (what ``DATABASE_URL=sqlite:///...`` gave
+before the embedded mode), ``app.sqlite.create_sqlite_engine`` with the
+SQLITE_* settings, and the same without the write queue. Each runs the same
+workloads from a pool of threads, as FastAPI's thread pool would: user
+lookups by id, user creation (four inserts and a commit each), and both at
+once. The configurations take turns for ``--rounds`` rounds; reported are
+the median operations per second, the total number of operations that
+failed with "database is locked" and the median 99th percentile latency of
+writes.
+
+With one CPU, many threads mostly measure waiting for the GIL rather than
+SQLite, so the default thread count is low.
+
+Usage:
+    python -m scripts.bench_sqlite --users 50000 --threads 4 --rounds 5
+"""
+
+import argparse
+import itertools
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.database  # noqa: F401  (SQLite foreign keys)
+from app.core.config import settings
+from app.crud import user as user_crud
+from app.models.user import Base
+from app.schemas.user import UserCreate
+from app.sqlite import create_sqlite_engine
+from scripts.bench_snapshot import seed
+
+new_user_ids = itertools.count(1)
+
+
+def new_user() -> UserCreate:
+    number = next(new_user_ids)
+    return UserCreate(
+        name=f"Edge User {number}",
+        username=f"edge{number}",
+        email=f"edge{number}@example.com",
+        phone="1-770-736-8031",
+        website="edge.example.org",
+        address={
+            "street": "Kulas Light",
+            "suite": "Apt. 556",
+            "city": "Gwenborough",
+            "zipcode": "92998-3874",
+            "geo": {"lat": "-37.3159", "lng": "81.1496"},
+        },
+        company={
+            "name": "Romaguera-Crona",
+            "catchPhrase": "Multi-layered client-server neural-net",
+            "bs": "harness real-time e-markets",
+        },
+    )
+
+
+def run(
+    sessions: sessionmaker,
+    workers: Dict[str, Tuple[int, Callable[[Session], None]]],
+    seconds: float,
+) -> Dict[str, Tuple[float, int, float]]:
+    """
+    Run each kind of worker in its threads.
+
+    Returns (ops per second, failed ops, p99 latency in ms) per kind.
+    """
+    latencies: Dict[str, List[float]] = {kind: [] for kind in workers}
+    failures = {kind: 0 for kind in workers}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def work(kind: str, operation: Callable[[Session], None]) -> None:
+        durations = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            with sessions() as db:
+                try:
+                    operation(db)
+                    durations.append(time.perf_counter() - started)
+                except OperationalError:
+                    db.rollback()
+                    failed += 1
+        with lock:
+            latencies[kind].extend(durations)
+            failures[kind] += failed
+
+    threads = [
+        threading.Thread(target=work, args=(kind, operation))
+        for kind, (count, operation) in workers.items()
+        for _ in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        kind: (len(durations) / seconds, failures[kind], p99_ms(durations))
+        for kind, durations in latencies.items()
+    }
+
+
+def p99_ms(durations: List[float]) -> float:
+    if len(durations) < 2:
+        return 0.0
+    return statistics.quantiles(durations, n=100)[98] * 1000
+
+
+def benchmark(engine: Engine, users: int, threads: int, seconds: float) -> Dict:
+    sessions = sessionmaker(bind=engine, autoflush=False)
+
+    def read(db: Session) -> None:
+        user = user_crud.get_user(db, random.randint(1, users))
+        user.address.geo, user.company
+
+    def write(db: Session) -> None:
+        user_crud.create_user(db, new_user())
+
+    half = max(1, threads // 2)
+    return {
+        "read": run(sessions, {"read": (threads, read)}, seconds)["read"],
+        "write": run(sessions, {"write": (threads, write)}, seconds)["write"],
+        "mixed": run(
+            sessions, {"read": (half, read), "write": (half, write)}, seconds
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0, help="per workload")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        seeded = os.path.join(directory, "seeded.db")
+        engine = create_engine(f"sqlite:///{seeded}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            seed(session, args.users)
+        engine.dispose()
+
+        # Runs of every configuration, which take turns to even out noise
+        results: Dict[str, List[Dict]] = {}
+        for round_number in range(args.rounds):
+            for name, create, write_queue in (
+                ("default", create_engine, False),
+                ("embedded", create_sqlite_engine, True),
+                ("no queue", create_sqlite_engine, False),
+            ):
+                settings.SQLITE_WRITE_QUEUE_ENABLED = write_queue
+                path = os.path.join(directory, f"{name}-{round_number}.db")
+                shutil.copy(seeded, path)
+                engine = create(f"sqlite:///{path}")
+                results.setdefault(name, []).append(
+                    benchmark(engine, args.users, args.threads, args.seconds)
+                )
+                engine.dispose()
+                os.remove(path)
+
+    print(
+        f"{args.threads} threads, {args.seconds:.0f} s per workload, "
+        f"{args.rounds} rounds"
+    )
+    print("median ops/s (operations failed with 'database is locked')")
+    print(f"{'workload':<20}" + "".join(f"{name:>16}" for name in results))
+    workloads = (
+        ("reads", lambda result: result["read"]),
+        ("writes", lambda result: result["write"]),
+        ("mixed reads", lambda result: result["mixed"]["read"]),
+        ("mixed writes", lambda result: result["mixed"]["write"]),
+    )
+    for label, pick in workloads:
+        cells = []
+        for runs in results.values():
+            rate = statistics.median(pick(run)[0] for run in runs)
+            locked = sum(pick(run)[1] for run in runs)
+            cells.append(f"{rate:.0f} ({locked})")
+        print(f"{label:<20}" + "".join(f"{cell:>16}" for cell in cells))
+    for label, pick in workloads[1::2]:
+        cells = [
+            f"{statistics.median(pick(run)[2] for run in runs):.1f}"
+            for runs in results.values()
+        ]
+        print(f"{label + ' p99 ms':<20}" + "".join(f"{cell:>16}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
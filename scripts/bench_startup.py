@@ -0,0 +1,187 @@
+"""
+Benchmark worker cold start.
+
+Each run starts a fresh interpreter that imports ``app.main``, runs the
+lifespan startup and sends the first requests straight through the ASGI app
+(``/health``, then a users listing against a throwaway SQLite database),
+timing every step; medians over the runs are reported. A separate
+``python -X importtime`` run gives the import cost per module, with
+third-party packages folded into their top-level package, and checks that
+the modules the app loads on first use (see DEFERRED_MODULES) stay out of
+the import.
+
+Usage:
+    python -m scripts.bench_startup --runs 5
+    python -m scripts.bench_startup --budget-ms 1500  # exit 1 when slower
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Loaded on first use (tokens, password hashing, the database driver)
+DEFERRED_MODULES = ("jose", "passlib", "cryptography", "bcrypt", "psycopg2")
+
+PROBE = """
+import asyncio, json, sys, time
+
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+
+async def get(path):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path,
+        "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    assert status == [200], (path, status)
+
+
+async def main():
+    timings = {"import": imported - started}
+    mark = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        timings["lifespan"] = time.perf_counter() - mark
+        for name, path in (("first_health", "/health"),
+                           ("first_users", "/api/v1/users/")):
+            mark = time.perf_counter()
+            await get(path)
+            timings[name] = time.perf_counter() - mark
+    timings["deferred_loaded"] = sorted(
+        name for name in DEFERRED if name in sys.modules
+    )
+    print(json.dumps(timings))
+
+
+DEFERRED = %r
+asyncio.run(main())
+"""
+
+
+def probe_env(database_url: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=database_url,
+        ACCESS_LOG_ENABLED="false",
+        JOB_RUNNER_ENABLED="false",
+        PYTHONDONTWRITEBYTECODE="",
+    )
+    return env
+
+
+def run_probe(database_url: str) -> Dict[str, object]:
+    """One cold start in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE % (DEFERRED_MODULES,)],
+        env=probe_env(database_url),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_costs(database_url: str) -> Tuple[List[Tuple[str, float]], float]:
+    """
+    Self import time per module in ms, largest first, and the total.
+
+    App modules are listed individually; everything else is summed into its
+    top-level package.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=probe_env(database_url),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    costs: Dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        group = name if name.split(".")[0] == "app" else name.split(".")[0]
+        costs[group] += int(self_us) / 1000
+    ranked = sorted(costs.items(), key=lambda item: item[1], reverse=True)
+    return ranked, sum(costs.values())
+
+
+def create_database(path: str) -> str:
+    """SQLite database with the app's schema, for the first users listing."""
+    from sqlalchemy import create_engine
+
+    from app.models.user import Base
+
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="modules to list")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=0,
+        help="fail when the median import of app.main takes longer (0 = off)",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = create_database(os.path.join(directory, "bench.db"))
+        # The first run also warms the OS file cache and bytecode
+        run_probe(database_url)
+        runs = [run_probe(database_url) for _ in range(args.runs)]
+        ranked, total_ms = import_costs(database_url)
+
+    def median_ms(key: str) -> float:
+        return statistics.median(run[key] for run in runs) * 1000
+
+    import_ms = median_ms("import")
+    print(f"import app.main:       {import_ms:.0f} ms")
+    print(f"lifespan startup:      {median_ms('lifespan'):.0f} ms")
+    print(f"first GET /health:     {median_ms('first_health'):.1f} ms")
+    print(f"first GET /users/:     {median_ms('first_users'):.1f} ms")
+    ready_ms = sum(
+        median_ms(key) for key in ("import", "lifespan", "first_health")
+    )
+    print(f"time to first response: {ready_ms:.0f} ms")
+    loaded = runs[-1]["deferred_loaded"]
+    print(f"deferred modules loaded by first requests: {', '.join(loaded) or '-'}")
+
+    print(f"\nimport cost by module (-X importtime, {total_ms:.0f} ms total):")
+    for name, cost in ranked[: args.top]:
+        print(f"  {cost:>8.1f} ms  {name}")
+
+    if args.budget_ms and import_ms > args.budget_ms:
+        print(f"\nimport exceeds budget of {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
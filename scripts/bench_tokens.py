@@ -0,0 +1,129 @@
+"""
+Benchmark access token signing and verification.
+
+For HS256, RS256 and ES256 keys (generated on the fly) it measures encode and
+decode throughput of:
+
+- per call: python-jose given the raw secret or PEM on every call, as
+  before TokenService, so the key is parsed for each token;
+- TokenService: keys prepared once, with jose's cryptography backend;
+- pure Python: keys prepared once with jose's python-rsa / ecdsa backends,
+  used when cryptography is not installed.
+
+Usage:
+    python -m scripts.bench_tokens --seconds 2
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwt
+
+from app.core.tokens import TokenService
+
+SECRET = "benchmark-secret-with-enough-entropy-0123456789"
+
+
+def generate_pems(algorithm: str) -> Tuple[str, str]:
+    """A fresh private and public key for an RS* or ES* algorithm, as PEM."""
+    if algorithm.startswith("RS"):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        key = ec.generate_private_key(ec.SECP256R1())
+    private = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private.decode(), public.decode()
+
+
+def pure_python_key(algorithm: str, pem: str):
+    """Key prepared with jose's backends that do not need cryptography."""
+    if algorithm.startswith("RS"):
+        from jose.backends.rsa_backend import RSAKey as Key
+    else:
+        from jose.backends.ecdsa_backend import ECDSAECKey as Key
+    return Key(pem, algorithm)
+
+
+def rate(operation: Callable[[], object], seconds: float) -> float:
+    """Calls per second of ``operation``, run for about ``seconds``."""
+    operation()
+    calls = 0
+    batch = 1
+    started = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            operation()
+        calls += batch
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return calls / elapsed
+        batch = min(batch * 2, 1000)
+
+
+def cases(algorithm: str) -> List[Tuple[str, Callable, Callable]]:
+    """(backend, encode, decode) callables for one algorithm."""
+    claims = {"sub": "bench@example.com", "exp": datetime.utcnow() + timedelta(hours=1)}
+    if algorithm.startswith("HS"):
+        private = public = SECRET
+    else:
+        private, public = generate_pems(algorithm)
+    service = TokenService([{"kid": "bench", "alg": algorithm, "key": private}])
+    token = service.encode(claims)
+    unkeyed = jwt.encode(claims, private, algorithm=algorithm)
+
+    found = [
+        (
+            "per call",
+            lambda: jwt.encode(claims, private, algorithm=algorithm),
+            lambda: jwt.decode(unkeyed, public, algorithms=[algorithm]),
+        ),
+        ("TokenService", lambda: service.encode(claims), lambda: service.decode(token)),
+    ]
+    if not algorithm.startswith("HS"):
+        signer = pure_python_key(algorithm, private)
+        verifier = pure_python_key(algorithm, public)
+        found.append(
+            (
+                "pure Python",
+                lambda: jwt.encode(claims, signer, algorithm=algorithm),
+                lambda: jwt.decode(unkeyed, verifier, algorithms=[algorithm]),
+            )
+        )
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--seconds", type=float, default=1.0, help="per measurement"
+    )
+    parser.add_argument(
+        "--alg",
+        dest="algorithms",
+        action="append",
+        help="algorithm (repeatable; default HS256, RS256, ES256)",
+    )
+    args = parser.parse_args()
+
+    print(f"{'alg':<7} {'backend':<14} {'encode/s':>10} {'decode/s':>10}")
+    for algorithm in args.algorithms or ["HS256", "RS256", "ES256"]:
+        for backend, encode, decode in cases(algorithm):
+            print(
+                f"{algorithm:<7} {backend:<14} "
+                f"{rate(encode, args.seconds):>10.0f} "
+                f"{rate(decode, args.seconds):>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Pick the bcrypt cost factor for this host.
+
+Times password verification at increasing cost factors and recommends the
+highest one whose median verify time stays within the target latency. Put
+the result in BCRYPT_ROUNDS for the environment running on this hardware;
+existing hashes are upgraded on each user's next login.
+
+Usage:
+    python -m scripts.calibrate_bcrypt --target-ms 250
+"""
+
+import argparse
+import statistics
+import time
+
+from app.core.security import build_pwd_context
+
+MIN_ROUNDS = 4
+MAX_ROUNDS = 16
+
+
+def time_verify(rounds: int, samples: int) -> float:
+    """Median seconds to verify a password hashed with ``rounds``."""
+    context = build_pwd_context(rounds)
+    hashed = context.hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.verify("calibration-password", hashed)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--target-ms",
+        type=float,
+        default=250.0,
+        help="maximum acceptable verify latency in milliseconds",
+    )
+    parser.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args()
+
+    chosen = MIN_ROUNDS
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        elapsed_ms = time_verify(rounds, args.samples) * 1000
+        print(f"rounds={rounds:2d}  verify={elapsed_ms:8.1f} ms")
+        if elapsed_ms > args.target_ms:
+            break
+        chosen = rounds
+
+    print(f"\nBCRYPT_ROUNDS={chosen}")
+
+
+if __name__ == "__main__":
+    main()
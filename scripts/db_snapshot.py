@@ -0,0 +1,418 @@
+"""
+Dump the users and auth users to a compact snapshot file, and restore it.
+
+Restoring a snapshot replaces replaying ``init_db`` or the seed JSON for
+test and staging databases. The file is a gzip stream holding a JSON header
+(format version, Alembic revision, table columns), then every table in
+blocks of rows stored column by column (integers and timestamps as int64,
+strings as lengths plus UTF-8 bytes, with a null mask when needed) and a
+JSON trailer with the row counts.
+
+A restore runs in one transaction and loads tables in foreign key order:
+COPY on PostgreSQL, batched executemany on SQLite. It is rolled back, and
+nothing changes, unless the gzip checksum, the trailer's row counts, the
+counts in the database and (on SQLite) ``PRAGMA foreign_key_check`` all
+agree. Target tables must be empty unless ``--replace`` is given. Deleting
+auth users also deletes their tokens, API keys and jobs.
+
+Take snapshots while writes are stopped; on PostgreSQL the dump reads one
+consistent snapshot of the database anyway. Users sharded over several
+databases are dumped per database, without the user directory.
+
+Usage:
+    python -m scripts.db_snapshot dump fixtures.snap
+    python -m scripts.db_snapshot restore fixtures.snap --replace
+    python -m scripts.db_snapshot restore fixtures.snap \\
+        --database-url sqlite:///./staging.db
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import IO, Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, Integer, String, Table, func, select
+from sqlalchemy.engine import Connection, Engine
+
+import app.database  # noqa: F401  (SQLite foreign keys, for ON DELETE CASCADE)
+from app.core.config import settings
+from app.models.user import Address, AuthUser, Company, Geo, User
+from app.sharding import create_shard_engine
+from scripts.init_db import run_migrations
+
+MAGIC = b"JPSNAP\x00\x01"
+FORMAT_VERSION = 1
+
+# Restored in this order, so every foreign key points at loaded rows
+TABLES: Tuple[Table, ...] = tuple(
+    model.__table__ for model in (AuthUser, User, Address, Geo, Company)
+)
+BLOCK_ROWS = 50000
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class SnapshotError(Exception):
+    """The file is not a snapshot that can be restored into this database."""
+
+
+@dataclass
+class SnapshotReport:
+    """Rows per table, file size and duration of a dump or restore."""
+    rows: Dict[str, int] = field(default_factory=dict)
+    bytes: int = 0
+    seconds: float = 0.0
+
+
+def _column_kind(column) -> str:
+    if isinstance(column.type, DateTime):
+        return "datetime"
+    if isinstance(column.type, Integer):
+        return "int"
+    if isinstance(column.type, String):
+        return "str"
+    raise SnapshotError(f"Column {column} has an unsupported type")
+
+
+def dump(engine: Engine, path: str, level: int = 6) -> SnapshotReport:
+    """Write every row of TABLES to a snapshot file at ``path``."""
+    report = SnapshotReport()
+    started = time.perf_counter()
+    options = {}
+    if engine.dialect.name == "postgresql":
+        options["isolation_level"] = "REPEATABLE READ"
+    with engine.connect().execution_options(**options) as connection, gzip.open(
+        path, "wb", compresslevel=level
+    ) as out:
+        out.write(MAGIC)
+        _write_json(
+            out,
+            {
+                "version": FORMAT_VERSION,
+                "created_at": datetime.utcnow().isoformat(),
+                "alembic_revision": _alembic_revision(connection),
+                "tables": [
+                    {
+                        "name": table.name,
+                        "columns": [
+                            [column.name, _column_kind(column)]
+                            for column in table.c
+                        ],
+                    }
+                    for table in TABLES
+                ],
+            },
+        )
+        for table in TABLES:
+            kinds = [_column_kind(column) for column in table.c]
+            result = connection.execution_options(yield_per=BLOCK_ROWS).execute(
+                select(*table.c).order_by(table.c.id)
+            )
+            count = 0
+            for rows in result.partitions():
+                _write_block(out, kinds, rows)
+                count += len(rows)
+            out.write(struct.pack("<I", 0))
+            report.rows[table.name] = count
+        _write_json(out, {"rows": report.rows})
+    report.bytes = os.path.getsize(path)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def restore(engine: Engine, path: str, replace: bool = False) -> SnapshotReport:
+    """Load a snapshot into the TABLES of ``engine``'s database, atomically."""
+    report = SnapshotReport(bytes=os.path.getsize(path))
+    started = time.perf_counter()
+    try:
+        with gzip.open(path, "rb") as source, engine.begin() as connection:
+            if source.read(len(MAGIC)) != MAGIC:
+                raise SnapshotError("Not a database snapshot")
+            header = _read_json(source)
+            _check_header(connection, header)
+            _clear_tables(connection, replace)
+
+            load = _insert_rows
+            if engine.dialect.name == "postgresql":
+                load = _copy_rows
+            for table in TABLES:
+                columns = list(table.c)
+                kinds = [_column_kind(column) for column in columns]
+                count = 0
+                while True:
+                    block = _read_block(source, kinds)
+                    if block is None:
+                        break
+                    load(connection, table, columns, block)
+                    count += len(block[0])
+                report.rows[table.name] = count
+
+            trailer = _read_json(source)
+            # Reading to the end makes gzip verify the stream's CRC
+            if source.read(1):
+                raise SnapshotError("Unexpected data after the snapshot trailer")
+            if trailer.get("rows") != report.rows:
+                raise SnapshotError(
+                    f"Restored {report.rows}, but the snapshot holds "
+                    f"{trailer.get('rows')}"
+                )
+            _verify(connection, report.rows)
+    except (EOFError, zlib.error, ValueError, OverflowError) as exc:
+        # gzip.BadGzipFile (a CRC mismatch) and bad UTF-8 or JSON are ValueErrors
+        raise SnapshotError(f"Snapshot is corrupt: {exc}") from exc
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _alembic_revision(connection: Connection) -> Optional[str]:
+    from alembic.runtime.migration import MigrationContext
+
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def _check_header(connection: Connection, header: Dict[str, Any]) -> None:
+    if header.get("version") != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {header.get('version')}")
+    expected = [
+        {
+            "name": table.name,
+            "columns": [[column.name, _column_kind(column)] for column in table.c],
+        }
+        for table in TABLES
+    ]
+    if header.get("tables") != expected:
+        raise SnapshotError("Snapshot tables or columns differ from this schema")
+    revision = _alembic_revision(connection)
+    source_revision = header.get("alembic_revision")
+    if revision and source_revision and revision != source_revision:
+        raise SnapshotError(
+            f"Snapshot is from schema revision {source_revision}, "
+            f"the database is at {revision}"
+        )
+
+
+def _clear_tables(connection: Connection, replace: bool) -> None:
+    for table in reversed(TABLES):
+        if replace:
+            connection.execute(table.delete())
+        elif connection.scalar(select(table.c.id).limit(1)) is not None:
+            raise SnapshotError(
+                f"Table {table.name} is not empty; restore with --replace"
+            )
+
+
+def _verify(connection: Connection, rows: Dict[str, int]) -> None:
+    """Check what the database now holds, before the transaction commits."""
+    for table in TABLES:
+        count = connection.scalar(select(func.count()).select_from(table))
+        if count != rows[table.name]:
+            raise SnapshotError(
+                f"{table.name} holds {count} rows after restoring "
+                f"{rows[table.name]}"
+            )
+    if connection.dialect.name == "sqlite":
+        violations = connection.exec_driver_sql("PRAGMA foreign_key_check").all()
+        if violations:
+            raise SnapshotError(f"Foreign key violations: {violations[:5]}")
+    elif connection.dialect.name == "postgresql":
+        for table in TABLES:
+            max_id = connection.scalar(select(func.max(table.c.id)))
+            if max_id is not None:
+                connection.exec_driver_sql(
+                    "SELECT setval(pg_get_serial_sequence(%(table)s, 'id'), %(id)s)",
+                    {"table": table.name, "id": max_id},
+                )
+
+
+def _insert_rows(
+    connection: Connection, table: Table, columns: Sequence, block: List[list]
+) -> None:
+    """Batched executemany of plain tuples, skipping SQLAlchemy's row handling."""
+    dialect = connection.dialect
+    for index, column in enumerate(columns):
+        processor = column.type.dialect_impl(dialect).bind_processor(dialect)
+        if processor is not None:
+            block[index] = [processor(value) for value in block[index]]
+    placeholder = "?" if dialect.paramstyle == "qmark" else "%s"
+    connection.exec_driver_sql(
+        f"INSERT INTO {_quoted(dialect, table, columns)} "
+        f"VALUES ({', '.join([placeholder] * len(columns))})",
+        list(zip(*block)),
+    )
+
+
+def _copy_rows(
+    connection: Connection, table: Table, columns: Sequence, block: List[list]
+) -> None:
+    """COPY FROM STDIN in PostgreSQL's text format."""
+    buffer = io.StringIO()
+    for row in zip(*block):
+        buffer.write("\t".join(map(_copy_value, row)))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {_quoted(connection.dialect, table, columns)} FROM STDIN", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return (
+            value.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    return str(value)
+
+
+def _quoted(dialect, table: Table, columns: Sequence) -> str:
+    """``table (column, ...)`` with identifiers quoted where needed."""
+    quote = dialect.identifier_preparer.quote
+    names = ", ".join(quote(column.name) for column in columns)
+    return f"{quote(table.name)} ({names})"
+
+
+def _write_json(out: IO[bytes], value: Dict[str, Any]) -> None:
+    data = json.dumps(value, separators=(",", ":")).encode()
+    out.write(struct.pack("<I", len(data)))
+    out.write(data)
+
+
+def _read_json(source: IO[bytes]) -> Dict[str, Any]:
+    (size,) = struct.unpack("<I", _read(source, 4))
+    return json.loads(_read(source, size))
+
+
+def _write_block(out: IO[bytes], kinds: Sequence[str], rows: Sequence) -> None:
+    """Write one block of rows column by column."""
+    out.write(struct.pack("<I", len(rows)))
+    for index, kind in enumerate(kinds):
+        values = [row[index] for row in rows]
+        nulls = bytes(value is None for value in values)
+        if any(nulls):
+            out.write(b"\x01")
+            out.write(nulls)
+        else:
+            out.write(b"\x00")
+        if kind == "str":
+            encoded = [value.encode() if value is not None else b"" for value in values]
+            out.write(_pack("I", [len(value) for value in encoded]))
+            out.write(b"".join(encoded))
+        elif kind == "datetime":
+            out.write(
+                _pack(
+                    "q",
+                    [
+                        (value - EPOCH) // MICROSECOND if value is not None else 0
+                        for value in values
+                    ],
+                )
+            )
+        else:
+            out.write(_pack("q", [value or 0 for value in values]))
+
+
+def _read_block(source: IO[bytes], kinds: Sequence[str]) -> Optional[List[list]]:
+    """Read one block as a list of column value lists; None at a table's end."""
+    (count,) = struct.unpack("<I", _read(source, 4))
+    if count == 0:
+        return None
+    columns = []
+    for kind in kinds:
+        nulls = _read(source, count) if _read(source, 1) == b"\x01" else None
+        if kind == "str":
+            lengths = _unpack("I", _read(source, 4 * count))
+            payload = _read(source, sum(lengths))
+            values = []
+            offset = 0
+            for length in lengths:
+                values.append(payload[offset:offset + length].decode())
+                offset += length
+        else:
+            values = _unpack("q", _read(source, 8 * count)).tolist()
+            if kind == "datetime":
+                values = [EPOCH + value * MICROSECOND for value in values]
+        if nulls is not None:
+            values = [None if null else value for value, null in zip(values, nulls)]
+        columns.append(values)
+    return columns
+
+
+def _read(source: IO[bytes], size: int) -> bytes:
+    data = source.read(size)
+    if len(data) != size:
+        raise SnapshotError("Snapshot is truncated")
+    return data
+
+
+def _pack(typecode: str, values: list) -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(typecode: str, data: bytes) -> array:
+    unpacked = array(typecode)
+    unpacked.frombytes(data)
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["dump", "restore"])
+    parser.add_argument("path", help="snapshot file")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument(
+        "--level", type=int, default=6, help="gzip compression level for dumps"
+    )
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="delete existing rows (and their tokens, keys and jobs) first",
+    )
+    args = parser.parse_args()
+
+    engine = create_shard_engine(args.database_url)
+    try:
+        if args.command == "dump":
+            report = dump(engine, args.path, level=args.level)
+        else:
+            run_migrations(engine)
+            report = restore(engine, args.path, replace=args.replace)
+    except SnapshotError as exc:
+        raise SystemExit(f"{args.command} failed: {exc}")
+    finally:
+        engine.dispose()
+
+    rows = sum(report.rows.values())
+    for table, count in report.rows.items():
+        print(f"  {count:>10}  {table}")
+    print(f"rows:              {rows} ({rows / report.seconds:.0f} rows/s)")
+    print(f"file size:         {report.bytes / 2**20:.1f} MiB")
+    print(f"elapsed:           {report.seconds:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
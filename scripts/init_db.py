@@ -2,13 +2,33 @@ import json
 import os
 from pathlib import Path
 
-from sqlalchemy import create_engine
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
-from app.models.user import Base, User, Address, Geo, Company, AuthUser
+from app.models.user import User, Address, Geo, Company, AuthUser
 from app.core.security import get_password_hash
 
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def run_migrations(engine):
+    """Upgrade the schema to the latest Alembic revision."""
+    config = Config(str(PROJECT_ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_ROOT / "alembic"))
+    # Migrate the engine's database (ConfigParser needs "%" escaped)
+    url = engine.url.render_as_string(hide_password=False)
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    
+    # Databases created with create_all before migrations existed match 0001
+    inspector = inspect(engine)
+    if inspector.has_table("users") and not inspector.has_table("alembic_version"):
+        command.stamp(config, "0001")
+    
+    command.upgrade(config, "head")
+
 
 def init_db():
     """Initialize database with tables and seed data."""
@@ -16,8 +36,8 @@ def init_db():
     engine = create_engine(settings.DATABASE_URL)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    # Create or upgrade tables
+    run_migrations(engine)
     
     db = SessionLocal()
     
@@ -29,7 +49,7 @@ def init_db():
             return
         
         # Load seed data
-        seed_file = Path(__file__).parent.parent / "users_seed_data.json"
+        seed_file = PROJECT_ROOT / "users_seed_data.json"
         if not seed_file.exists():
             print("Seed data file not found, creating sample data.")
             create_sample_data(db)
@@ -0,0 +1,292 @@
+"""
+Move users between shard layouts.
+
+Copies every user (with address, geo and company) from the source databases
+to the target shard its id hashes to among ``--to``, skipping users that are
+already in the right place, then rebuilds the user directory from the
+targets. Users are read in id order in batches; each batch is committed on
+its targets before (with ``--delete-moved``) it is removed from its source,
+so an interrupted run can simply be started again.
+
+Run it while writes are stopped, then restart the API with
+USER_SHARD_URLS set to the ``--to`` list. Address, geo and company ids are
+allocated anew on the target shard.
+
+Usage:
+    # Spread an unsharded DATABASE_URL over two shards
+    python -m scripts.reshard --to sqlite:///./shard0.db sqlite:///./shard1.db
+
+    # Grow from two shards to three; only a third of the users move
+    python -m scripts.reshard \\
+        --from sqlite:///./shard0.db sqlite:///./shard1.db \\
+        --to sqlite:///./shard0.db sqlite:///./shard1.db sqlite:///./shard2.db \\
+        --delete-moved
+"""
+
+import argparse
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import app.database  # noqa: F401  (SQLite foreign keys, for ON DELETE CASCADE)
+from app.core.config import settings
+from app.crud import user as user_crud
+from app.crud.snapshot import snapshot_query
+from app.models.user import Address, Company, Geo, User, UserDirectory
+from app.sharding import create_shard_engine, jump_hash
+from scripts.init_db import run_migrations
+
+USER_COLUMNS = ("id", "name", "username", "email", "phone", "website", "updated_at")
+ADDRESS_COLUMNS = ("street", "suite", "city", "zipcode")
+COMPANY_COLUMNS = ("catchPhrase", "bs")
+
+
+@dataclass
+class ReshardReport:
+    """What a run did, and how many users each target holds afterwards."""
+    scanned: int = 0
+    moved: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+    users_per_target: List[int] = field(default_factory=list)
+    misplaced: int = 0
+
+
+def reshard(
+    source_urls: Sequence[str],
+    target_urls: Sequence[str],
+    directory_url: Optional[str] = None,
+    batch_size: int = 1000,
+    delete_moved: bool = False,
+    migrate: bool = True,
+) -> ReshardReport:
+    """
+    Copy users from ``source_urls`` onto the ``target_urls`` shard layout.
+
+    ``directory_url`` (DATABASE_URL by default) gets its user directory
+    rebuilt from the targets. Returns a report with per-target user counts
+    and the number of users still on a shard they do not hash to.
+    """
+    engines: Dict[str, Engine] = {}
+    for url in [*source_urls, *target_urls]:
+        if url not in engines:
+            engines[url] = create_shard_engine(url)
+    directory_url = directory_url or settings.DATABASE_URL
+    directory_engine = engines.get(directory_url) or create_shard_engine(
+        directory_url
+    )
+    report = ReshardReport()
+    started = time.perf_counter()
+    try:
+        if migrate:
+            for engine in {*(engines[url] for url in target_urls), directory_engine}:
+                run_migrations(engine)
+
+        for source_url in source_urls:
+            _move_from(
+                source_url, target_urls, engines, batch_size, delete_moved, report
+            )
+
+        rebuild_directory(directory_engine, [engines[url] for url in target_urls])
+
+        for index, url in enumerate(target_urls):
+            with Session(engines[url]) as target:
+                user_ids = list(target.scalars(select(User.id)))
+            report.users_per_target.append(len(user_ids))
+            report.misplaced += sum(
+                1
+                for user_id in user_ids
+                if jump_hash(user_id, len(target_urls)) != index
+            )
+    finally:
+        for engine in {*engines.values(), directory_engine}:
+            engine.dispose()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _move_from(
+    source_url: str,
+    target_urls: Sequence[str],
+    engines: Dict[str, Engine],
+    batch_size: int,
+    delete_moved: bool,
+    report: ReshardReport,
+) -> None:
+    """Copy the users of one source that belong elsewhere, batch by batch."""
+    last_id = 0
+    with Session(engines[source_url]) as source:
+        while True:
+            rows = source.execute(
+                snapshot_query().where(User.id > last_id).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            report.scanned += len(rows)
+
+            rows_by_target: Dict[str, list] = {}
+            for row in rows:
+                target_url = target_urls[jump_hash(row["id"], len(target_urls))]
+                if target_url != source_url:
+                    rows_by_target.setdefault(target_url, []).append(row)
+
+            for target_url, target_rows in rows_by_target.items():
+                with Session(engines[target_url]) as target:
+                    report.moved += copy_users(target, target_rows)
+                    target.commit()
+
+            if delete_moved:
+                moved_ids = [
+                    row["id"] for target_rows in rows_by_target.values()
+                    for row in target_rows
+                ]
+                for chunk in user_crud.chunked(moved_ids):
+                    result = source.execute(
+                        delete(User.__table__).where(User.id.in_(chunk))
+                    )
+                    report.deleted += result.rowcount
+            source.commit()
+
+
+def copy_users(target: Session, rows: list) -> int:
+    """
+    Insert flat ``snapshot_query`` rows as users with their related rows.
+
+    Users the target already has are left alone, so a batch can be copied
+    again after an interrupted run. Returns the number of users inserted.
+    """
+    users = User.__table__
+    inserted = set(
+        target.scalars(
+            user_crud.dialect_insert(target, users)
+            .on_conflict_do_nothing()
+            .returning(users.c.id),
+            [{column: row[column] for column in USER_COLUMNS} for row in rows],
+        )
+    )
+    rows = [row for row in rows if row["id"] in inserted]
+
+    addresses = [row for row in rows if row["address_id"] is not None]
+    address_ids = {}
+    if addresses:
+        address_ids = dict(
+            target.execute(
+                user_crud.dialect_insert(target, Address.__table__).returning(
+                    Address.user_id, Address.id
+                ),
+                [
+                    {
+                        **{column: row[column] for column in ADDRESS_COLUMNS},
+                        "user_id": row["id"],
+                    }
+                    for row in addresses
+                ],
+            ).all()
+        )
+    geos = [row for row in addresses if row["geo_id"] is not None]
+    if geos:
+        target.execute(
+            user_crud.dialect_insert(target, Geo.__table__),
+            [
+                {
+                    "lat": row["lat"],
+                    "lng": row["lng"],
+                    "address_id": address_ids[row["id"]],
+                }
+                for row in geos
+            ],
+        )
+    companies = [row for row in rows if row["company_id"] is not None]
+    if companies:
+        target.execute(
+            user_crud.dialect_insert(target, Company.__table__),
+            [
+                {
+                    **{column: row[column] for column in COMPANY_COLUMNS},
+                    "name": row["company_name"],
+                    "user_id": row["id"],
+                }
+                for row in companies
+            ],
+        )
+    return len(rows)
+
+
+def rebuild_directory(
+    directory_engine: Engine, target_engines: List[Engine], batch_size: int = 10000
+) -> int:
+    """Replace the user directory with the users found on the targets."""
+    with Session(directory_engine) as directory:
+        directory.execute(delete(UserDirectory.__table__))
+        count = 0
+        max_id = 0
+        for engine in target_engines:
+            with Session(engine) as target:
+                result = target.execute(
+                    select(User.id, User.username, User.email).execution_options(
+                        yield_per=batch_size
+                    )
+                )
+                for batch in result.mappings().partitions():
+                    directory.execute(
+                        user_crud.dialect_insert(directory, UserDirectory.__table__),
+                        [dict(row) for row in batch],
+                    )
+                    count += len(batch)
+                    max_id = max(max_id, max(row["id"] for row in batch))
+        if max_id:
+            user_crud.advance_id_sequence(directory, UserDirectory, max_id)
+        directory.commit()
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--from",
+        dest="sources",
+        nargs="+",
+        default=settings.USER_SHARD_URLS or [settings.DATABASE_URL],
+        help="databases holding the users now (default: USER_SHARD_URLS, "
+        "or DATABASE_URL when unsharded)",
+    )
+    parser.add_argument(
+        "--to", dest="targets", nargs="+", required=True, help="new shard layout"
+    )
+    parser.add_argument(
+        "--directory-url",
+        default=settings.DATABASE_URL,
+        help="database holding the user directory",
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--delete-moved",
+        action="store_true",
+        help="remove copied users from their source database",
+    )
+    args = parser.parse_args()
+
+    report = reshard(
+        args.sources,
+        args.targets,
+        directory_url=args.directory_url,
+        batch_size=args.batch_size,
+        delete_moved=args.delete_moved,
+    )
+    rate = report.moved / report.seconds if report.seconds else 0.0
+    print(f"users scanned:     {report.scanned}")
+    print(f"users moved:       {report.moved} ({rate:.0f} users/s)")
+    print(f"users deleted:     {report.deleted}")
+    for url, count in zip(args.targets, report.users_per_target):
+        print(f"  {count:>10}  {url}")
+    print(f"misplaced users:   {report.misplaced}")
+    print(f"elapsed:           {report.seconds:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
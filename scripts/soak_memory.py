@@ -0,0 +1,163 @@
+"""
+Soak-test routes for per-request memory growth.
+
+Seeds an in-memory SQLite database, then sends each route the same request
+over and over, straight through the ASGI app (no HTTP), with the memory
+profiler running. After every round it collects garbage and samples traced
+memory; the least-squares slope over the rounds is the memory each request
+leaves behind. Routes above ``--threshold`` bytes per request are flagged
+together with the allocation sites that grew, and the exit status is 1.
+
+Tracing makes every allocation an order of magnitude slower, so keep the
+request counts modest; a real leak shows up within a few hundred requests.
+
+Usage:
+    python -m scripts.soak_memory --requests 600
+    python -m scripts.soak_memory --path "/api/v1/users/?city=Gwenborough"
+"""
+
+import argparse
+import asyncio
+import gc
+import resource
+import sys
+import tracemalloc
+from typing import List, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.core.memory_profile import memory_profiler
+from app.database import get_db
+from app.main import app
+from app.models.user import Base
+from scripts.bench_snapshot import seed
+
+DEFAULT_PATHS = ["/api/v1/users/", "/api/v1/users/1", "/api/v1/users/?city=Roscoeview"]
+
+
+async def request(path: str) -> int:
+    """Send one GET through the app and return its status."""
+    url = urlsplit(path)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"soak")],
+        "client": ("127.0.0.1", 0),
+        "server": ("soak", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def growth_per_request(samples: Sequence[Tuple[int, int]]) -> float:
+    """Least-squares slope of (requests sent, traced bytes) samples."""
+    count = len(samples)
+    mean_x = sum(x for x, _ in samples) / count
+    mean_y = sum(y for _, y in samples) / count
+    variance = sum((x - mean_x) ** 2 for x, _ in samples)
+    if not variance:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in samples) / variance
+
+
+async def soak(path: str, requests: int, rounds: int) -> List[Tuple[int, int]]:
+    """Traced bytes after each round of requests, after a warm-up round."""
+    per_round = max(1, requests // rounds)
+    for _ in range(per_round):
+        await request(path)
+    memory_profiler.reset()
+    samples = []
+    for round_number in range(1, rounds + 1):
+        for _ in range(per_round):
+            status = await request(path)
+            if status != 200:
+                raise SystemExit(f"{path} returned {status}")
+        gc.collect()
+        samples.append((round_number * per_round, tracemalloc.get_traced_memory()[0]))
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=300, help="per route")
+    parser.add_argument("--rounds", type=int, default=6)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=64.0,
+        help="bytes retained per request above which a route is flagged",
+    )
+    parser.add_argument(
+        "--path", dest="paths", action="append", help="GET path (repeatable)"
+    )
+    parser.add_argument(
+        "--frames", type=int, default=1, help="stack depth traced per allocation"
+    )
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, args.users)
+    sessions = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    settings.ACCESS_LOG_ENABLED = False
+    memory_profiler.start(args.frames)
+
+    flagged = 0
+    for path in args.paths or DEFAULT_PATHS:
+        samples = asyncio.run(soak(path, args.requests, args.rounds))
+        growth = growth_per_request(samples)
+        route = memory_profiler.routes()[0]
+        print(f"{path}")
+        print(f"  requests:          {route['requests']}")
+        print(f"  mean delta:        {route['mean_delta_bytes']:.0f} bytes")
+        print(f"  mean peak:         {route['mean_peak_bytes'] or 0:.0f} bytes")
+        print(f"  growth:            {growth:.1f} bytes/request")
+        if growth > args.threshold:
+            flagged += 1
+            print("  GROWING; sites that grew during the soak:")
+            for site in memory_profiler.growth_sites(limit=5):
+                print(f"    {site['size_diff_bytes']:>10}  {site['site']}")
+
+    memory_profiler.stop()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"max RSS:             {max_rss / 1024:.1f} MiB")
+    print(f"routes flagged:      {flagged}")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
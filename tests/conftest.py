@@ -1,45 +1,219 @@
+"""
+Test fixtures.
+
+The schema is created once per test process. Each test then runs inside one
+transaction on one connection that is rolled back afterwards; the sessions
+handed to the app (and to tests through ``db_session``) join it with
+SAVEPOINTs, so their commits never outlive the test. Tests are therefore
+isolated and can run in parallel with pytest-xdist, where every worker gets
+its own database.
+
+``DATABASE_TEST_URL=sqlite://`` runs the suite on an in-memory database.
+"""
+
+import os
+
+# Must happen before settings are imported: bcrypt cost 4 instead of 10-12
+# and no access log writer or job runner threads unless a test starts one
+os.environ.setdefault("ENVIRONMENT", "test")
+os.environ.setdefault("ACCESS_LOG_ENABLED", "false")
+os.environ.setdefault("JOB_RUNNER_ENABLED", "false")
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.main import app
 from app.database import get_db
 from app.models.user import Base
 from app.core.config import settings
+from app.core.rate_limit import login_throttle
+from app.crud.api_key import clear_api_key_cache
+from app.crud.snapshot import user_snapshot
+from app.crud.user import invalidate_user_counts
+from app.middleware.idempotency import idempotency_store
+
+
+def worker_database_url(url: str, worker: str) -> str:
+    """
+    Database URL for one pytest-xdist worker (``gw0``, ``gw1``, ...).
+
+    SQLite files and PostgreSQL databases get the worker id as a suffix;
+    in-memory SQLite is already private to the worker process.
+    """
+    parsed = make_url(url)
+    if worker in ("", "master") or parsed.database in (None, "", ":memory:"):
+        return url
+    if parsed.get_backend_name() == "sqlite":
+        root, extension = os.path.splitext(parsed.database)
+        database = f"{root}_{worker}{extension}"
+    else:
+        database = f"{parsed.database}_{worker}"
+    return parsed.set(database=database).render_as_string(hide_password=False)
 
-# Create test database engine
-SQLALCHEMY_DATABASE_URL = settings.DATABASE_TEST_URL
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def create_test_engine(url: str) -> Engine:
+    """Engine whose single test connection may be used from the app's threads."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return create_engine(url)
+
+    options = {"connect_args": {"check_same_thread": False}}
+    if parsed.database in (None, "", ":memory:"):
+        # Every connection to sqlite:// is a new empty database; share one
+        options["poolclass"] = StaticPool
+    test_engine = create_engine(url, **options)
+
+    # pysqlite defers BEGIN until the first write, which breaks SAVEPOINTs;
+    # take over transaction control as the SQLAlchemy docs recommend
+    @event.listens_for(test_engine, "connect")
+    def disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(test_engine, "begin")
+    def begin_sqlite_transaction(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    return test_engine
+
+
+def create_database(url: str) -> None:
+    """Create the PostgreSQL database for ``url`` if it does not exist yet."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return
+    admin = create_engine(
+        parsed.set(database="postgres"), isolation_level="AUTOCOMMIT"
+    )
+    try:
+        with admin.connect() as connection:
+            exists = connection.scalar(
+                text("SELECT 1 FROM pg_database WHERE datname = :name"),
+                {"name": parsed.database},
+            )
+            if not exists:
+                connection.execute(text(f'CREATE DATABASE "{parsed.database}"'))
+    finally:
+        admin.dispose()
 
 
-def override_get_db():
-    """Override database dependency for testing."""
+def drop_database(url: str) -> None:
+    """Remove a database made by ``create_database`` (or a SQLite file)."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        if parsed.database not in (None, "", ":memory:"):
+            if os.path.exists(parsed.database):
+                os.remove(parsed.database)
+        return
+    admin = create_engine(
+        parsed.set(database="postgres"), isolation_level="AUTOCOMMIT"
+    )
     try:
-        db = TestingSessionLocal()
-        yield db
+        with admin.connect() as connection:
+            connection.execute(text(f'DROP DATABASE IF EXISTS "{parsed.database}"'))
     finally:
-        db.close()
+        admin.dispose()
+
+
+SQLALCHEMY_DATABASE_URL = worker_database_url(
+    settings.DATABASE_TEST_URL, os.environ.get("PYTEST_XDIST_WORKER", "")
+)
+engine = create_test_engine(SQLALCHEMY_DATABASE_URL)
+# Sessions join the test's transaction: commit() releases a SAVEPOINT
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, join_transaction_mode="create_savepoint"
+)
 
 
 @pytest.fixture(scope="session")
 def db():
-    """Create test database."""
+    """Create the test database schema once per test process."""
+    create_database(SQLALCHEMY_DATABASE_URL)
     Base.metadata.create_all(bind=engine)
     yield
     Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    if SQLALCHEMY_DATABASE_URL != settings.DATABASE_TEST_URL:
+        # Per-worker databases only exist for this run
+        drop_database(SQLALCHEMY_DATABASE_URL)
+
+
+@pytest.fixture
+def connection(db):
+    """Connection whose transaction is rolled back when the test ends."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    yield connection
+    transaction.rollback()
+    connection.close()
 
 
 @pytest.fixture
-def client(db):
+def db_session(connection):
+    """Session for test code, sharing the transaction the app sees."""
+    session = TestingSessionLocal(bind=connection)
+    yield session
+    session.close()
+
+
+@pytest.fixture(autouse=True)
+def reset_process_state():
+    """
+    Start every test with empty per-process caches and rate limit buckets,
+    so nothing from a rolled-back test is served to the next one.
+    """
+    login_throttle.store.clear()
+    clear_api_key_cache()
+    invalidate_user_counts()
+    idempotency_store.clear()
+    user_snapshot.clear()
+
+
+@pytest.fixture
+def client(connection):
     """Create test client."""
+    def override_get_db():
+        """Override database dependency for testing."""
+        session = TestingSessionLocal(bind=connection)
+        try:
+            yield session
+        finally:
+            session.close()
+
     app.dependency_overrides[get_db] = override_get_db
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
 
 
+def make_user_data(
+    username: str, city: str = "Test City", company: str = "Test Corp"
+) -> dict:
+    """Users API body for a user with a unique username and email."""
+    return {
+        "name": f"User {username}",
+        "username": username,
+        "email": f"{username}@example.com",
+        "phone": "555-000-0000",
+        "website": "users.example.com",
+        "address": {
+            "street": "Test St",
+            "suite": "Suite 1",
+            "city": city,
+            "zipcode": "11111",
+            "geo": {"lat": "1.0", "lng": "1.0"},
+        },
+        "company": {
+            "name": company,
+            "catchPhrase": "Tested",
+            "bs": "fixtures",
+        },
+    }
+
+
 @pytest.fixture
 def auth_headers(client):
     """Create authenticated user and return auth headers."""
@@ -54,4 +228,4 @@ def auth_headers(client):
     )
     assert response.status_code == 200
     token = response.json()["access_token"]
-    return {"Authorization": f"Bearer {token}"} 
\ No newline at end of file
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,122 @@
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from app.core.access_log import start_access_log, stop_access_log
+from app.core.config import settings
+from app.core.request_context import start_request
+
+
+@pytest.fixture
+def access_log(client: TestClient):
+    """Capture access log lines written while the test runs."""
+    stream = io.StringIO()
+    stop_access_log()
+    start_access_log(stream)
+
+    def records():
+        stop_access_log()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield records
+    stop_access_log()
+
+
+def test_access_log_records_request_details(client: TestClient, access_log):
+    """Test each request is logged with route, status, timings and request id."""
+    response = client.post(
+        "/api/v1/auth/register",
+        json={
+            "name": "Logged User",
+            "email": "logged@example.com",
+            "password": "logpass123",
+        },
+        headers={"X-Request-ID": "req-123"},
+    )
+    assert response.headers["X-Request-ID"] == "req-123"
+    token = response.json()["access_token"]
+
+    response = client.delete(
+        "/api/v1/users/999999", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 404
+    generated_id = response.headers["X-Request-ID"]
+
+    register, delete = access_log()
+    assert register["request_id"] == "req-123"
+    assert register["route"] == "/api/v1/auth/register"
+    assert register["status"] == 200
+    assert register["db_queries"] > 0
+    assert register["db_ms"] <= register["latency_ms"]
+
+    assert delete["request_id"] == generated_id
+    assert delete["method"] == "DELETE"
+    assert delete["route"] == "/api/v1/users/{user_id}"
+    assert delete["status"] == 404
+    assert isinstance(delete["user_id"], int)
+
+
+def test_successful_gets_are_sampled(client: TestClient, access_log, monkeypatch):
+    """Test successful GETs follow the sample rate while errors are always kept."""
+    monkeypatch.setattr(settings, "ACCESS_LOG_SAMPLE_RATE", 0.0)
+    assert client.get("/api/v1/users/").status_code == 200
+    assert client.get("/api/v1/users/999999").status_code == 404
+
+    records = access_log()
+    assert [(r["route"], r["status"]) for r in records] == [
+        ("/api/v1/users/{user_id}", 404)
+    ]
+    assert records[0]["sample_rate"] == 1.0
+
+
+def test_batch_sub_requests_are_logged(client: TestClient, access_log, monkeypatch):
+    """Test each batch sub-request is logged under the batch's request id."""
+    monkeypatch.setattr(settings, "ACCESS_LOG_SAMPLE_RATE", 1.0)
+    token = client.post(
+        "/api/v1/auth/register",
+        json={
+            "name": "Batch Logger",
+            "email": "batch-logger@example.com",
+            "password": "logpass123",
+        },
+    ).json()["access_token"]
+    response = client.post(
+        "/api/v1/batch",
+        json={
+            "requests": [
+                {"method": "GET", "path": "/users/"},
+                {"method": "DELETE", "path": "/users/999999"},
+            ]
+        },
+        headers={"Authorization": f"Bearer {token}", "X-Request-ID": "batch-1"},
+    )
+    assert response.status_code == 200
+
+    records = [r for r in access_log() if r["request_id"] == "batch-1"]
+    assert [(r["method"], r["route"], r["status"]) for r in records] == [
+        ("GET", "/api/v1/users/", 200),
+        ("DELETE", "/api/v1/users/{user_id}", 404),
+        ("POST", "/api/v1/batch", 200),
+    ]
+    assert [r.get("batch_index") for r in records] == [0, 1, None]
+    assert records[0]["db_queries"] > 0
+    assert records[1]["user_id"] == records[2]["user_id"] is not None
+
+
+def test_failed_statements_do_not_skew_db_time():
+    """Test a failing query drops its timer instead of leaving it behind."""
+    engine = create_engine("sqlite://")
+    context = start_request("db-timer")
+    with engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.exec_driver_sql("SELECT * FROM missing_table")
+        assert connection.info["query_started_at"] == []
+        connection.exec_driver_sql("SELECT 1")
+        assert connection.info["query_started_at"] == []
+    assert context.db_queries == 1
+    assert context.db_time < 1
+    engine.dispose()
@@ -0,0 +1,67 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.crud import api_key as api_key_crud
+
+
+def test_api_key_authenticates_requests(client: TestClient, auth_headers):
+    """Test an issued API key works in X-API-Key and as a bearer token."""
+    response = client.post(
+        "/api/v1/auth/api-keys/", json={"name": "sync job"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    key = data["key"]
+    assert key.startswith(f"jpk_{data['prefix']}_")
+
+    listed = client.get("/api/v1/auth/api-keys/", headers={"X-API-Key": key})
+    assert listed.status_code == 200
+    assert "key" not in listed.json()[0]
+    assert data["id"] in [api_key["id"] for api_key in listed.json()]
+
+    response = client.get(
+        "/api/v1/auth/api-keys/", headers={"Authorization": f"Bearer {key}"}
+    )
+    assert response.status_code == 200
+
+    wrong = key[:-4] + ("aaaa" if not key.endswith("aaaa") else "bbbb")
+    response = client.get("/api/v1/auth/api-keys/", headers={"X-API-Key": wrong})
+    assert response.status_code == 401
+
+
+def test_revoked_api_key_is_rejected(client: TestClient, auth_headers):
+    """Test a revoked API key stops authenticating."""
+    data = client.post(
+        "/api/v1/auth/api-keys/", json={"name": "old job"}, headers=auth_headers
+    ).json()
+    headers = {"X-API-Key": data["key"]}
+    assert client.get("/api/v1/auth/api-keys/", headers=headers).status_code == 200
+
+    response = client.delete(
+        f"/api/v1/auth/api-keys/{data['id']}", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["revoked_at"] is not None
+    assert client.get("/api/v1/auth/api-keys/", headers=headers).status_code == 401
+
+
+def test_api_key_cache_is_bounded(client: TestClient, auth_headers, monkeypatch):
+    """Test the verification cache evicts least recently used keys."""
+    monkeypatch.setattr(settings, "API_KEY_CACHE_MAX_ENTRIES", 2)
+    api_key_crud.clear_api_key_cache()
+    keys = [
+        client.post(
+            "/api/v1/auth/api-keys/",
+            json={"name": f"job {i}"},
+            headers=auth_headers,
+        ).json()
+        for i in range(3)
+    ]
+    for data in keys:
+        response = client.get(
+            "/api/v1/auth/api-keys/", headers={"X-API-Key": data["key"]}
+        )
+        assert response.status_code == 200
+
+    assert list(api_key_crud._key_cache) == [data["prefix"] for data in keys[1:]]
+    api_key_crud.clear_api_key_cache()
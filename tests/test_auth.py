@@ -1,6 +1,15 @@
+from types import SimpleNamespace
+
 import pytest
+from fastapi import Request
 from fastapi.testclient import TestClient
 
+from app.api.v1 import auth
+from app.core import security
+from app.core.config import settings
+from app.core.rate_limit import RateLimitStore, client_ip, throttled_logins
+from app.crud.user import get_auth_user_by_email
+
 
 def test_register_user(client: TestClient):
     """Test user registration."""
@@ -92,4 +101,186 @@ def test_register_invalid_email(client: TestClient):
             "password": "secret123"
         }
     )
-    assert response.status_code == 422  # Validation error 
\ No newline at end of file
+    assert response.status_code == 422  # Validation error 
+
+
+def test_refresh_token_rotation(client: TestClient):
+    """Test refresh tokens rotate and can only be used once."""
+    response = client.post(
+        "/api/v1/auth/register",
+        json={
+            "name": "Refresh User",
+            "email": "refresh@example.com",
+            "password": "secret123"
+        }
+    )
+    first = response.json()["refresh_token"]
+    
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    assert response.status_code == 200
+    data = response.json()
+    assert "access_token" in data
+    second = data["refresh_token"]
+    assert second != first
+    
+    me = client.get(
+        "/api/v1/auth/api-keys/",
+        headers={"Authorization": f"Bearer {data['access_token']}"}
+    )
+    assert me.status_code == 200
+    assert client.get("/api/v1/auth/api-keys/").status_code in (401, 403)
+    
+    # Reusing a rotated token fails and revokes the whole family
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    assert response.status_code == 401
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": second})
+    assert response.status_code == 401
+
+
+def test_revoke_refresh_token(client: TestClient):
+    """Test a revoked refresh token can no longer be exchanged."""
+    client.post(
+        "/api/v1/auth/register",
+        json={
+            "name": "Revoke User",
+            "email": "revoke@example.com",
+            "password": "secret123"
+        }
+    )
+    response = client.post(
+        "/api/v1/auth/login",
+        json={
+            "email": "revoke@example.com",
+            "password": "secret123"
+        }
+    )
+    token = response.json()["refresh_token"]
+    
+    response = client.post("/api/v1/auth/revoke", json={"refresh_token": token})
+    assert response.status_code == 204
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": token})
+    assert response.status_code == 401
+
+
+def test_login_rehashes_outdated_password_hash(
+    client: TestClient, db_session, monkeypatch
+):
+    """Test login upgrades hashes made with a different bcrypt cost."""
+    monkeypatch.setattr(security, "pwd_context", security.build_pwd_context(4))
+    client.post(
+        "/api/v1/auth/register",
+        json={
+            "name": "Rehash User",
+            "email": "rehash@example.com",
+            "password": "secret123"
+        }
+    )
+    
+    monkeypatch.setattr(security, "pwd_context", security.build_pwd_context(5))
+    response = client.post(
+        "/api/v1/auth/login",
+        json={
+            "email": "rehash@example.com",
+            "password": "secret123"
+        }
+    )
+    assert response.status_code == 200
+    
+    user = get_auth_user_by_email(db_session, "rehash@example.com")
+    assert user.password_hash.startswith("$2b$05$")
+
+
+def test_login_throttled_per_email(client: TestClient, monkeypatch):
+    """Test repeated logins for one email get 429 before any password check."""
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_EMAIL", 2)
+    verified = []
+    monkeypatch.setattr(
+        auth, "authenticate_user", lambda db, email, password: verified.append(email)
+    )
+    rejected_before = throttled_logins.value(key="email")
+    
+    credentials = {"email": "stuffed@example.com", "password": "guess"}
+    for _ in range(2):
+        response = client.post("/api/v1/auth/login", json=credentials)
+        assert response.status_code == 401
+    
+    response = client.post("/api/v1/auth/login", json=credentials)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert len(verified) == 2
+    assert throttled_logins.value(key="email") == rejected_before + 1
+    
+    metrics = client.get("/metrics").text
+    assert 'login_attempts_throttled_total{key="email"}' in metrics
+
+
+def test_login_throttled_per_ip(client: TestClient, monkeypatch):
+    """Test one client trying many emails is throttled by IP."""
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_IP", 3)
+    
+    statuses = [
+        client.post(
+            "/api/v1/auth/login",
+            json={"email": f"spray{i}@example.com", "password": "guess"}
+        ).status_code
+        for i in range(4)
+    ]
+    assert statuses == [401, 401, 401, 429]
+
+
+def test_successful_logins_are_not_throttled(client: TestClient, monkeypatch):
+    """Test only failed logins count towards the per-IP limit."""
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_IP", 2)
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_EMAIL", 2)
+    monkeypatch.setattr(auth, "authenticate_user", lambda db, email, password: None)
+    response = client.post(
+        "/api/v1/auth/login", json={"email": "nat@example.com", "password": "typo"}
+    )
+    assert response.status_code == 401
+
+    monkeypatch.setattr(
+        auth,
+        "authenticate_user",
+        lambda db, email, password: SimpleNamespace(id=1, email=email),
+    )
+    monkeypatch.setattr(auth, "issue_refresh_token", lambda db, user_id: "refresh")
+    statuses = [
+        client.post(
+            "/api/v1/auth/login",
+            json={"email": "nat@example.com", "password": "right"},
+        ).status_code
+        for _ in range(5)
+    ]
+    assert statuses == [200] * 5
+
+
+@pytest.mark.parametrize(
+    "peer, forwarded, expected",
+    [
+        ("203.0.113.9", "198.51.100.1", "203.0.113.9"),
+        ("10.0.0.2", "198.51.100.1", "198.51.100.1"),
+        ("10.0.0.2", "6.6.6.6, 198.51.100.1, 10.0.0.7", "198.51.100.1"),
+        ("10.0.0.2", "", "10.0.0.2"),
+    ],
+)
+def test_client_ip_trusts_only_configured_proxies(
+    monkeypatch, peer, forwarded, expected
+):
+    """Test X-Forwarded-For is read right to left from trusted proxies only."""
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["10.0.0.0/8"])
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    request = Request({"type": "http", "client": (peer, 50000), "headers": headers})
+    assert client_ip(request) == expected
+
+
+def test_incomplete_rate_limit_store_cannot_be_created():
+    """Test a rate limit backend missing a method fails when it is created."""
+    class NoRefund(RateLimitStore):
+        async def hit(self, key, capacity, window_seconds):
+            return 0.0
+
+        def clear(self):
+            pass
+
+    with pytest.raises(TypeError):
+        NoRefund()
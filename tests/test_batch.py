@@ -0,0 +1,159 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from app.crud import user as user_crud
+from tests.conftest import make_user_data
+
+
+def test_batch_requires_auth(client: TestClient):
+    """Test the batch endpoint rejects unauthenticated callers."""
+    response = client.post(
+        "/api/v1/batch", json={"requests": [{"method": "GET", "path": "/users/"}]}
+    )
+    assert response.status_code in (401, 403)
+
+
+def test_batch_runs_reads_and_writes_in_order(client: TestClient, auth_headers):
+    """Test sub-requests run in order and reads see earlier writes."""
+    created = client.post(
+        "/api/v1/users/", json=make_user_data("batchone"), headers=auth_headers
+    ).json()
+    user_id = created["id"]
+
+    response = client.post(
+        "/api/v1/batch",
+        json={
+            "requests": [
+                {"method": "GET", "path": f"/api/v1/users/{user_id}"},
+                {
+                    "method": "PATCH",
+                    "path": f"/api/v1/users/{user_id}",
+                    "body": {"address": {"city": "Batched City"}},
+                },
+                {"method": "GET", "path": f"/api/v1/users/{user_id}"},
+                {"method": "GET", "path": "/api/v1/users/?city=Batched City"},
+                {"method": "GET", "path": "/api/v1/users/999999"},
+                {"method": "POST", "path": "/api/v1/users/", "body": {"name": "x"}},
+                {"method": "GET", "path": "/api/v1/auth/login"},
+            ]
+        },
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    results = response.json()
+    statuses = [result["status"] for result in results]
+    assert statuses == [200, 200, 200, 200, 404, 422, 404]
+    assert results[0]["body"] == created
+    assert results[1]["body"]["address"]["city"] == "Batched City"
+    assert results[2]["body"] == results[1]["body"]
+    assert [user["id"] for user in results[3]["body"]] == [user_id]
+    assert results[3]["headers"]["X-Total-Count"] == "1"
+    assert results[4]["body"] == {"detail": "User not found"}
+
+
+def test_atomic_batch_commits_all_writes(client: TestClient, auth_headers):
+    """Test an atomic batch applies every write when all of them succeed."""
+    response = client.post(
+        "/api/v1/batch",
+        json={
+            "atomic": True,
+            "requests": [
+                {
+                    "method": "POST",
+                    "path": "/users/",
+                    "body": make_user_data("batchtwo"),
+                },
+                {"method": "GET", "path": "/users/?username=batchtwo"},
+            ],
+        },
+        headers=auth_headers,
+    )
+    results = response.json()
+    assert [result["status"] for result in results] == [200, 200]
+    assert results[1]["body"][0]["id"] == results[0]["body"]["id"]
+
+    user_id = results[0]["body"]["id"]
+    assert client.get(f"/api/v1/users/{user_id}").status_code == 200
+
+
+def test_atomic_batch_rolls_back_on_failure(client: TestClient, auth_headers):
+    """Test a failing sub-request rolls back the whole atomic batch."""
+    response = client.post(
+        "/api/v1/batch",
+        json={
+            "atomic": True,
+            "requests": [
+                {
+                    "method": "POST",
+                    "path": "/users/",
+                    "body": make_user_data("batchthree"),
+                },
+                {"method": "DELETE", "path": "/users/999999"},
+                {"method": "GET", "path": "/users/"},
+            ],
+        },
+        headers=auth_headers,
+    )
+    results = response.json()
+    assert [result["status"] for result in results] == [424, 404, 424]
+
+    listing = client.get("/api/v1/users/?username=batchthree")
+    assert listing.json() == []
+    assert listing.headers["X-Total-Count"] == "0"
+
+
+def test_atomic_batch_rolls_back_on_conflict(client: TestClient, auth_headers):
+    """Test a duplicate user inside an atomic batch fails it with a 400."""
+    response = client.post(
+        "/api/v1/batch",
+        json={
+            "atomic": True,
+            "requests": [
+                {
+                    "method": "PUT",
+                    "path": "/users/5151",
+                    "body": make_user_data("batchfour"),
+                },
+                {
+                    "method": "POST",
+                    "path": "/users/",
+                    "body": make_user_data("batchfour"),
+                },
+            ],
+        },
+        headers=auth_headers,
+    )
+    results = response.json()
+    assert [result["status"] for result in results] == [424, 400]
+    assert results[1]["body"]["detail"] == "Email already registered"
+    assert client.get("/api/v1/users/5151").status_code == 404
+
+
+def test_unexpected_error_fails_only_its_item(
+    client: TestClient, auth_headers, monkeypatch
+):
+    """Test a database error in one sub-request becomes a 500 for that item."""
+    def broken_get_user(db, user_id):
+        raise OperationalError("SELECT", {}, Exception("connection reset"))
+
+    monkeypatch.setattr(user_crud, "get_user", broken_get_user)
+    response = client.post(
+        "/api/v1/batch",
+        json={
+            "requests": [
+                {
+                    "method": "POST",
+                    "path": "/users/",
+                    "body": make_user_data("batchfive"),
+                },
+                {"method": "GET", "path": "/users/1"},
+                {"method": "GET", "path": "/users/?username=batchfive"},
+            ],
+        },
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["status"] for result in results] == [200, 500, 200]
+    assert results[1]["body"] == {"detail": "Internal Server Error"}
+    assert [user["username"] for user in results[2]["body"]] == ["batchfive"]
@@ -0,0 +1,58 @@
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+
+
+def test_worker_count_explicit():
+    """Test configured worker count is used as-is."""
+    settings = Settings(WEB_CONCURRENCY=3)
+    assert settings.get_worker_count() == 3
+
+
+def test_worker_count_auto_sized(monkeypatch):
+    """Test worker count is derived from CPU count and capped."""
+    monkeypatch.setattr("os.cpu_count", lambda: 4)
+    assert Settings(WEB_CONCURRENCY=0, MAX_WORKERS=16).get_worker_count() == 9
+    assert Settings(WEB_CONCURRENCY=0, MAX_WORKERS=4).get_worker_count() == 4
+
+
+def test_db_pool_stays_within_budget():
+    """Test per-worker pools never exceed the total connection budget."""
+    settings = Settings(DB_MAX_CONNECTIONS=90)
+    for workers in (1, 3, 9, 17, 46, 90):
+        pool = settings.get_db_pool_options(workers)
+        assert pool["pool_size"] >= 1
+        assert (pool["pool_size"] + pool["max_overflow"]) * workers <= 90
+    with pytest.raises(ValueError, match="DB_MAX_CONNECTIONS"):
+        settings.get_db_pool_options(91)
+
+
+def test_db_pool_budget_is_shared_with_shards_on_the_same_server():
+    """Test engines on one database server split its connection budget."""
+    settings = Settings(
+        DATABASE_URL="postgresql://app@db-main:5432/app",
+        USER_SHARD_URLS=[
+            "postgresql://app@db-main:5432/users_0",
+            "postgresql://app@db-shards:5432/users_1",
+        ],
+        DB_MAX_CONNECTIONS=90,
+    )
+    main = settings.get_db_pool_options(3)
+    other_server = settings.get_db_pool_options(3, settings.USER_SHARD_URLS[1])
+    assert main["pool_size"] + main["max_overflow"] == 15
+    assert other_server["pool_size"] + other_server["max_overflow"] == 30
+
+
+def test_read_only_mode_refuses_sharded_users():
+    """Test the snapshot cannot be enabled while users live on shards."""
+    with pytest.raises(ValidationError, match="USER_SHARD_URLS"):
+        Settings(READ_ONLY_MODE=True, USER_SHARD_URLS=["sqlite:///./shard0.db"])
+    assert Settings(READ_ONLY_MODE=True).READ_ONLY_MODE
+
+
+def test_bcrypt_rounds_per_environment():
+    """Test bcrypt cost follows ENVIRONMENT unless set explicitly."""
+    assert Settings(ENVIRONMENT="production", BCRYPT_ROUNDS=0).get_bcrypt_rounds() == 12
+    assert Settings(ENVIRONMENT="test", BCRYPT_ROUNDS=0).get_bcrypt_rounds() == 4
+    assert Settings(ENVIRONMENT="test", BCRYPT_ROUNDS=11).get_bcrypt_rounds() == 11
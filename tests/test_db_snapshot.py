@@ -0,0 +1,103 @@
+import gzip
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.user import AuthUser, Base, User
+from app.sharding import create_shard_engine
+from scripts.bench_snapshot import seed
+from scripts.db_snapshot import TABLES, SnapshotError, dump, restore
+
+
+def create_engine_at(path):
+    engine = create_shard_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def table_rows(engine):
+    with engine.connect() as connection:
+        return {
+            table.name: connection.execute(
+                select(table).order_by(table.c.id)
+            ).all()
+            for table in TABLES
+        }
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Database with seeded users and values that need escaping or nulls."""
+    engine = create_engine_at(tmp_path / "source.db")
+    with Session(engine) as session:
+        seed(session, 30, batch_size=7)
+        session.execute(
+            insert(User),
+            [
+                {
+                    "id": 100,
+                    "name": "Tab\tnew\nline \\ backé☃",
+                    "username": "",
+                    "email": None,
+                    "updated_at": datetime(1969, 7, 20, 20, 17, 40, 123456),
+                }
+            ],
+        )
+        session.execute(
+            insert(AuthUser),
+            [{"id": 7, "name": None, "email": "a@example.com", "password_hash": "x"}],
+        )
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+def test_dump_and_restore_round_trip(tmp_path, source):
+    """Test a restored snapshot holds exactly the dumped rows."""
+    path = tmp_path / "users.snap"
+    dumped = dump(source, str(path))
+    assert dumped.rows == {
+        "auth_users": 1,
+        "users": 31,
+        "addresses": 30,
+        "geo": 30,
+        "companies": 30,
+    }
+
+    target = create_engine_at(tmp_path / "target.db")
+    restored = restore(target, str(path))
+    assert restored.rows == dumped.rows
+    assert table_rows(target) == table_rows(source)
+
+    # A second restore needs --replace, and then gives the same rows
+    with pytest.raises(SnapshotError, match="not empty"):
+        restore(target, str(path))
+    restore(target, str(path), replace=True)
+    assert table_rows(target) == table_rows(source)
+    target.dispose()
+
+
+def test_damaged_snapshots_are_rejected_without_changes(tmp_path, source):
+    """Test corrupt or truncated files are refused and nothing is written."""
+    path = tmp_path / "users.snap"
+    dump(source, str(path))
+    data = gzip.decompress(path.read_bytes())
+
+    truncated = tmp_path / "truncated.snap"
+    truncated.write_bytes(path.read_bytes()[:-20])
+    corrupt = tmp_path / "corrupt.snap"
+    # Flip a byte inside the data, keeping the gzip stream well-formed
+    flipped = bytearray(data)
+    flipped[len(flipped) // 2] ^= 0xFF
+    corrupt.write_bytes(gzip.compress(bytes(flipped))[:-8] + path.read_bytes()[-8:])
+    foreign = tmp_path / "foreign.snap"
+    foreign.write_bytes(gzip.compress(b"not a snapshot at all"))
+
+    target = create_engine_at(tmp_path / "target.db")
+    for damaged in (truncated, corrupt, foreign):
+        with pytest.raises(SnapshotError):
+            restore(target, str(damaged))
+        assert all(not rows for rows in table_rows(target).values())
+    target.dispose()
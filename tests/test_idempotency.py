@@ -0,0 +1,119 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.security import create_access_token
+from app.middleware.idempotency import (
+    IdempotencyStore,
+    InMemoryIdempotencyStore,
+    StoredResponse,
+)
+from tests.conftest import make_user_data
+
+
+def test_retried_create_is_replayed(client: TestClient, auth_headers):
+    """Test a retried POST replays the first response instead of failing."""
+    headers = {**auth_headers, "Idempotency-Key": "create-retry-1"}
+    user_data = make_user_data("retryuser")
+
+    first = client.post("/api/v1/users/", json=user_data, headers=headers)
+    assert first.status_code == 200
+
+    second = client.post("/api/v1/users/", json=user_data, headers=headers)
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+
+def test_retry_with_refreshed_token_is_replayed(client: TestClient, auth_headers):
+    """Test keys follow the caller, not the exact token they sent."""
+    user_data = make_user_data("refreshuser")
+    first = client.post(
+        "/api/v1/users/",
+        json=user_data,
+        headers={**auth_headers, "Idempotency-Key": "refresh-retry"},
+    )
+    assert first.status_code == 200
+
+    refreshed = create_access_token(
+        "test@example.com", expires_delta=timedelta(minutes=7)
+    )
+    assert f"Bearer {refreshed}" != auth_headers["Authorization"]
+    second = client.post(
+        "/api/v1/users/",
+        json=user_data,
+        headers={
+            "Authorization": f"Bearer {refreshed}",
+            "Idempotency-Key": "refresh-retry",
+        },
+    )
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+
+def test_retried_batch_is_replayed(client: TestClient, auth_headers):
+    """Test batches are covered as well as the users routes."""
+    headers = {**auth_headers, "Idempotency-Key": "batch-retry"}
+    batch = {
+        "requests": [
+            {
+                "method": "POST",
+                "path": "/api/v1/users/",
+                "body": make_user_data("batchretry"),
+            }
+        ]
+    }
+    first = client.post("/api/v1/batch", json=batch, headers=headers)
+    assert first.json()[0]["status"] == 200
+
+    second = client.post("/api/v1/batch", json=batch, headers=headers)
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+
+def test_reused_key_with_different_body(client: TestClient, auth_headers):
+    """Test reusing a key for a different request is rejected."""
+    headers = {**auth_headers, "Idempotency-Key": "create-retry-2"}
+    client.post("/api/v1/users/", json=make_user_data("retryuser2"), headers=headers)
+
+    response = client.post(
+        "/api/v1/users/", json=make_user_data("retryuser3"), headers=headers
+    )
+    assert response.status_code == 422
+
+
+def test_concurrent_retry_waits_for_first_request():
+    """Test a concurrent retry waits and then replays the stored response."""
+    store = InMemoryIdempotencyStore(ttl_seconds=60, max_entries=10)
+
+    async def scenario():
+        assert await store.acquire("key", timeout=1) is None
+        waiter = asyncio.create_task(store.acquire("key", timeout=1))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        store.save("key", StoredResponse("fp", 200, [], b"{}"))
+        store.release("key")
+        return await waiter
+
+    stored = asyncio.run(scenario())
+    assert stored.status_code == 200
+    assert stored.body == b"{}"
+
+
+def test_incomplete_store_cannot_be_created():
+    """Test a store backend missing a method fails when it is created."""
+    class NoRelease(IdempotencyStore):
+        async def acquire(self, key, timeout):
+            return None
+
+        def save(self, key, response):
+            pass
+
+        def clear(self):
+            pass
+
+    with pytest.raises(TypeError):
+        NoRelease()
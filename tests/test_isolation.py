@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.crud.user import get_auth_user_by_email
+from tests.conftest import worker_database_url
+
+
+@pytest.mark.parametrize("attempt", [1, 2])
+def test_committed_rows_do_not_leak_between_tests(
+    client: TestClient, db_session, attempt
+):
+    """Test rows committed through the API are rolled back after each test."""
+    assert get_auth_user_by_email(db_session, "isolated@example.com") is None
+
+    response = client.post(
+        "/api/v1/auth/register",
+        json={
+            "name": "Isolated User",
+            "email": "isolated@example.com",
+            "password": "isolated123",
+        },
+    )
+    assert response.status_code == 200
+    assert get_auth_user_by_email(db_session, "isolated@example.com") is not None
+
+
+def test_worker_database_url():
+    """Test each xdist worker gets its own database."""
+    assert (
+        worker_database_url("sqlite:///./test.db", "gw1")
+        == "sqlite:///./test_gw1.db"
+    )
+    assert worker_database_url("sqlite://", "gw1") == "sqlite://"
+    assert worker_database_url("sqlite:///./test.db", "") == "sqlite:///./test.db"
+    assert (
+        worker_database_url("postgresql://u:p@db:5432/app_test", "gw0")
+        == "postgresql://u:p@db:5432/app_test_gw0"
+    )
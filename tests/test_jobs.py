@@ -0,0 +1,265 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.jobs import JobRunner
+from app.crud.user_transfer import JOB_TYPES, import_users
+from app.crud.user import get_auth_user_by_email
+from app.models.user import Job, User
+from tests.conftest import TestingSessionLocal, make_user_data
+
+
+class Crash(BaseException):
+    """Stands in for the runner's process dying mid-job."""
+
+
+@pytest.fixture
+def job_files(tmp_path, monkeypatch):
+    """Job files in a temporary directory, moved two users at a time."""
+    monkeypatch.setattr(settings, "JOB_FILES_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "JOB_CHUNK_SIZE", 2)
+    return tmp_path
+
+
+@pytest.fixture
+def user_files(job_files, auth_headers, db_session):
+    """Job files directory of the ``auth_headers`` user."""
+    auth_user = get_auth_user_by_email(db_session, "test@example.com")
+    directory = job_files / str(auth_user.id)
+    directory.mkdir()
+    return directory
+
+
+@pytest.fixture
+def runner(connection):
+    """Job runner on the test transaction, driven with ``run_next``."""
+    return JobRunner(lambda: TestingSessionLocal(bind=connection), JOB_TYPES)
+
+
+def test_export_then_import_round_trip(
+    client: TestClient, auth_headers, user_files, runner
+):
+    """Test exported users are imported again with their ids and fields."""
+    users = [
+        client.post(
+            "/api/v1/users/",
+            json=make_user_data(f"mover{index}", city="Job City"),
+            headers=auth_headers,
+        ).json()
+        for index in range(5)
+    ]
+
+    response = client.post(
+        "/api/v1/jobs/", json={"type": "export_users"}, headers=auth_headers
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert runner.run_next()
+    assert not runner.run_next()
+
+    job = client.get(f"/api/v1/jobs/{job['id']}", headers=auth_headers).json()
+    assert job["status"] == "succeeded"
+    assert (job["rows_done"], job["rows_total"], job["progress"]) == (5, 5, 1.0)
+    assert job["rows_per_second"] is not None
+    assert job["result"] == {"file": f"users-{job['id']}.jsonl", "users": 5}
+
+    response = client.get(f"/api/v1/jobs/{job['id']}/file", headers=auth_headers)
+    assert [json.loads(line) for line in response.text.splitlines()] == users
+
+    client.request(
+        "DELETE",
+        "/api/v1/users/",
+        json={"filter": {"city": "Job City"}},
+        headers=auth_headers,
+    )
+    assert (user_files / f"users-{job['id']}.jsonl").read_text() == response.text
+    (user_files / "users.jsonl").write_text(
+        response.text + '{"name": "not a user"}\n' + json.dumps(users[0]) + "\n"
+    )
+    response = client.post(
+        "/api/v1/jobs/",
+        json={"type": "import_users", "file": "users.jsonl"},
+        headers=auth_headers,
+    )
+    assert runner.run_next()
+
+    job = client.get(f"/api/v1/jobs/{response.json()['id']}", headers=auth_headers)
+    assert job.json()["status"] == "succeeded"
+    assert job.json()["result"] == {"created": 5, "skipped": 1, "invalid": 1}
+    assert job.json()["rows_done"] == 7
+    for user in users:
+        assert client.get(f"/api/v1/users/{user['id']}").json()["username"] == (
+            user["username"]
+        )
+
+
+def test_job_requests_are_validated(client: TestClient, auth_headers, job_files):
+    """Test imports need an existing plain file name."""
+    for body in (
+        {"type": "import_users"},
+        {"type": "import_users", "file": "../etc/passwd"},
+        {"type": "reindex"},
+    ):
+        response = client.post("/api/v1/jobs/", json=body, headers=auth_headers)
+        assert response.status_code == 422
+
+    response = client.post(
+        "/api/v1/jobs/",
+        json={"type": "import_users", "file": "missing.json"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    assert client.get("/api/v1/jobs/999", headers=auth_headers).status_code == 404
+    assert client.post("/api/v1/jobs/", json={"type": "export_users"}).status_code == (
+        401
+    )
+
+
+def test_cancel_queued_job(client: TestClient, auth_headers, job_files, runner):
+    """Test a cancelled job never runs and cannot be cancelled twice."""
+    job = client.post(
+        "/api/v1/jobs/", json={"type": "export_users"}, headers=auth_headers
+    ).json()
+
+    response = client.post(f"/api/v1/jobs/{job['id']}/cancel", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+    assert not runner.run_next()
+
+    response = client.post(f"/api/v1/jobs/{job['id']}/cancel", headers=auth_headers)
+    assert response.status_code == 409
+    response = client.get(f"/api/v1/jobs/{job['id']}/file", headers=auth_headers)
+    assert response.status_code == 409
+
+
+def test_stale_job_resumes_from_checkpoint(
+    client: TestClient, auth_headers, user_files, runner, connection, db_session
+):
+    """Test a job whose runner died continues after its last committed chunk."""
+    items = [make_user_data(f"resumed{index}") for index in range(5)]
+    (user_files / "users.jsonl").write_text(
+        "".join(json.dumps(item) + "\n\n" for item in items)
+    )
+    job_id = client.post(
+        "/api/v1/jobs/",
+        json={"type": "import_users", "file": "users.jsonl"},
+        headers=auth_headers,
+    ).json()["id"]
+
+    def crash_after_first_chunk(db, context):
+        save = context.save
+
+        def save_then_crash(*args, **kwargs):
+            save(*args, **kwargs)
+            raise Crash
+
+        context.save = save_then_crash
+        return import_users(db, context)
+
+    crashing = JobRunner(
+        lambda: TestingSessionLocal(bind=connection),
+        {"import_users": crash_after_first_chunk},
+    )
+    with pytest.raises(Crash):
+        crashing.run_next()
+
+    job = client.get(f"/api/v1/jobs/{job_id}", headers=auth_headers).json()
+    assert (job["status"], job["rows_done"], job["rows_total"]) == ("running", 2, 5)
+    # The checkpoint points just past the second line, blank lines included
+    offset = db_session.get(Job, job_id).checkpoint["offset"]
+    assert offset == len(json.dumps(items[0]) + json.dumps(items[1])) + 3
+    # The heartbeat is fresh, so nobody else takes the job yet
+    assert not runner.run_next()
+
+    db_session.execute(
+        update(Job.__table__)
+        .where(Job.id == job_id)
+        .values(heartbeat_at=datetime.utcnow() - timedelta(hours=1))
+    )
+    db_session.commit()
+    assert runner.run_next()
+
+    job = client.get(f"/api/v1/jobs/{job_id}", headers=auth_headers).json()
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"created": 5, "skipped": 0, "invalid": 0}
+    usernames = db_session.scalars(select(User.username)).all()
+    assert sorted(usernames) == [f"resumed{index}" for index in range(5)]
+    assert db_session.get(Job, job_id).attempts == 2
+
+
+def test_job_files_are_private_and_never_overwritten(
+    client: TestClient, auth_headers, user_files, runner
+):
+    """Test each auth user only sees their own files and exports never overwrite."""
+    (user_files / "mine.jsonl").write_text("{}\n")
+    other = client.post(
+        "/api/v1/auth/register",
+        json={"name": "Other", "email": "other@example.com", "password": "otherpass1"},
+    ).json()
+    other_headers = {"Authorization": f"Bearer {other['access_token']}"}
+
+    response = client.post(
+        "/api/v1/jobs/",
+        json={"type": "import_users", "file": "mine.jsonl"},
+        headers=other_headers,
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        "/api/v1/jobs/",
+        json={"type": "export_users", "file": "mine.jsonl"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 409
+
+    # A file appearing after the export was queued is not replaced either
+    job = client.post(
+        "/api/v1/jobs/",
+        json={"type": "export_users", "file": "late.jsonl"},
+        headers=auth_headers,
+    ).json()
+    (user_files / "late.jsonl").write_text("keep me\n")
+    assert runner.run_next()
+    job = client.get(f"/api/v1/jobs/{job['id']}", headers=auth_headers).json()
+    assert job["status"] == "failed"
+    assert (user_files / "late.jsonl").read_text() == "keep me\n"
+
+
+def test_uploaded_file_is_imported(
+    client: TestClient, auth_headers, job_files, runner
+):
+    """Test an uploaded file lands in the caller's directory and can be imported."""
+    body = "".join(
+        json.dumps(make_user_data(f"uploaded{index}")) + "\n" for index in range(3)
+    )
+    response = client.put(
+        "/api/v1/jobs/files/upload.jsonl", content=body, headers=auth_headers
+    )
+    assert response.status_code == 201
+    assert response.json() == {"file": "upload.jsonl", "size": len(body)}
+
+    response = client.put(
+        "/api/v1/jobs/files/upload.jsonl", content="{}\n", headers=auth_headers
+    )
+    assert response.status_code == 409
+    response = client.put(
+        "/api/v1/jobs/files/%2E%2E", content="{}\n", headers=auth_headers
+    )
+    assert response.status_code == 422
+    assert client.put("/api/v1/jobs/files/x.jsonl", content="").status_code == 401
+
+    job = client.post(
+        "/api/v1/jobs/",
+        json={"type": "import_users", "file": "upload.jsonl"},
+        headers=auth_headers,
+    ).json()
+    assert runner.run_next()
+    job = client.get(f"/api/v1/jobs/{job['id']}", headers=auth_headers).json()
+    assert job["result"] == {"created": 3, "skipped": 0, "invalid": 0}
+    (directory,) = job_files.iterdir()
+    assert [path.name for path in directory.iterdir()] == ["upload.jsonl"]
@@ -0,0 +1,117 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.middleware.load_shedding import (
+    AUTH,
+    BATCH,
+    READ,
+    WRITE,
+    AdaptiveConcurrencyLimiter,
+    LoadSheddingMiddleware,
+    route_group,
+    shed_requests,
+)
+
+
+def make_limiter(**overrides) -> AdaptiveConcurrencyLimiter:
+    options = dict(
+        initial_limit=2,
+        min_limit=1,
+        max_limit=10,
+        max_queue=5,
+        latency_tolerance=2.0,
+        backoff=0.5,
+    )
+    options.update(overrides)
+    return AdaptiveConcurrencyLimiter(**options)
+
+
+def test_route_groups():
+    """Test probes bypass the limiter and auth and batches are their own groups."""
+    assert route_group("GET", "/health") is None
+    assert route_group("GET", "/api/v1/users/") is READ
+    assert route_group("PATCH", "/api/v1/users/1") is WRITE
+    assert route_group("POST", "/api/v1/auth/login") is AUTH
+    assert route_group("POST", "/api/v1/batch") is BATCH
+
+
+def test_queued_reads_are_admitted_before_auth():
+    """Test a freed slot goes to a waiting read before an earlier auth request."""
+
+    async def scenario():
+        limiter = make_limiter(initial_limit=1)
+        assert await limiter.acquire(WRITE, timeout=1)
+        admitted = []
+
+        async def wait(group):
+            if await limiter.acquire(group, timeout=1):
+                admitted.append(group.name)
+                limiter.release(group, 0.01, failed=False)
+
+        auth = asyncio.create_task(wait(AUTH))
+        await asyncio.sleep(0)
+        read = asyncio.create_task(wait(READ))
+        await asyncio.sleep(0)
+        limiter.release(WRITE, 0.01, failed=False)
+        await asyncio.gather(auth, read)
+        return admitted
+
+    assert asyncio.run(scenario()) == ["read", "auth"]
+
+
+def test_excess_requests_are_shed():
+    """Test requests beyond the limit and queue are rejected."""
+
+    async def scenario():
+        limiter = make_limiter(initial_limit=1, max_queue=0)
+        assert await limiter.acquire(READ, timeout=1)
+        assert not await limiter.acquire(READ, timeout=1)
+
+        limiter = make_limiter(initial_limit=1)
+        assert await limiter.acquire(READ, timeout=1)
+        return await limiter.acquire(READ, timeout=0.01)
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_limit_adapts_to_latency():
+    """Test the limit grows while saturated and shrinks when latency climbs."""
+
+    async def scenario():
+        limiter = make_limiter(initial_limit=2)
+        for _ in range(20):
+            await limiter.acquire(READ, timeout=1)
+            await limiter.acquire(READ, timeout=1)
+            limiter.release(READ, 0.01, failed=False)
+            limiter.release(READ, 0.01, failed=False)
+        grown = limiter.limit
+
+        limiter._last_decrease = 0.0
+        await limiter.acquire(READ, timeout=1)
+        limiter.release(READ, 1.0, failed=False)
+        return grown, limiter.limit
+
+    grown, shrunk = asyncio.run(scenario())
+    assert grown > 2
+    assert shrunk == grown * 0.5
+
+
+def test_middleware_sheds_with_retry_after():
+    """Test an overloaded worker answers 503 with Retry-After but keeps health up."""
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    limiter = make_limiter(initial_limit=1, max_queue=0)
+    asyncio.run(limiter.acquire(READ, timeout=1))
+    client = TestClient(LoadSheddingMiddleware(app, limiter=limiter))
+    shed_before = shed_requests.value(group="read")
+
+    response = client.get("/api/v1/users/")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert shed_requests.value(group="read") == shed_before + 1
+
+    assert client.get("/health").status_code == 200
@@ -0,0 +1,64 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.memory_profile import memory_profiler
+
+
+@pytest.fixture
+def profiler():
+    """Run the memory profiler for the duration of a test."""
+    memory_profiler.start(frames=5)
+    yield memory_profiler
+    memory_profiler.stop()
+
+
+@pytest.fixture
+def admin_headers(auth_headers, monkeypatch):
+    """Make the test auth user an admin."""
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", ["test@example.com"])
+    return auth_headers
+
+
+def test_memory_is_recorded_per_route(client: TestClient, admin_headers, profiler):
+    """Test requests are grouped by route template with deltas and peaks."""
+    for user_id in (1, 2, 3):
+        client.get(f"/api/v1/users/{user_id}")
+    client.get("/api/v1/users/")
+
+    response = client.get("/api/v1/admin/memory?limit=5", headers=admin_headers)
+    assert response.status_code == 200
+    report = response.json()
+    routes = {route["route"]: route for route in report["routes"]}
+    assert routes["/api/v1/users/{user_id}"]["requests"] == 3
+    assert routes["/api/v1/users/"]["requests"] == 1
+    # TestClient sends one request at a time, so every request has a peak
+    assert routes["/api/v1/users/"]["max_peak_bytes"] > 0
+    assert report["traced_bytes"] > 0
+    assert 0 < len(report["top_sites"]) <= 5
+    assert all(site["size_bytes"] > 0 for site in report["top_sites"])
+
+    response = client.get(
+        "/api/v1/admin/memory?limit=3&group_by=traceback", headers=admin_headers
+    )
+    assert all(site["traceback"] for site in response.json()["top_sites"])
+
+    response = client.post("/api/v1/admin/memory/reset", headers=admin_headers)
+    assert response.status_code == 204
+    response = client.get("/api/v1/admin/memory", headers=admin_headers)
+    # Only the reset request itself finished after the reset
+    routes = [route["route"] for route in response.json()["routes"]]
+    assert routes == ["/api/v1/admin/memory/reset"]
+
+
+def test_memory_endpoint_requires_admin_and_profiling(
+    client: TestClient, auth_headers, monkeypatch
+):
+    """Test non-admins are refused and disabled profiling reports 404."""
+    assert client.get("/api/v1/admin/memory").status_code == 401
+    response = client.get("/api/v1/admin/memory", headers=auth_headers)
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", ["test@example.com"])
+    response = client.get("/api/v1/admin/memory", headers=auth_headers)
+    assert response.status_code == 404
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, text
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def make_config(url: str) -> Config:
+    config = Config(str(PROJECT_ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_ROOT / "alembic"))
+    config.set_main_option("sqlalchemy.url", url)
+    return config
+
+
+def test_migrations_upgrade_and_downgrade(tmp_path):
+    """Test the migration set applies cleanly in both directions."""
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    config = make_config(url)
+
+    command.upgrade(config, "head")
+    inspector = inspect(create_engine(url))
+    for table, column in [
+        ("addresses", "user_id"),
+        ("geo", "address_id"),
+        ("companies", "user_id"),
+    ]:
+        indexed = [index["column_names"] for index in inspector.get_indexes(table)]
+        assert [column] in indexed
+        foreign_key = inspector.get_foreign_keys(table)[0]
+        assert foreign_key["options"]["ondelete"] == "CASCADE"
+
+    command.downgrade(config, "base")
+    assert not inspect(create_engine(url)).has_table("users")
+
+
+def test_user_delete_cascades(tmp_path):
+    """Test deleting a user removes address, geo and company in the database."""
+    url = f"sqlite:///{tmp_path / 'cascade.db'}"
+    command.upgrade(make_config(url), "head")
+
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, name) VALUES (1, 'Gone')"))
+        connection.execute(text("INSERT INTO addresses (id, user_id) VALUES (1, 1)"))
+        connection.execute(text("INSERT INTO geo (id, address_id) VALUES (1, 1)"))
+        connection.execute(text("INSERT INTO companies (id, user_id) VALUES (1, 1)"))
+
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM users WHERE id = 1"))
+
+    with engine.connect() as connection:
+        for table in ("addresses", "geo", "companies"):
+            count = connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            assert count == 0
@@ -0,0 +1,469 @@
+"""
+Query-plan regression tests for the user CRUD layer.
+
+Each case runs one CRUD function against a seeded database (rolled back
+afterwards), captures the SQL it emits and checks the query plans:
+
+- every plan must match its snapshot in ``tests/query_plans/``;
+- the indexes the case relies on must be used;
+- tables and indexes may only be scanned where the case lists the scan;
+- the function must stay within its budget of SQLite VM steps, which grows
+  with the rows a statement touches and so catches full scans that the
+  snapshot alone would only show as a diff.
+
+After an intended plan change, regenerate the snapshots with
+``UPDATE_QUERY_PLANS=1 pytest tests/test_query_plans.py`` and review the diff.
+Snapshots are SQLite's ``EXPLAIN QUERY PLAN`` output.
+
+When ``DATABASE_TEST_URL`` is PostgreSQL, the same cases are also seeded into
+the test database and checked with ``EXPLAIN (FORMAT JSON)``: their indexes
+must be used, no seeded table may be read by a sequential scan unless the
+case allows it, and every statement must stay within a budget of planner
+cost. PostgreSQL plans vary between server versions, so they have no
+snapshots. Otherwise those tests are skipped.
+"""
+
+import os
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterator, List, NamedTuple, Tuple
+
+import pytest
+from sqlalchemy import event, insert, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import snapshot as snapshot_crud
+from app.crud import user as user_crud
+from app.models.user import Address, AuthUser, Base, Company, Geo, User
+from app.schemas.user import UserCreate, UserFilter, UserUpdate
+from tests.conftest import create_test_engine, make_user_data
+from tests.conftest import engine as test_database_engine
+
+SNAPSHOT_DIR = Path(__file__).parent / "query_plans"
+UPDATE_SNAPSHOTS = os.environ.get("UPDATE_QUERY_PLANS") == "1"
+
+SEED_USERS = 20000
+# Each city, company and website is shared by 20 users
+CITIES = SEED_USERS // 20
+SEED_TIME = datetime(2024, 1, 1)
+
+POSTGRESQL = make_url(settings.DATABASE_TEST_URL).get_backend_name() == "postgresql"
+# PostgreSQL names for the indexes SQLite reports differently
+PG_INDEX_NAMES = {"INTEGER PRIMARY KEY": ("users_pkey", "ix_users_id")}
+
+
+def seed_row(index: int) -> dict:
+    return {
+        "name": f"Seed User {index}",
+        "username": f"seed{index}",
+        "email": f"seed{index}@example.com",
+        "website": f"site{index % CITIES}.example.com",
+        "city": f"City {index % CITIES}",
+        "company": f"Company {index % CITIES}",
+    }
+
+
+def new_user(username: str) -> UserCreate:
+    return UserCreate(**make_user_data(username, city="City 7", company="Company 7"))
+
+
+@pytest.fixture(scope="module")
+def seeded_engine():
+    """In-memory database with SEED_USERS users and planner statistics."""
+    engine = create_test_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        seed(connection)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def seeded_postgresql(db):
+    """
+    Connection to the PostgreSQL test database seeded like ``seeded_engine``.
+
+    The rows and their statistics only exist in the connection's transaction,
+    which is rolled back after the module.
+    """
+    connection = test_database_engine.connect()
+    transaction = connection.begin()
+    seed(connection)
+    session = Session(bind=connection)
+    for model in (User, Address, Geo, Company):
+        # Cases that create users must not collide with the seeded ids
+        user_crud.advance_id_sequence(session, model, SEED_USERS + 1)
+    session.close()
+    yield connection
+    transaction.rollback()
+    connection.close()
+
+
+def seed(connection) -> None:
+    """Insert SEED_USERS users and update the planner statistics."""
+    rows = [seed_row(index) for index in range(1, SEED_USERS + 1)]
+    connection.execute(
+        insert(User.__table__),
+        [
+            {
+                "id": index,
+                "name": row["name"],
+                "username": row["username"],
+                "email": row["email"],
+                "phone": "555-000-0000",
+                "website": row["website"],
+                "updated_at": SEED_TIME + timedelta(seconds=index),
+            }
+            for index, row in enumerate(rows, start=1)
+        ],
+    )
+    connection.execute(
+        insert(Address.__table__),
+        [
+            {
+                "id": index,
+                "street": "Seed St",
+                "suite": "Suite 1",
+                "city": row["city"],
+                "zipcode": "00000",
+                "user_id": index,
+            }
+            for index, row in enumerate(rows, start=1)
+        ],
+    )
+    connection.execute(
+        insert(Geo.__table__),
+        [
+            {"id": index, "lat": "0.0", "lng": "0.0", "address_id": index}
+            for index in range(1, SEED_USERS + 1)
+        ],
+    )
+    connection.execute(
+        insert(Company.__table__),
+        [
+            {
+                "id": index,
+                "name": row["company"],
+                "catchPhrase": "Seeded",
+                "bs": "at scale",
+                "user_id": index,
+            }
+            for index, row in enumerate(rows, start=1)
+        ],
+    )
+    connection.execute(
+        insert(AuthUser.__table__),
+        [
+            {"name": row["name"], "email": row["email"], "password_hash": "x"}
+            for row in rows[:1000]
+        ],
+    )
+    connection.execute(text("ANALYZE"))
+
+
+class PlanCase(NamedTuple):
+    name: str
+    call: Callable[[Session], object]
+    indexes: Tuple[str, ...] = ()  # must each appear in some plan
+    scans: Tuple[str, ...] = ()  # SCAN plan lines allowed, exactly as shown
+    max_steps: int = 5000  # SQLite VM instructions for the whole call
+    # PostgreSQL only: tables that may be read by a sequential scan, and the
+    # planner's total cost allowed for each statement (a sequential scan of
+    # a seeded table costs more than the default)
+    seq_scans: Tuple[str, ...] = ()
+    max_cost: float = 250.0
+
+
+CASES = [
+    PlanCase(
+        "get_user",
+        lambda db: user_crud.get_user(db, 42),
+        indexes=("INTEGER PRIMARY KEY",),
+    ),
+    PlanCase(
+        "get_user_by_email",
+        lambda db: user_crud.get_user_by_email(db, "seed42@example.com"),
+        indexes=("ix_users_email",),
+    ),
+    PlanCase(
+        "get_user_by_username",
+        lambda db: user_crud.get_user_by_username(db, "seed42"),
+        indexes=("ix_users_username",),
+    ),
+    PlanCase(
+        "get_users_first_page",
+        lambda db: user_crud.get_users(db, skip=0, limit=100),
+        # Walks the primary key in order and stops after the page
+        scans=("SCAN users",),
+    ),
+    PlanCase(
+        "get_users_by_name",
+        lambda db: user_crud.get_users(
+            db, user_filter=UserFilter(name="Seed User 42")
+        ),
+        indexes=("ix_users_name",),
+    ),
+    PlanCase(
+        "get_users_by_website",
+        lambda db: user_crud.get_users(
+            db, user_filter=UserFilter(website="site42.example.com")
+        ),
+        indexes=("ix_users_website",),
+    ),
+    PlanCase(
+        "get_users_by_city",
+        lambda db: user_crud.get_users(db, user_filter=UserFilter(city="City 42")),
+        indexes=("ix_addresses_city",),
+    ),
+    PlanCase(
+        "get_users_by_company_name",
+        lambda db: user_crud.get_users(
+            db, user_filter=UserFilter(company_name="Company 42")
+        ),
+        indexes=("ix_companies_name",),
+    ),
+    PlanCase(
+        "count_users_by_city",
+        lambda db: user_crud.count_users(db, user_filter=UserFilter(city="City 42")),
+        indexes=("ix_addresses_city",),
+    ),
+    PlanCase(
+        "count_users",
+        lambda db: user_crud.count_users(db),
+        # An unfiltered count reads the smallest index end to end
+        scans=("SCAN users USING COVERING INDEX (any)",),
+        max_steps=100000,
+        seq_scans=("users",),
+        max_cost=1000.0,
+    ),
+    PlanCase(
+        "create_user",
+        lambda db: user_crud.create_user(db, new_user("planned")),
+    ),
+    PlanCase(
+        "create_user_conflict",
+        lambda db: pytest.raises(
+            user_crud.UserConflict,
+            user_crud.create_user,
+            db,
+            new_user("seed42"),
+        ),
+        indexes=("ix_users_email",),
+    ),
+    PlanCase(
+        "update_user",
+        lambda db: user_crud.update_user(
+            db, 42, UserUpdate(name="Renamed", address={"geo": {"lat": "2.0"}})
+        ),
+        indexes=("INTEGER PRIMARY KEY", "ix_addresses_user_id", "ix_companies_user_id"),
+    ),
+    PlanCase(
+        "replace_user",
+        lambda db: user_crud.replace_user(db, 42, new_user("replaced")),
+        indexes=("ix_addresses_user_id", "ix_geo_address_id", "ix_companies_user_id"),
+    ),
+    PlanCase(
+        "upsert_user_missing",
+        lambda db: user_crud.upsert_user(db, SEED_USERS + 1, new_user("upserted")),
+        indexes=("ix_addresses_user_id", "ix_companies_user_id"),
+    ),
+    PlanCase(
+        "delete_user",
+        lambda db: user_crud.delete_user(db, 42),
+        indexes=("ix_addresses_user_id", "ix_geo_address_id", "ix_companies_user_id"),
+    ),
+    PlanCase(
+        "bulk_update_users_by_city",
+        lambda db: user_crud.bulk_update_users(
+            db,
+            user_filter=UserFilter(city="City 42"),
+            user_update=UserUpdate(company={"bs": "bulk"}),
+        ),
+        indexes=("ix_addresses_city", "ix_companies_user_id"),
+        max_cost=500.0,
+    ),
+    PlanCase(
+        "bulk_delete_users_by_company_name",
+        lambda db: user_crud.bulk_delete_users(
+            db, user_filter=UserFilter(company_name="Company 42")
+        ),
+        indexes=("ix_companies_name",),
+        max_steps=50000,
+        max_cost=500.0,
+    ),
+    PlanCase(
+        "get_auth_user_by_email",
+        lambda db: user_crud.get_auth_user_by_email(db, "seed42@example.com"),
+        indexes=("ix_auth_users_email",),
+    ),
+    PlanCase(
+        "snapshot_refresh_query",
+        lambda db: db.execute(
+            snapshot_crud.snapshot_query(since=_latest_update(db))
+        ).all(),
+        indexes=("ix_users_updated_at",),
+    ),
+]
+
+
+def _latest_update(db: Session):
+    return db.scalar(text("SELECT max(updated_at) FROM users"))
+
+
+def run_case(engine, case: PlanCase) -> Tuple[List[Tuple[str, list]], int]:
+    """
+    Run the case in a rolled-back transaction.
+
+    Returns the captured (statement, parameters) pairs that read data and the
+    number of VM steps the call took.
+    """
+    statements = []
+    capture = statement_recorder(statements)
+    steps = [0]
+
+    def count_steps():
+        steps[0] += 1
+        return 0
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        dbapi_connection = connection.connection.dbapi_connection
+        event.listen(connection, "before_cursor_execute", capture)
+        dbapi_connection.set_progress_handler(count_steps, 1)
+        db = Session(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            case.call(db)
+        finally:
+            dbapi_connection.set_progress_handler(None, 1)
+            event.remove(connection, "before_cursor_execute", capture)
+            db.close()
+            plans = [
+                (statement, explain(connection, statement, parameters))
+                for statement, parameters in statements
+            ]
+            transaction.rollback()
+    return plans, steps[0]
+
+
+def run_postgresql_case(connection, case: PlanCase) -> List[Tuple[str, dict]]:
+    """
+    Run the case in a rolled-back SAVEPOINT.
+
+    Returns the captured statements that read data, each with its
+    ``EXPLAIN (FORMAT JSON)`` plan.
+    """
+    statements = []
+    capture = statement_recorder(statements)
+    savepoint = connection.begin_nested()
+    event.listen(connection, "before_cursor_execute", capture)
+    db = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        case.call(db)
+    finally:
+        event.remove(connection, "before_cursor_execute", capture)
+        db.close()
+        plans = [
+            (
+                statement,
+                connection.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {statement}", parameters
+                ).scalar()[0]["Plan"],
+            )
+            for statement, parameters in statements
+        ]
+        savepoint.rollback()
+    return plans
+
+
+def statement_recorder(statements: list) -> Callable:
+    """``before_cursor_execute`` listener appending statements that read data."""
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    return capture
+
+
+def plan_nodes(plan: dict) -> Iterator[dict]:
+    """A PostgreSQL plan node and all the nodes below it."""
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def explain(connection, statement: str, parameters) -> List[str]:
+    """SQLite's query plan as indented lines."""
+    rows = connection.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    ).all()
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        # Which equally small index a full scan walks depends on the order
+        # the indexes were created in, which varies between runs
+        detail = re.sub(
+            r"^SCAN (\w+) USING COVERING INDEX \w+$",
+            r"SCAN \1 USING COVERING INDEX (any)",
+            detail,
+        )
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def render(plans: List[Tuple[str, List[str]]]) -> str:
+    sections = []
+    for statement, lines in plans:
+        sql = " ".join(statement.split())
+        sql = re.sub(r"\?(?:, \?)+", "?, ...", sql)
+        sections.append("\n".join([sql] + lines))
+    return "\n\n".join(sections) + "\n"
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case.name for case in CASES])
+def test_query_plan(seeded_engine, case: PlanCase):
+    """Test the case's plans match the snapshot, use their indexes and budget."""
+    plans, steps = run_case(seeded_engine, case)
+    rendered = render(plans)
+
+    snapshot = SNAPSHOT_DIR / f"{case.name}.txt"
+    if UPDATE_SNAPSHOTS:
+        SNAPSHOT_DIR.mkdir(exist_ok=True)
+        snapshot.write_text(rendered)
+    assert snapshot.exists(), "No plan snapshot; run with UPDATE_QUERY_PLANS=1"
+    assert rendered == snapshot.read_text()
+
+    lines = [line.strip() for _, plan in plans for line in plan]
+    for index in case.indexes:
+        assert any(index in line for line in lines), f"{index} not used"
+    for line in lines:
+        # Any SCAN, with or without an index, reads a whole table or index
+        if re.match(r"SCAN (\w+)", line):
+            assert line in case.scans, f"Unexpected full scan: {line}"
+    assert steps <= case.max_steps, f"{steps} VM steps, budget {case.max_steps}"
+
+
+@pytest.mark.skipif(not POSTGRESQL, reason="DATABASE_TEST_URL is not PostgreSQL")
+@pytest.mark.parametrize("case", CASES, ids=[case.name for case in CASES])
+def test_postgresql_query_plan(seeded_postgresql, case: PlanCase):
+    """Test the case's PostgreSQL plans use their indexes and stay in budget."""
+    plans = run_postgresql_case(seeded_postgresql, case)
+
+    nodes = [node for _, plan in plans for node in plan_nodes(plan)]
+    used = {node["Index Name"] for node in nodes if "Index Name" in node}
+    for index in case.indexes:
+        names = PG_INDEX_NAMES.get(index, (index,))
+        assert used.intersection(names), f"{index} not used"
+    for node in nodes:
+        if node["Node Type"] == "Seq Scan":
+            table = node["Relation Name"]
+            assert table in case.seq_scans, f"Unexpected sequential scan: {table}"
+    for statement, plan in plans:
+        cost = plan["Total Cost"]
+        assert cost <= case.max_cost, (
+            f"Cost {cost}, budget {case.max_cost}: {' '.join(statement.split())}"
+        )
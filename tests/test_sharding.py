@@ -0,0 +1,273 @@
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app import sharding
+from app.core.config import settings
+from app.crud import user as user_crud
+from app.models.user import Address, Base, Company, Geo, User, UserDirectory
+from app.schemas.user import UserCreate
+from app.sharding import ShardRouter, jump_hash
+from scripts.init_db import run_migrations
+from scripts.reshard import reshard
+from tests.conftest import make_user_data
+
+SHARDS = 3
+
+
+def shard_user_ids(router: ShardRouter):
+    """User ids stored on each shard, read directly from its database."""
+    ids = []
+    for engine in router.engines:
+        with Session(engine) as session:
+            ids.append(set(session.scalars(select(User.id))))
+    return ids
+
+
+@pytest.fixture
+def shard_router(tmp_path, monkeypatch):
+    """Shard the users over three SQLite files for the duration of a test."""
+    router = ShardRouter(
+        [f"sqlite:///{tmp_path / f'shard{index}.db'}" for index in range(SHARDS)]
+    )
+    for engine in router.engines:
+        Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(sharding, "shard_router", router)
+    yield router
+    router.dispose()
+
+
+def test_shard_router_is_built_on_first_use(tmp_path, monkeypatch):
+    """Test the router is created lazily from USER_SHARD_URLS, once."""
+    monkeypatch.setattr(sharding, "shard_router", None)
+    monkeypatch.setattr(settings, "USER_SHARD_URLS", [])
+    assert sharding.get_shard_router() is None
+
+    urls = [f"sqlite:///{tmp_path / f'lazy{index}.db'}" for index in range(2)]
+    monkeypatch.setattr(settings, "USER_SHARD_URLS", urls)
+    router = sharding.get_shard_router()
+    try:
+        assert router.urls == urls
+        assert sharding.get_shard_router() is router
+    finally:
+        router.dispose()
+
+
+def test_jump_hash_balances_and_moves_little():
+    """Test ids spread evenly and growing by one shard only moves ids onto it."""
+    ids = range(1, 30001)
+    counts = Counter(jump_hash(user_id, 3) for user_id in ids)
+    assert sorted(counts) == [0, 1, 2]
+    assert all(9000 < count < 11000 for count in counts.values())
+
+    moved = [
+        user_id for user_id in ids if jump_hash(user_id, 4) != jump_hash(user_id, 3)
+    ]
+    assert all(jump_hash(user_id, 4) == 3 for user_id in moved)
+    assert 6500 < len(moved) < 8500
+
+
+def test_users_are_stored_on_their_shard(
+    client: TestClient, auth_headers, shard_router, db_session
+):
+    """Test creates land on the hashed shard and reads are routed there."""
+    created = []
+    for index in range(12):
+        response = client.post(
+            "/api/v1/users/",
+            json=make_user_data(f"sharded{index}"),
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        created.append(response.json())
+
+    stored = shard_user_ids(shard_router)
+    for user in created:
+        shard = shard_router.shard_for(user["id"])
+        assert [user["id"] in ids for ids in stored].count(True) == 1
+        assert user["id"] in stored[shard]
+        assert client.get(f"/api/v1/users/{user['id']}").json() == user
+    assert all(stored), "every shard should hold some of the users"
+
+    directory = db_session.scalars(select(UserDirectory.username)).all()
+    assert sorted(directory) == sorted(user["username"] for user in created)
+    assert client.get("/api/v1/users/999999").status_code == 404
+
+
+def test_listing_merges_shards_in_id_order(
+    client: TestClient, auth_headers, shard_router
+):
+    """Test pages and counts span the shards as if they were one table."""
+    ids = []
+    for index in range(10):
+        city = "Even City" if index % 2 == 0 else "Odd City"
+        response = client.post(
+            "/api/v1/users/",
+            json=make_user_data(f"listed{index}", city=city),
+            headers=auth_headers,
+        )
+        ids.append(response.json()["id"])
+
+    response = client.get("/api/v1/users/?skip=3&limit=4")
+    assert [user["id"] for user in response.json()] == sorted(ids)[3:7]
+    assert response.headers["X-Total-Count"] == "10"
+
+    response = client.get("/api/v1/users/?city=Odd City&limit=2")
+    assert [user["id"] for user in response.json()] == sorted(ids[1::2])[:2]
+    assert response.headers["X-Total-Count"] == "5"
+
+    response = client.get("/api/v1/users/?skip=8")
+    assert [user["id"] for user in response.json()] == sorted(ids)[8:]
+
+
+def test_writes_keep_directory_unique_across_shards(
+    client: TestClient, auth_headers, shard_router, db_session
+):
+    """Test updates, upserts and deletes go to the owning shard and directory."""
+    first = client.post(
+        "/api/v1/users/", json=make_user_data("owner"), headers=auth_headers
+    ).json()
+    # Find an id on another shard than the first user
+    other_id = next(
+        user_id
+        for user_id in range(1000, 2000)
+        if shard_router.shard_for(user_id) != shard_router.shard_for(first["id"])
+    )
+
+    response = client.put(
+        f"/api/v1/users/{other_id}",
+        json=make_user_data("owner"),
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already registered"
+
+    response = client.put(
+        f"/api/v1/users/{other_id}",
+        json=make_user_data("placed"),
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+    assert other_id in shard_user_ids(shard_router)[shard_router.shard_for(other_id)]
+
+    response = client.patch(
+        f"/api/v1/users/{other_id}",
+        json={"username": "owner"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username already taken"
+
+    response = client.patch(
+        f"/api/v1/users/{first['id']}",
+        json={"email": "moved@example.com", "address": {"city": "New City"}},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["address"]["city"] == "New City"
+    entry = db_session.get(UserDirectory, first["id"])
+    assert entry.email == "moved@example.com"
+    response = client.patch(
+        f"/api/v1/users/{first['id']}",
+        json={"address": {"city": None}},
+        headers=auth_headers,
+    )
+    assert response.status_code == 422
+    response = client.get(f"/api/v1/users/{first['id']}")
+    assert response.json()["address"]["city"] == "New City"
+
+    # The old email is free again, whichever shard the new user lands on
+    response = client.post(
+        "/api/v1/users/",
+        json={**make_user_data("owner"), "username": "reuser"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+
+    response = client.delete(f"/api/v1/users/{other_id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get(f"/api/v1/users/{other_id}").status_code == 404
+    assert db_session.get(UserDirectory, other_id) is None
+
+
+def test_bulk_operations_span_shards(client: TestClient, auth_headers, shard_router):
+    """Test bulk updates and deletes reach matching users on every shard."""
+    for index in range(9):
+        client.post(
+            "/api/v1/users/",
+            json=make_user_data(f"bulk{index}", city="Bulk City"),
+            headers=auth_headers,
+        )
+
+    response = client.request(
+        "PATCH",
+        "/api/v1/users/",
+        json={"filter": {"city": "Bulk City"}, "changes": {"phone": "555-999"}},
+        headers=auth_headers,
+    )
+    assert response.json()["matched"] == 9
+    assert response.json()["affected"] == {"users": 9}
+
+    response = client.request(
+        "DELETE",
+        "/api/v1/users/",
+        json={"filter": {"city": "Bulk City"}},
+        headers=auth_headers,
+    )
+    assert response.json()["affected"] == {"users": 9}
+    assert client.get("/api/v1/users/").json() == []
+    assert not any(shard_user_ids(shard_router))
+
+    response = client.post(
+        "/api/v1/batch",
+        json={"requests": [{"method": "GET", "path": "/users/"}]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 501
+
+
+def test_reshard_moves_only_rehashed_users(tmp_path):
+    """Test growing two shards to three moves a third of the users, once."""
+    urls = [f"sqlite:///{tmp_path / f'reshard{index}.db'}" for index in range(3)]
+    directory_url = f"sqlite:///{tmp_path / 'directory.db'}"
+    engines = [create_engine(url) for url in urls[:2]]
+    for engine in engines:
+        run_migrations(engine)
+    for user_id in range(1, 61):
+        engine = engines[jump_hash(user_id, 2)]
+        with Session(engine) as session:
+            user_crud.create_user(
+                session,
+                UserCreate(**make_user_data(f"resharded{user_id}")),
+                user_id=user_id,
+            )
+    for engine in engines:
+        engine.dispose()
+
+    report = reshard(urls[:2], urls, directory_url=directory_url, delete_moved=True)
+    expected_moves = sum(1 for user_id in range(1, 61) if jump_hash(user_id, 3) == 2)
+    assert report.scanned == 60
+    assert report.moved == report.deleted == expected_moves
+    assert report.misplaced == 0
+    assert sum(report.users_per_target) == 60
+
+    with Session(create_engine(urls[2])) as session:
+        moved = session.scalars(select(User)).all()
+        assert len(moved) == expected_moves
+        for user in moved:
+            assert user.username == f"resharded{user.id}"
+            assert user.address.city == "Test City"
+            assert user.address.geo.lat == "1.0"
+            assert user.company.name == "Test Corp"
+        assert session.scalar(select(Geo.id).limit(1)) is not None
+        assert session.query(Address).count() == session.query(Company).count()
+
+    with Session(create_engine(directory_url)) as session:
+        assert session.query(UserDirectory).count() == 60
+
+    # Nothing is left to move on a second run
+    again = reshard(urls, urls, directory_url=directory_url, delete_moved=True)
+    assert (again.moved, again.deleted, again.misplaced) == (0, 0, 0)
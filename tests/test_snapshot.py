@@ -0,0 +1,110 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.crud import user as user_crud
+from app.crud.snapshot import UserSnapshot, user_snapshot
+from app.schemas.user import UserCreate, UserFilter, UserUpdate
+
+
+def make_user(username: str, city: str = "Snapshot City") -> UserCreate:
+    return UserCreate(
+        name=f"Snapshot {username}",
+        username=username,
+        email=f"{username}@example.com",
+        phone="666-666-6666",
+        website="snapshot.com",
+        address={
+            "street": "Snapshot St",
+            "suite": "Suite 6",
+            "city": city,
+            "zipcode": "66666",
+            "geo": {"lat": "6.0", "lng": "6.0"},
+        },
+        company={
+            "name": "Snapshot Corp",
+            "catchPhrase": "Frozen in time",
+            "bs": "immutable business",
+        },
+    )
+
+
+def test_snapshot_matches_api_representation(client: TestClient, db_session):
+    """Test pre-rendered JSON is identical to the API response."""
+    user = user_crud.create_user(db_session, make_user("snapone"))
+    snapshot = UserSnapshot()
+    snapshot.load(db_session)
+
+    api_user = client.get(f"/api/v1/users/{user.id}").json()
+    assert json.loads(snapshot.get(user.id)) == api_user
+
+    body, total = snapshot.get_page(user_filter=UserFilter(username="snapone"))
+    assert json.loads(body) == [api_user]
+    assert total == 1
+
+
+def test_snapshot_incremental_refresh(client: TestClient, db_session):
+    """Test refresh picks up updates, inserts and deletes."""
+    removed = user_crud.create_user(db_session, make_user("snapthree"))
+    kept = user_crud.create_user(db_session, make_user("snaptwo"))
+    kept_id, removed_id = kept.id, removed.id
+    snapshot = UserSnapshot()
+    snapshot.load(db_session)
+
+    user_crud.update_user(
+        db_session, kept_id, UserUpdate(address={"city": "Refreshed City"})
+    )
+    user_crud.delete_user(db_session, removed_id)
+    added = user_crud.create_user(db_session, make_user("snapfour"))
+
+    upserted, deleted = snapshot.refresh(db_session)
+    assert upserted >= 2
+    assert deleted == 1
+    assert json.loads(snapshot.get(kept_id))["address"]["city"] == "Refreshed City"
+    assert snapshot.get(removed_id) is None
+    assert snapshot.get(added.id) is not None
+
+    # The filter index follows the changes
+    def page_ids(**criteria):
+        body, total = snapshot.get_page(user_filter=UserFilter(**criteria))
+        ids = [user["id"] for user in json.loads(body)]
+        assert total == len(ids)
+        return ids
+
+    assert page_ids(city="Refreshed City") == [kept_id]
+    assert kept_id not in page_ids(city="Snapshot City")
+    assert removed_id not in page_ids(company_name="Snapshot Corp")
+    assert page_ids(username="snapfour", city="Snapshot City") == [added.id]
+    assert page_ids(ids=[kept_id, removed_id, added.id], city="Snapshot City") == [
+        added.id
+    ]
+    assert page_ids(username="snapthree") == []
+
+    # Bulk changes to related rows only still move users' updated_at
+    matched, affected = user_crud.bulk_update_users(
+        db_session, UserFilter(ids=[kept_id]), UserUpdate(company={"bs": "bulk"})
+    )
+    assert (matched, affected) == (1, {"companies": 1})
+    snapshot.refresh(db_session)
+    assert json.loads(snapshot.get(kept_id))["company"]["bs"] == "bulk"
+
+
+def test_read_only_mode_serves_snapshot(
+    client: TestClient, db_session, monkeypatch
+):
+    """Test read-only mode serves reads from the snapshot and rejects writes."""
+    user = user_crud.create_user(db_session, make_user("snapfive", city="Mirror City"))
+    user_snapshot.load(db_session)
+    monkeypatch.setattr(settings, "READ_ONLY_MODE", True)
+
+    response = client.get("/api/v1/users/?city=Mirror City")
+    assert response.status_code == 200
+    assert [u["id"] for u in response.json()] == [user.id]
+    assert response.headers["X-Total-Count"] == "1"
+
+    assert client.get(f"/api/v1/users/{user.id}").json()["username"] == "snapfive"
+    assert client.get("/api/v1/users/99999").status_code == 404
+
+    response = client.delete(f"/api/v1/users/{user.id}")
+    assert response.status_code == 405
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.models.user import AuthUser, Base
+from app.sqlite import create_sqlite_engine, write_queue_wait
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'edge.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def add_auth_user(connection, user_id: int) -> None:
+    connection.execute(
+        insert(AuthUser).values(id=user_id, email=f"edge{user_id}@example.com")
+    )
+
+
+def test_sqlite_connections_are_tuned(sqlite_engine):
+    """Test every connection gets the embedded mode pragmas."""
+    with sqlite_engine.connect() as connection:
+
+        def pragma(name: str):
+            return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1
+        assert pragma("mmap_size") == settings.SQLITE_MMAP_SIZE_MB * 2**20
+        assert pragma("cache_size") == -settings.SQLITE_CACHE_SIZE_MB * 1024
+        assert pragma("foreign_keys") == 1
+
+
+def test_writers_wait_in_the_write_queue(sqlite_engine):
+    """Test a second writer waits for the first instead of failing, readers don't."""
+    waited_before = write_queue_wait.value()
+    errors = []
+
+    def second_writer():
+        try:
+            with sqlite_engine.begin() as connection:
+                add_auth_user(connection, 2)
+        except Exception as exc:  # surfaced by the assertion below
+            errors.append(exc)
+
+    with sqlite_engine.connect() as first:
+        add_auth_user(first, 1)
+        writer = threading.Thread(target=second_writer)
+        writer.start()
+        time.sleep(0.2)
+        assert writer.is_alive()
+        # WAL: reading needs no lock while the write is pending
+        with sqlite_engine.connect() as reader:
+            assert reader.scalar(select(func.count()).select_from(AuthUser)) == 0
+        first.commit()
+        writer.join(timeout=5)
+
+    assert errors == []
+    with sqlite_engine.connect() as connection:
+        user_ids = connection.scalars(select(AuthUser.id).order_by(AuthUser.id))
+        assert user_ids.all() == [1, 2]
+    assert write_queue_wait.value() - waited_before >= 0.2
+
+
+def test_write_queue_times_out_as_database_locked(sqlite_engine):
+    """Test a writer gives up after the busy timeout with SQLite's error."""
+    with sqlite_engine.connect() as first, sqlite_engine.connect() as second:
+        add_auth_user(first, 1)
+        second.connection.dbapi_connection.write_queue.timeout = 0.1
+        with pytest.raises(OperationalError, match="database is locked"):
+            add_auth_user(second, 2)
+        second.rollback()
+        first.commit()
+        # The failed writer did not keep the queue
+        add_auth_user(second, 3)
+        second.commit()
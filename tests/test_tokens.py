@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app.core import tokens
+from app.core.tokens import TokenService
+
+
+def ec_key_pems():
+    """A fresh P-256 key as (private PEM, public PEM)."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    private = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private.decode(), public.decode()
+
+
+def claims(subject: str = "rotate@example.com") -> dict:
+    return {"sub": subject, "exp": datetime.utcnow() + timedelta(minutes=5)}
+
+
+def test_key_rotation():
+    """Test tokens from the previous key keep working after rotating keys."""
+    private, public = ec_key_pems()
+    old = TokenService([{"kid": "2024", "alg": "HS256", "key": "old-secret"}])
+    legacy_token = jwt.encode(claims("legacy"), "old-secret", algorithm="HS256")
+    old_token = old.encode(claims("old"))
+    assert jwt.get_unverified_header(old_token)["kid"] == "2024"
+
+    rotated = TokenService(
+        [
+            {"kid": "2024", "alg": "HS256", "key": "old-secret"},
+            {"kid": "2025", "alg": "ES256", "key": private},
+        ],
+        signing_kid="2025",
+    )
+    new_token = rotated.encode(claims("new"))
+    assert jwt.get_unverified_header(new_token)["kid"] == "2025"
+    assert rotated.decode(new_token)["sub"] == "new"
+    assert rotated.decode(old_token)["sub"] == "old"
+    assert rotated.decode(legacy_token)["sub"] == "legacy"
+    # Old deployments do not know the new key yet
+    assert old.decode(new_token) is None
+
+    # A service holding only the public key verifies but cannot sign
+    verifier = TokenService([{"kid": "2025", "alg": "ES256", "key": public}])
+    assert verifier.decode(new_token)["sub"] == "new"
+    with pytest.raises(ValueError, match="can sign"):
+        verifier.encode(claims())
+
+    # A kid must name its key and tampered tokens fail
+    forged = jwt.encode(
+        claims("forged"), "old-secret", algorithm="HS256", headers={"kid": "2025"}
+    )
+    assert rotated.decode(forged) is None
+    for kid in (["2025"], {"kid": "2025"}, 2025):
+        odd_kid = jwt.encode(
+            claims("odd"), "old-secret", algorithm="HS256", headers={"kid": kid}
+        )
+        assert rotated.decode(odd_kid) is None
+    assert rotated.decode(new_token[:-2] + "AA") is None
+    assert rotated.decode("not a token") is None
+
+
+def test_asymmetric_tokens_authenticate_and_publish_jwks(
+    client: TestClient, monkeypatch
+):
+    """Test the API signs with the configured key and serves its public half."""
+    private, _ = ec_key_pems()
+    service = TokenService(
+        [
+            {"kid": "hmac", "alg": "HS256", "key": "another-secret"},
+            {"kid": "edge-1", "alg": "ES256", "key": private},
+        ],
+        signing_kid="edge-1",
+    )
+    monkeypatch.setattr(tokens, "token_service", service)
+
+    response = client.post(
+        "/api/v1/auth/register",
+        json={"name": "Key User", "email": "keys@example.com", "password": "pw12345"},
+    )
+    token = response.json()["access_token"]
+    assert jwt.get_unverified_header(token) == {
+        "alg": "ES256",
+        "kid": "edge-1",
+        "typ": "JWT",
+    }
+    response = client.get(
+        "/api/v1/auth/api-keys/", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    odd_kid = jwt.encode(
+        claims("keys@example.com"), "another-secret", headers={"kid": ["hmac"]}
+    )
+    response = client.get(
+        "/api/v1/auth/api-keys/", headers={"Authorization": f"Bearer {odd_kid}"}
+    )
+    assert response.status_code == 401
+
+    response = client.get("/api/v1/auth/jwks")
+    assert response.status_code == 200
+    keys = response.json()["keys"]
+    assert [key["kid"] for key in keys] == ["edge-1"]
+    assert "d" not in keys[0]
+    assert jwt.decode(token, keys[0], algorithms=["ES256"])["sub"] == "keys@example.com"
@@ -1,5 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from tests.conftest import make_user_data
 
 
 def test_get_users(client: TestClient):
@@ -165,10 +168,12 @@ def test_update_user(client: TestClient, auth_headers):
     create_response = client.post("/api/v1/users/", json=user_data, headers=auth_headers)
     user = create_response.json()
     
-    # Update user
+    # Replace user with a full representation
     update_data = {
+        **user_data,
         "name": "Updated Name",
-        "email": "updated@example.com"
+        "email": "updated@example.com",
+        "address": {**user_data["address"], "city": "Updated City"},
     }
     
     response = client.put(f"/api/v1/users/{user['id']}", json=update_data, headers=auth_headers)
@@ -176,6 +181,102 @@ def test_update_user(client: TestClient, auth_headers):
     updated_user = response.json()
     assert updated_user["name"] == "Updated Name"
     assert updated_user["email"] == "updated@example.com"
+    assert updated_user["address"]["city"] == "Updated City"
+    assert updated_user["address"]["geo"]["lat"] == "0.0"
+    
+    # PUT requires the full representation
+    response = client.put(
+        f"/api/v1/users/{user['id']}", json={"name": "Partial"}, headers=auth_headers
+    )
+    assert response.status_code == 422
+
+
+def test_patch_user_nested_fields(client: TestClient, auth_headers):
+    """Test partially updating nested address, geo and company fields."""
+    user_data = {
+        "name": "Patch Me",
+        "username": "patchme",
+        "email": "patchme@example.com",
+        "phone": "333-333-3333",
+        "website": "patchme.com",
+        "address": {
+            "street": "Patch St",
+            "suite": "Suite 3",
+            "city": "Patch City",
+            "zipcode": "33333",
+            "geo": {
+                "lat": "3.0",
+                "lng": "3.0"
+            }
+        },
+        "company": {
+            "name": "Patch Corp",
+            "catchPhrase": "Small changes",
+            "bs": "incremental business"
+        }
+    }
+    
+    create_response = client.post(
+        "/api/v1/users/", json=user_data, headers=auth_headers
+    )
+    user = create_response.json()
+    
+    patch_data = {
+        "address": {"city": "New City", "geo": {"lng": "4.5"}},
+        "company": {"name": "New Corp"},
+    }
+    response = client.patch(
+        f"/api/v1/users/{user['id']}", json=patch_data, headers=auth_headers
+    )
+    assert response.status_code == 200
+    patched_user = response.json()
+    assert patched_user["name"] == "Patch Me"
+    assert patched_user["address"]["city"] == "New City"
+    assert patched_user["address"]["street"] == "Patch St"
+    assert patched_user["address"]["geo"] == {**user["address"]["geo"], "lng": "4.5"}
+    assert patched_user["company"]["name"] == "New Corp"
+    assert patched_user["company"]["bs"] == "incremental business"
+    
+    # Changes are persisted
+    get_response = client.get(f"/api/v1/users/{user['id']}")
+    assert get_response.json() == patched_user
+
+
+def test_null_fields_are_rejected(client: TestClient, auth_headers):
+    """Test explicit nulls in single and bulk updates get 422 and change nothing."""
+    user = client.post(
+        "/api/v1/users/",
+        json=make_user_data("nullpatch", city="Null City"),
+        headers=auth_headers,
+    ).json()
+
+    for patch_data in (
+        {"address": {"city": None}},
+        {"address": {"geo": {"lat": None}}},
+        {"company": None},
+        {"name": None},
+    ):
+        response = client.patch(
+            f"/api/v1/users/{user['id']}", json=patch_data, headers=auth_headers
+        )
+        assert response.status_code == 422
+    bulk_update = {"filter": {"city": "Null City"}, "changes": {"phone": None}}
+    response = client.patch("/api/v1/users/", json=bulk_update, headers=auth_headers)
+    assert response.status_code == 422
+
+    response = client.get(f"/api/v1/users/{user['id']}")
+    assert response.status_code == 200
+    assert response.json() == user
+
+
+def test_patch_nonexistent_user(client: TestClient, auth_headers):
+    """Test patching non-existent user."""
+    response = client.patch(
+        "/api/v1/users/99999",
+        json={"address": {"city": "Nowhere"}},
+        headers=auth_headers,
+    )
+    assert response.status_code == 404
 
 
 def test_delete_user(client: TestClient, auth_headers):
@@ -213,4 +314,237 @@ def test_delete_user(client: TestClient, auth_headers):
     
     # Verify user is deleted
     get_response = client.get(f"/api/v1/users/{user['id']}")
-    assert get_response.status_code == 404 
\ No newline at end of file
+    assert get_response.status_code == 404
+
+
+def test_bulk_update_and_delete_users(client: TestClient, auth_headers):
+    """Test set-based bulk update and delete with dry run."""
+    for i in range(3):
+        user_data = {
+            "name": f"Bulk User {i}",
+            "username": f"bulkuser{i}",
+            "email": f"bulkuser{i}@example.com",
+            "phone": "444-444-4444",
+            "website": "bulk.com",
+            "address": {
+                "street": "Bulk St",
+                "suite": f"Suite {i}",
+                "city": "Bulk City",
+                "zipcode": "44444",
+                "geo": {"lat": "4.0", "lng": "4.0"}
+            },
+            "company": {
+                "name": "Bulk Corp",
+                "catchPhrase": "More at once",
+                "bs": "wholesale business"
+            }
+        }
+        client.post("/api/v1/users/", json=user_data, headers=auth_headers)
+    
+    # Dry run reports counts without writing
+    bulk_update = {
+        "filter": {"company_name": "Bulk Corp"},
+        "changes": {
+            "company": {"name": "Renamed Corp"},
+            "address": {"geo": {"lat": "5.0"}},
+        },
+        "dry_run": True,
+    }
+    response = client.patch("/api/v1/users/", json=bulk_update, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "matched": 3,
+        "affected": {"companies": 3, "geo": 3},
+        "dry_run": True,
+    }
+    
+    bulk_update["dry_run"] = False
+    response = client.patch("/api/v1/users/", json=bulk_update, headers=auth_headers)
+    assert response.json()["affected"] == {"companies": 3, "geo": 3}
+    
+    # Filter on the new company name now matches the same users
+    bulk_delete = {"filter": {"company_name": "Renamed Corp"}}
+    response = client.request(
+        "DELETE", "/api/v1/users/", json=bulk_delete, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json() == {"matched": 3, "affected": {"users": 3}, "dry_run": False}
+
+
+def test_bulk_update_of_filtered_columns(client: TestClient, auth_headers):
+    """Test changing a filtered column still updates every matched row once."""
+    for i in range(2):
+        user_data = make_user_data(f"movinguser{i}")
+        user_data["address"]["city"] = "Old Town"
+        user_data["company"]["name"] = "Moving Corp"
+        client.post("/api/v1/users/", json=user_data, headers=auth_headers)
+
+    bulk_update = {
+        "filter": {"city": "Old Town"},
+        "changes": {"address": {"city": "New Town"}, "company": {"bs": "relocated"}},
+    }
+    response = client.patch("/api/v1/users/", json=bulk_update, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["matched"] == 2
+    assert response.json()["affected"]["addresses"] == 2
+    assert response.json()["affected"]["companies"] == 2
+    moved = client.get("/api/v1/users/?city=New Town").json()
+    assert [user["company"]["bs"] for user in moved] == ["relocated"] * 2
+
+    # Both tables' filtered columns cannot change in one statement set
+    bulk_update = {
+        "filter": {"city": "New Town", "company_name": "Moving Corp"},
+        "changes": {"address": {"city": "Old Town"}, "company": {"name": "Other"}},
+    }
+    response = client.patch("/api/v1/users/", json=bulk_update, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_bulk_operations_require_filter(client: TestClient, auth_headers):
+    """Test bulk operations without criteria are rejected."""
+    response = client.request(
+        "DELETE", "/api/v1/users/", json={"filter": {}}, headers=auth_headers
+    )
+    assert response.status_code == 400
+    
+    response = client.patch(
+        "/api/v1/users/",
+        json={"filter": {"city": "Anywhere"}, "changes": {"email": "same@example.com"}},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+
+
+def test_get_users_total_count(client: TestClient):
+    """Test X-Total-Count header on user listings."""
+    all_users = client.get("/api/v1/users/?limit=100").json()
+    
+    response = client.get("/api/v1/users/?limit=1")
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count"] == str(len(all_users))
+    
+    response = client.get("/api/v1/users/?username=nobody-by-this-name")
+    assert response.json() == []
+    assert response.headers["X-Total-Count"] == "0"
+
+
+def test_user_count_cache_invalidated_by_writes(client: TestClient, db_session):
+    """Test cached counts are dropped when users are created."""
+    from app.crud import user as user_crud
+    from app.schemas.user import UserCreate
+    
+    before, estimated = user_crud.count_users(db_session)
+    assert not estimated
+    user_crud.create_user(db_session, UserCreate(
+        name="Counted User",
+        username="counteduser",
+        email="counted@example.com",
+        phone="555-555-5555",
+        website="counted.com",
+        address={
+            "street": "Count St",
+            "suite": "Suite 5",
+            "city": "Count City",
+            "zipcode": "55555",
+            "geo": {"lat": "5.0", "lng": "5.0"},
+        },
+        company={
+            "name": "Count Corp",
+            "catchPhrase": "Every one matters",
+            "bs": "accurate business",
+        },
+    ))
+    after, _ = user_crud.count_users(db_session)
+    assert after == before + 1
+
+
+def test_create_user_conflicts(client: TestClient, auth_headers, connection):
+    """Test duplicates are rejected by the constraints, without SELECTs first."""
+    statements = []
+    event.listen(
+        connection,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    response = client.post(
+        "/api/v1/users/", json=make_user_data("uniqueone"), headers=auth_headers
+    )
+    assert response.status_code == 200
+    user_statements = [s for s in statements if "users" in s and "auth_users" not in s]
+    assert user_statements[0].lstrip().upper().startswith("INSERT")
+
+    duplicate_email = {**make_user_data("uniquetwo"), "email": "uniqueone@example.com"}
+    response = client.post("/api/v1/users/", json=duplicate_email, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already registered"
+
+    duplicate_username = {**make_user_data("uniqueone"), "email": "other@example.com"}
+    response = client.post(
+        "/api/v1/users/", json=duplicate_username, headers=auth_headers
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username already taken"
+
+
+def test_put_creates_missing_user(client: TestClient, auth_headers):
+    """Test PUT creates a user with the given id when it does not exist."""
+    response = client.put(
+        "/api/v1/users/4242", json=make_user_data("upserted"), headers=auth_headers
+    )
+    assert response.status_code == 201
+    assert response.json()["id"] == 4242
+    assert client.get("/api/v1/users/4242").json()["username"] == "upserted"
+
+    replacement = {**make_user_data("upserted"), "name": "Replaced"}
+    response = client.put("/api/v1/users/4242", json=replacement, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["name"] == "Replaced"
+
+    # New users keep getting fresh ids after an explicit one
+    response = client.post(
+        "/api/v1/users/", json=make_user_data("afterupsert"), headers=auth_headers
+    )
+    assert response.status_code == 200
+    after_id = response.json()["id"]
+    assert after_id > 4242
+
+    # An explicit id below the sequence neither moves nor consumes it
+    response = client.put(
+        "/api/v1/users/7", json=make_user_data("lowid"), headers=auth_headers
+    )
+    assert response.status_code == 201
+    response = client.post(
+        "/api/v1/users/", json=make_user_data("nextid"), headers=auth_headers
+    )
+    assert response.json()["id"] == after_id + 1
+
+
+def test_update_to_taken_email_is_rejected(client: TestClient, auth_headers):
+    """Test PUT and PATCH map unique violations to 400 instead of 500."""
+    first = client.post(
+        "/api/v1/users/", json=make_user_data("takenone"), headers=auth_headers
+    ).json()
+    client.post("/api/v1/users/", json=make_user_data("takentwo"), headers=auth_headers)
+
+    response = client.patch(
+        f"/api/v1/users/{first['id']}",
+        json={"email": "takentwo@example.com"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already registered"
+
+    response = client.put(
+        f"/api/v1/users/{first['id']}",
+        json=make_user_data("takentwo"),
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+
+    # A user may keep its own email
+    response = client.patch(
+        f"/api/v1/users/{first['id']}",
+        json={"email": "takenone@example.com", "name": "Still Mine"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200